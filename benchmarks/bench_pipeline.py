@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""Benchmarks for the download/convert pipeline of yt-dlp-gui.py.
+
+yt-dlp and ffprobe are replaced by small stand-in scripts that print
+realistic output at a configurable rate, so the numbers measure this
+project's own overhead (process handling, progress parsing, logging,
+scheduling, media probing), not the network. Conversions use a test clip
+generated locally with the real ffmpeg.
+
+    python benchmarks/bench_pipeline.py --save before.json
+    python benchmarks/bench_pipeline.py --compare before.json
+
+Sections whose requirements are missing (a display for the console benchmark,
+ffmpeg for conversions) are skipped; the report lists them with the reason,
+and --compare points out sections measured in only one of the two runs.
+POSIX only: the stand-ins are Python scripts started through their shebang
+line.
+"""
+
+import argparse
+import collections
+import importlib.util
+import json
+import os
+import platform
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yt-dlp-gui.py")
+
+# Stand-in yt-dlp: answers the metadata probe with an info JSON and a download
+# with BENCH_PROGRESS_LINES progress ticks, BENCH_LINE_INTERVAL seconds apart
+# (plus the usual chatter), then writes the file and reports its path the way
+# --print-to-file does
+FAKE_YTDLP = r'''
+import json, os, sys, time
+args = sys.argv[1:]
+if "--load-info-json" in args:
+    with open(args[args.index("--load-info-json") + 1], encoding="utf-8") as f:
+        url = json.load(f)["webpage_url"]
+else:
+    url = args[-1]
+video_id = url.rsplit("=", 1)[-1]
+if "--dump-single-json" in args:
+    print(json.dumps({"id": video_id, "title": f"Bench {video_id}", "duration": 212.0,
+                      "extractor_key": "Youtube", "webpage_url": url,
+                      "formats": [{"format_id": "18", "ext": "mp4", "vcodec": "avc1.42001E",
+                                   "acodec": "mp4a.40.2", "filesize": 9000000}]}))
+    sys.exit(0)
+lines = int(os.environ.get("BENCH_PROGRESS_LINES", "200"))
+interval = float(os.environ.get("BENCH_LINE_INTERVAL", "0.002"))
+templated = "--progress-template" in args
+total = 10485760
+print(f"[youtube] Extracting URL: {url}")
+print(f"[info] {video_id}: Downloading 1 format(s): 18")
+print(f"[download] Destination: Bench {video_id}.mp4", flush=True)
+for i in range(1, lines + 1):
+    done = total * i // lines
+    if templated:
+        status = "finished" if i == lines else "downloading"
+        print(f"[gui-progress] download|{status}|{done}|{total}|NA|2097152.0|{(total - done) // 2097152}",
+              flush=True)
+    else:
+        print(f"[download] {100.0 * i / lines:5.1f}% of 10.00MiB at 2.00MiB/s ETA 00:0{(lines - i) * 5 // lines}",
+              flush=True)
+    time.sleep(interval)
+if templated:
+    print("[gui-progress] postprocess|started|MoveFiles")
+    print("[gui-progress] postprocess|finished|MoveFiles", flush=True)
+paths = dict(args[i + 1].split(":", 1) for i, a in enumerate(args) if a == "-P")
+template = args[args.index("-o") + 1]
+name = template.replace("%(title)s", f"Bench {video_id}").replace("%(ext)s", "mp4")
+out = os.path.join(paths.get("home", ""), name)
+with open(out, "wb") as f:
+    f.write(b"\0" * int(os.environ.get("BENCH_FILE_BYTES", "4096")))
+if "--print-to-file" in args:
+    with open(args[args.index("--print-to-file") + 2], "a") as f:
+        f.write(out + "\n")
+'''
+
+# Stand-in ffprobe: one H.264/AAC MP4 for any input, after BENCH_PROBE_DELAY
+# seconds (a real probe reads the file's header)
+FAKE_FFPROBE = r'''
+import json, os, time
+time.sleep(float(os.environ.get("BENCH_PROBE_DELAY", "0.005")))
+print(json.dumps({"format": {"duration": "212.0", "size": "4096", "format_name": "mov,mp4,m4a,3gp,3g2,mj2"},
+                  "streams": [{"codec_type": "video", "codec_name": "h264", "width": 1280, "height": 720},
+                              {"codec_type": "audio", "codec_name": "aac"}]}))
+'''
+
+# Metrics compared by --compare, and whether a smaller value is better
+COMPARED_METRICS = {
+    "download.latency_p50_ms": True,
+    "download.latency_p95_ms": True,
+    "download.overhead_p50_ms": True,
+    "download.spawns_per_job": True,
+    "probe.cold_ms_per_file": True,
+    "probe.warm_ms_per_file": True,
+    "probe.spawns_per_file": True,
+    "console.lines_per_second": False,
+    "console.max_lag_ms": True,
+}
+SECTIONS = ("download", "probe", "console", "convert")
+
+
+def load_app():
+    """Import yt-dlp-gui.py (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("ytdlp_gui", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_script(path, source):
+    """Write an executable Python script started with this interpreter."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"#!{sys.executable}\n{source.lstrip()}")
+    os.chmod(path, 0o755)
+
+
+class SpawnCounter:
+    """Count child processes by executable name while installed.
+    subprocess.run goes through subprocess.Popen, so both are covered."""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self._lock = threading.Lock()
+        self._original = None
+
+    def install(self):
+        counter = self
+        original = self._original = subprocess.Popen
+
+        class CountingPopen(original):
+            def __init__(self, args, *rest, **kwargs):
+                name = args if isinstance(args, str) else args[0]
+                with counter._lock:
+                    counter.counts[os.path.basename(str(name)).split()[0]] += 1
+                super().__init__(args, *rest, **kwargs)
+
+        subprocess.Popen = CountingPopen
+
+    def uninstall(self):
+        if self._original:
+            subprocess.Popen = self._original
+            self._original = None
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def make_engine(app, workspace, fake_bin=None):
+    """A DownloadEngine whose state, caches and dependencies live in `workspace`."""
+    engine = app.DownloadEngine(workspace, log=lambda text: None, origin="bench")
+    if fake_bin:
+        engine.ffmpeg_location = fake_bin
+    return engine
+
+
+def bench_downloads(app, args, workspace, spawns):
+    """End-to-end download jobs against the stand-in yt-dlp: per-job latency
+    (submit to finish), time in the job beyond what the stand-in itself takes,
+    log lines and child processes per job."""
+    deps = os.path.join(workspace, "dependencies")
+    os.makedirs(deps, exist_ok=True)
+    write_script(os.path.join(deps, "yt-dlp"), FAKE_YTDLP)
+    os.environ["BENCH_PROGRESS_LINES"] = str(args.progress_lines)
+    os.environ["BENCH_LINE_INTERVAL"] = str(args.line_interval)
+
+    engine = make_engine(app, workspace)
+    log_lines = collections.Counter()
+
+    def run_job(job):
+        def log(text):
+            log_lines[job.id] += 1
+        engine.run_download(job, log=log)
+
+    scheduler = app.JobScheduler(run_job, max_workers=args.parallel)
+    engine.download_concurrency = scheduler.expected_concurrency
+    options = app.DownloadOptions(output_dir=os.path.join(workspace, "downloads"), force=True)
+    submitted = {}
+    jobs = []
+    spawns.reset()
+    started = time.monotonic()
+    for i in range(args.jobs):
+        job = app.Job(f"https://www.youtube.com/watch?v=bench{i:04d}", options=options)
+        jobs.append(job)
+        submitted[job.id] = time.time()
+        scheduler.submit(job)
+    scheduler.wait()
+    wall = time.monotonic() - started
+    spawn_counts = spawns.snapshot()
+
+    failed = [job for job in jobs if job.status != "done"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} benchmark download(s) failed, first: {failed[0].error or failed[0].status}")
+    latency = [job.finished_at - submitted[job.id] for job in jobs]
+    service = [job.finished_at - job.started_at for job in jobs]
+    stand_in = args.progress_lines * args.line_interval
+    return {
+        "jobs": args.jobs,
+        "parallel": args.parallel,
+        "wall_s": round(wall, 3),
+        "jobs_per_second": round(args.jobs / wall, 2),
+        "latency_p50_ms": round(percentile(latency, 0.5) * 1000, 1),
+        "latency_p95_ms": round(percentile(latency, 0.95) * 1000, 1),
+        "latency_max_ms": round(max(latency) * 1000, 1),
+        # Time spent per job beyond the stand-in's own progress output
+        "overhead_p50_ms": round((percentile(service, 0.5) - stand_in) * 1000, 1),
+        "log_lines_per_job": round(sum(log_lines.values()) / args.jobs, 1),
+        "spawns_per_job": round(sum(spawn_counts.values()) / args.jobs, 2),
+        "spawns_by_binary": spawn_counts,
+    }
+
+
+def bench_probes(app, args, workspace, spawns):
+    """Plan a folder conversion (one ffprobe per file through probe_media) twice
+    against the stand-in ffprobe: cold, then again with the on-disk media
+    cache warm, which should need no probes at all."""
+    fake_bin = os.path.join(workspace, "fakebin")
+    media = os.path.join(workspace, "media")
+    os.makedirs(fake_bin, exist_ok=True)
+    os.makedirs(media, exist_ok=True)
+    write_script(os.path.join(fake_bin, "ffprobe"), FAKE_FFPROBE)
+    os.environ["BENCH_PROBE_DELAY"] = str(args.probe_delay)
+    inputs = []
+    for i in range(args.probe_files):
+        path = os.path.join(media, f"clip{i:04d}.mp4")
+        with open(path, "wb") as f:
+            f.write(b"\0" * 4096)
+        inputs.append(path)
+
+    engine = make_engine(app, workspace, fake_bin)
+    passes = {}
+    for name in ("cold", "warm"):
+        spawns.reset()
+        started = time.monotonic()
+        actions = collections.Counter(engine.plan_conversion(path, "mkv") for path in inputs)
+        passes[name] = (time.monotonic() - started, sum(spawns.snapshot().values()), actions)
+    if passes["cold"][2] != collections.Counter(copy=len(inputs)):
+        raise RuntimeError(f"unexpected conversion plan from the stand-in probe: {dict(passes['cold'][2])}")
+    return {
+        "files": len(inputs),
+        "cold_ms_per_file": round(passes["cold"][0] / len(inputs) * 1000, 2),
+        "warm_ms_per_file": round(passes["warm"][0] / len(inputs) * 1000, 3),
+        "spawns_per_file": round(passes["cold"][1] / len(inputs), 2),
+        "warm_spawns": passes["warm"][1],
+    }
+
+
+def bench_console(app, args):
+    """Feed lines from worker threads through the GUI's console queue and let
+    the real _poll_console_queue drain them into a Tk text widget under the Tk
+    event loop: throughput, drain lag and poll ticks."""
+    app.load_tk()
+    tk = app.tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return {"skipped": f"no display ({e})"}
+    root.withdraw()
+
+    class ConsoleHarness:
+        """Just the state _poll_console_queue and its metrics touch."""
+        _poll_console_queue = app.YtDlpGUI._poll_console_queue
+        _update_console_metrics = app.YtDlpGUI._update_console_metrics
+
+    console = ConsoleHarness()
+    console.root = root
+    console.console = tk.Text(root, height=12, state=tk.DISABLED)
+    console.console_max_lines = app.DEFAULT_CONSOLE_MAX_LINES
+    console.console_stats_var = tk.StringVar(root)
+    console._console_queue = queue.Queue()
+    console._console_interval = app.CONSOLE_POLL_MS
+    console.console_metrics = {"depth": 0, "lag": 0.0, "max_lag": 0.0, "lines": 0, "ticks": 0,
+                               "interval_ms": app.CONSOLE_POLL_MS}
+
+    producers = max(1, args.parallel)
+    per_producer = args.console_lines // producers
+
+    def produce(worker):
+        for i in range(per_producer):
+            console._console_queue.put((time.monotonic(), f"[#{worker}] [download] {i} of {per_producer}"))
+
+    threads = [threading.Thread(target=produce, args=(n,), daemon=True) for n in range(producers)]
+    total = per_producer * producers
+
+    def check_done():
+        if console.console_metrics["lines"] >= total:
+            root.quit()
+        else:
+            root.after(5, check_done)
+
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    console._poll_console_queue()
+    root.after(5, check_done)
+    root.mainloop()
+    elapsed = time.monotonic() - started
+    metrics = console.console_metrics
+    root.destroy()
+    return {
+        "lines": total,
+        "producers": producers,
+        "seconds": round(elapsed, 3),
+        "lines_per_second": round(total / elapsed),
+        "ticks": metrics["ticks"],
+        "lines_per_tick": round(metrics["lines"] / max(1, metrics["ticks"]), 1),
+        "max_lag_ms": round(metrics["max_lag"] * 1000, 1),
+    }
+
+
+def make_test_clip(ffmpeg, path, seconds, bitrate):
+    """Encode a synthetic 720p H.264/AAC clip (test pattern plus tone)."""
+    subprocess.run(
+        [ffmpeg, "-v", "error", "-y",
+         "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={seconds}",
+         "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={seconds}",
+         "-c:v", "libx264", "-preset", "veryfast", "-b:v", bitrate, "-pix_fmt", "yuv420p",
+         "-c:a", "aac", "-b:a", "128k", "-shortest", path],
+        check=True, capture_output=True)
+
+
+def bench_conversions(app, args, workspace, spawns):
+    """Wall time of a remux and of each compression preset on a local test clip.
+    Presets whose target is above the clip's size take the size-guard shortcut,
+    which the 'action' column shows."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg or not shutil.which("ffprobe"):
+        return {"skipped": "ffmpeg/ffprobe not found on PATH"}
+    clip = os.path.join(workspace, "clip.mp4")
+    make_test_clip(ffmpeg, clip, args.clip_seconds, args.clip_bitrate)
+    clip_mb = os.path.getsize(clip) / (1024 * 1024)
+
+    os.makedirs(os.path.join(workspace, "convert"), exist_ok=True)
+    engine = make_engine(app, os.path.join(workspace, "convert"))
+    engine.ffmpeg_location = os.path.dirname(ffmpeg)
+    engine.set_encode_slots(1)
+    out_dir = os.path.join(workspace, "converted")
+    os.makedirs(out_dir, exist_ok=True)
+
+    runs = [("remux (mkv)", "mkv", None)]
+    for preset in args.presets or list(app.COMPRESSION_PRESETS):
+        if preset not in app.COMPRESSION_PRESETS:
+            raise SystemExit(f"Unknown preset: {preset}")
+        runs.append((preset, "mp4", app.compression_spec_for_preset(preset)))
+
+    results = []
+    for name, output_format, spec in runs:
+        output = os.path.join(out_dir, f"{len(results)}.{output_format}")
+        lines = []
+        spawns.reset()
+        started = time.monotonic()
+        ok = engine.run_conversion(clip, output, output_format, spec, log=lines.append)
+        elapsed = time.monotonic() - started
+        shortcut = spec and any("Using stream copy" in line for line in lines)
+        results.append({
+            "name": name,
+            "ok": bool(ok),
+            "action": "copy" if not spec or shortcut else "encode",
+            "seconds": round(elapsed, 3),
+            "output_mb": round(os.path.getsize(output) / (1024 * 1024), 2) if os.path.exists(output) else None,
+            "spawns": sum(spawns.snapshot().values()),
+        })
+    return {"clip_seconds": args.clip_seconds, "clip_mb": round(clip_mb, 2), "runs": results}
+
+
+def flatten(results):
+    """{'section.metric': value} for the numeric top-level metrics."""
+    flat = {}
+    for section, values in results.items():
+        if isinstance(values, dict):
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    flat[f"{section}.{key}"] = value
+    return flat
+
+
+def skipped_sections(results):
+    """{section: reason} for the sections that did not run."""
+    return {section: values["skipped"] for section, values in results.items()
+            if isinstance(values, dict) and "skipped" in values}
+
+
+def print_report(results, baseline=None):
+    """Human-readable results on stdout, with deltas against a saved run."""
+    previous = flatten(baseline["results"]) if baseline else {}
+    for section in SECTIONS:
+        values = results.get(section)
+        if values is None:
+            continue
+        print(f"\n== {section} ==")
+        if "skipped" in values:
+            print(f"  skipped: {values['skipped']}")
+            continue
+        for key, value in values.items():
+            if key == "runs":
+                print(f"  {'run':<32} {'action':<7} {'seconds':>8} {'MB':>8} {'spawns':>7}")
+                for run in value:
+                    status = "" if run["ok"] else "  FAILED"
+                    size = "-" if run["output_mb"] is None else f"{run['output_mb']:.2f}"
+                    print(f"  {run['name']:<32} {run['action']:<7} {run['seconds']:>8.2f} "
+                          f"{size:>8} {run['spawns']:>7}{status}")
+                continue
+            line = f"  {key:<20} {value}"
+            metric = f"{section}.{key}"
+            if metric in previous and metric in COMPARED_METRICS and previous[metric]:
+                change = (value - previous[metric]) / previous[metric] * 100
+                worse = change > 0 if COMPARED_METRICS[metric] else change < 0
+                flag = "  (worse)" if worse and abs(change) >= 10 else ""
+                line += f"    was {previous[metric]} ({change:+.1f}%){flag}"
+            print(line)
+
+    skipped = skipped_sections(results)
+    if skipped:
+        print("\nSkipped (no numbers for these sections):")
+        for section, reason in skipped.items():
+            print(f"  {section:<10} {reason}")
+    if baseline:
+        before = skipped_sections(baseline["results"])
+        for section in SECTIONS:
+            ran_now = section in results and section not in skipped
+            ran_before = section in baseline["results"] and section not in before
+            if ran_now != ran_before:
+                print(f"  note: {section} ran only in the {'current' if ran_now else 'saved'} run; "
+                      "it is not compared")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the yt-dlp-gui download/convert pipeline.")
+    parser.add_argument("--jobs", type=int, default=16, help="download jobs to run (default: 16)")
+    parser.add_argument("--parallel", type=int, default=4, help="downloads at once (default: 4)")
+    parser.add_argument("--progress-lines", type=int, default=200,
+                        help="progress lines the stand-in yt-dlp prints per download (default: 200)")
+    parser.add_argument("--line-interval", type=float, default=0.002,
+                        help="seconds between those lines (default: 0.002)")
+    parser.add_argument("--probe-files", type=int, default=200,
+                        help="files the probe benchmark plans a conversion for (default: 200)")
+    parser.add_argument("--probe-delay", type=float, default=0.005,
+                        help="seconds the stand-in ffprobe takes per file (default: 0.005)")
+    parser.add_argument("--console-lines", type=int, default=50000,
+                        help="lines pushed through the console queue (default: 50000)")
+    parser.add_argument("--clip-seconds", type=int, default=20,
+                        help="length of the generated test clip (default: 20)")
+    parser.add_argument("--clip-bitrate", default="12M",
+                        help="video bitrate of the test clip (default: 12M, about 30MB at 20s)")
+    parser.add_argument("--presets", nargs="+", metavar="PRESET",
+                        help="compression presets to time (default: all)")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS,
+                        help="run only these sections")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="show changes against a saved run")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary workspace")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if platform.system() == "Windows":
+        print("The stand-in binaries need a POSIX system.", file=sys.stderr)
+        return 2
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    app = load_app()
+    sections = args.only or SECTIONS
+    workspace = tempfile.mkdtemp(prefix="ytdlp-gui-bench-")
+    spawns = SpawnCounter()
+    spawns.install()
+    results = {}
+    try:
+        if "download" in sections:
+            results["download"] = bench_downloads(app, args, os.path.join(workspace, "download"), spawns)
+        if "probe" in sections:
+            results["probe"] = bench_probes(app, args, os.path.join(workspace, "probe"), spawns)
+        if "console" in sections:
+            results["console"] = bench_console(app, args)
+        if "convert" in sections:
+            results["convert"] = bench_conversions(app, args, workspace, spawns)
+    finally:
+        spawns.uninstall()
+        if args.keep:
+            print(f"Workspace kept at {workspace}", file=sys.stderr)
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    print_report(results, baseline)
+    if args.save:
+        report = {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+                  "machine": platform.machine(), "cpus": os.cpu_count(),
+                  "args": vars(args), "results": results}
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Clip start/end parsing and the labels they give file names.
+
+    python -m pytest tests
+"""
+import importlib.util
+import os
+import unittest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yt-dlp-gui.py")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("ytdlp_gui", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+app = load_app()
+
+
+class ParseTimestampTest(unittest.TestCase):
+
+    def test_valid_times(self):
+        cases = {"83": 83, "1:23": 83, "01:02:03.5": 3723.5, "59:59": 3599, "100:00": 6000, " 7.25 ": 7.25}
+        for text, seconds in cases.items():
+            self.assertEqual(app.parse_timestamp(text), seconds, text)
+
+    def test_blank_is_none(self):
+        self.assertIsNone(app.parse_timestamp(""))
+        self.assertIsNone(app.parse_timestamp("  "))
+
+    def test_invalid_times(self):
+        for text in ("1:75", "1:60", "1:60:00", "2:00:60", "1.5:30", "1:2:3:4", "-5", "1:", "abc"):
+            with self.assertRaises(ValueError, msg=text):
+                app.parse_timestamp(text)
+
+
+class ClipLabelTest(unittest.TestCase):
+
+    def test_labels(self):
+        cases = {
+            (65, 90): "1m05s-1m30s",
+            (None, 45): "0s-45s",
+            (30, None): "30s-end",
+            (3725, 3790): "1h02m05s-1h03m10s",
+        }
+        for clip, label in cases.items():
+            self.assertEqual(app.clip_label(clip), label)
+
+    def test_fractional_seconds_keep_the_padding(self):
+        self.assertEqual(app.clip_label((65.5, 90)), "1m05.5s-1m30s")
+        self.assertEqual(app.clip_label((3600.75, None)), "1h00m00.75s-end")
+        self.assertEqual(app.clip_label((5.25, 12.5)), "5.25s-12.5s")
+
+
+if __name__ == "__main__":
+    unittest.main()
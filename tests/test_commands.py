@@ -0,0 +1,55 @@
+"""yt-dlp command lines built by DownloadEngine.build_command.
+
+    python -m pytest tests
+"""
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yt-dlp-gui.py")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("ytdlp_gui", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+app = load_app()
+
+
+class DirectFormatsTest(unittest.TestCase):
+    """Formats picked to skip the re-encode still end up in the requested container."""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix="ytdlp-gui-test-")
+        self.engine = app.DownloadEngine(self.workdir, log=lambda text: None, origin="test")
+        self.engine.find_ytdlp = lambda: "yt-dlp"
+
+    def tearDown(self):
+        self.engine.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def build(self, formats, video_format):
+        options = app.DownloadOptions(self.workdir, video_format=video_format)
+        return self.engine.build_command("https://example.com/video", options, metadata={},
+                                         staging_dir=self.workdir, formats=formats)
+
+    def test_single_muxed_format_is_remuxed_into_the_container(self):
+        cmd = self.build("18", "mov")
+        self.assertEqual(cmd[cmd.index("--remux-video") + 1], "mov")
+
+    def test_merged_pair_keeps_the_merge_container(self):
+        cmd = self.build("137+140", "mp4")
+        self.assertEqual(cmd[cmd.index("--merge-output-format") + 1], "mp4")
+        self.assertEqual(cmd[cmd.index("--remux-video") + 1], "mp4")
+
+    def test_no_remux_without_picked_formats(self):
+        self.assertNotIn("--remux-video", self.build(None, "mov"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+"""DownloadEngine conversions with ffmpeg and ffprobe stubbed out: which
+ffmpeg commands run, and which file ends up at the output path.
+
+    python -m pytest tests
+"""
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yt-dlp-gui.py")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("ytdlp_gui", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+app = load_app()
+
+MB = 1024 * 1024
+
+
+def media_info(path, vcodec, acodec, duration=100.0):
+    return app.MediaInfo(path, {
+        "format": {"duration": str(duration), "size": str(os.path.getsize(path))},
+        "streams": [{"codec_type": "video", "codec_name": vcodec, "width": 1920},
+                    {"codec_type": "audio", "codec_name": acodec}],
+    })
+
+
+class EngineTestCase(unittest.TestCase):
+    """An engine in a scratch directory whose ffmpeg runs are recorded, not executed."""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix="ytdlp-gui-test-")
+        self.engine = app.DownloadEngine(self.workdir, log=lambda text: None, origin="test")
+        self.engine._run_ffmpeg = self.run_ffmpeg
+        self.commands = []
+
+    def tearDown(self):
+        self.engine.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def write_file(self, name, size):
+        path = os.path.join(self.workdir, name)
+        with open(path, "wb") as f:
+            f.truncate(int(size))
+        return path
+
+    def run_ffmpeg(self, cmd, log, job=None, duration=None, label=None):
+        self.commands.append(cmd)
+        if cmd[-1] != os.devnull:
+            self.write_file(cmd[-1], self.output_size(cmd))
+        return 0
+
+    def output_size(self, cmd):
+        return MB
+
+
+class SizeGuardTest(EngineTestCase):
+    """A download already under the target size is copied only if its streams fit the container."""
+
+    def convert(self, vcodec, acodec, output_format):
+        source = self.write_file("staged.mkv", 5 * MB)
+        self.engine.probe_media = lambda path, job=None: media_info(path, vcodec, acodec)
+        output = os.path.join(self.workdir, f"video.{output_format}")
+        spec = {"target_size": 10, "video_bitrate": None, "audio_bitrate": 128}
+        self.assertTrue(self.engine.run_conversion(source, output, output_format, compression=spec))
+        return self.commands
+
+    def codec_args(self, cmd):
+        return [cmd[i + 1] for i, arg in enumerate(cmd) if arg in ("-c:v", "-c:a")]
+
+    def test_compatible_streams_are_copied(self):
+        commands = self.convert("h264", "aac", "mp4")
+        self.assertEqual(len(commands), 1)
+        self.assertEqual(self.codec_args(commands[0]), ["copy", "copy"])
+
+    def test_incompatible_audio_is_reencoded(self):
+        commands = self.convert("h264", "opus", "mov")
+        self.assertEqual(len(commands), 1)
+        self.assertEqual(self.codec_args(commands[0]), ["copy", "aac"])
+
+    def test_incompatible_video_goes_through_the_target_size_encode(self):
+        commands = self.convert("vp9", "opus", "avi")
+        self.assertIn("-pass", commands[0])
+        self.assertNotIn("copy", self.codec_args(commands[-1]))
+
+    def test_plan_matches_the_size_guard(self):
+        source = self.write_file("staged.mkv", 5 * MB)
+        spec = {"target_size": 10, "video_bitrate": None, "audio_bitrate": 128}
+        self.engine.probe_media = lambda path, job=None: media_info(path, "h264", "aac")
+        self.assertEqual(self.engine.plan_conversion(source, "mp4", spec), "copy")
+        self.engine.probe_media = lambda path, job=None: media_info(path, "vp9", "opus")
+        self.assertEqual(self.engine.plan_conversion(source, "mov", spec), "encode")
+        self.assertEqual(self.engine.plan_conversion(source, "mov", dict(spec, target_size=4)), "encode")
+
+
+class TargetSizeTest(EngineTestCase):
+    """encode_to_target_size with second passes of scripted sizes (bytes, in order)."""
+
+    TARGET = 10     # MB
+
+    def encode(self, sizes, video_bitrate=None, job=None):
+        self.sizes = list(sizes)
+        source = self.write_file("source.mkv", 50 * MB)
+        self.output = os.path.join(self.workdir, "video.mp4")
+        spec = {"target_size": self.TARGET, "video_bitrate": video_bitrate, "audio_bitrate": 128}
+        return self.engine.encode_to_target_size(source, self.output, "mp4", spec, 100.0, job=job)
+
+    def output_size(self, cmd):
+        return self.sizes.pop(0)
+
+    def second_pass_bitrates(self):
+        return [int(cmd[cmd.index("-b:v") + 1].rstrip("k")) for cmd in self.commands
+                if cmd[cmd.index("-pass") + 1] == "2"]
+
+    def leftover_attempts(self):
+        return [name for name in os.listdir(self.workdir) if ".size-attempt" in name]
+
+    def test_fitting_first_attempt_is_kept(self):
+        self.assertTrue(self.encode([9.5 * MB]))
+        self.assertEqual(os.path.getsize(self.output), int(9.5 * MB))
+        self.assertEqual(len(self.second_pass_bitrates()), 1)
+        self.assertEqual(self.leftover_attempts(), [])
+
+    def test_largest_fitting_attempt_is_kept(self):
+        # Undershoot, so the bitrate goes up; that overshoots; the last fits but is smaller
+        self.assertTrue(self.encode([8 * MB, 11 * MB, 7 * MB]))
+        self.assertEqual(os.path.getsize(self.output), 8 * MB)
+        self.assertEqual(self.leftover_attempts(), [])
+
+    def test_fails_when_no_attempt_fits(self):
+        job = app.Job("/tmp/source.mkv", kind="convert")
+        self.assertFalse(self.encode([12 * MB, 11 * MB, 10.5 * MB], job=job))
+        self.assertFalse(os.path.exists(self.output))
+        self.assertTrue(job.error.startswith("over target size"))
+        self.assertEqual(self.leftover_attempts(), [])
+
+    def test_bitrate_is_corrected_down_after_an_overshoot(self):
+        self.assertTrue(self.encode([12 * MB, 9.8 * MB]))
+        first, second = self.second_pass_bitrates()
+        self.assertLess(second, first)
+        self.assertEqual(os.path.getsize(self.output), int(9.8 * MB))
+
+    def test_overshooting_manual_bitrate_is_corrected(self):
+        self.assertTrue(self.encode([12 * MB, 6 * MB], video_bitrate=1000))
+        self.assertEqual(self.second_pass_bitrates()[0], 1000)
+        self.assertLess(self.second_pass_bitrates()[1], 1000)
+
+    def test_fitting_manual_bitrate_is_not_raised(self):
+        self.assertTrue(self.encode([3 * MB], video_bitrate=200))
+        self.assertEqual(self.second_pass_bitrates(), [200])
+
+
+class CorrectedBitrateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = app.DownloadEngine.__new__(app.DownloadEngine)
+        self.target = 10 * MB
+
+    def corrected(self, video_bitrate, actual_bytes, audio_bitrate=128, duration=100.0):
+        return self.engine.corrected_video_bitrate(video_bitrate, actual_bytes, self.target,
+                                                   audio_bitrate, duration)
+
+    def test_overshoot_lowers_the_bitrate(self):
+        self.assertLess(self.corrected(700, 12 * MB), 700)
+
+    def test_tiny_overshoot_still_lowers_the_bitrate(self):
+        self.assertLess(self.corrected(700, self.target + 1), 700)
+
+    def test_undershoot_raises_the_bitrate(self):
+        self.assertGreater(self.corrected(500, 6 * MB), 500)
+
+    def test_only_the_video_share_is_scaled(self):
+        # 100s of 128kbps audio is 1.6MB; the video share is what gets scaled
+        audio_bytes = 128 * 125 * 100
+        corrected = self.corrected(1000, audio_bytes + 2 * (self.target * 0.99 - audio_bytes))
+        self.assertAlmostEqual(corrected, 500, delta=1)
+
+    def test_bitrate_never_drops_below_the_floor(self):
+        self.assertEqual(self.corrected(60, 100 * MB), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Job.update bookkeeping: which changes reach the journal.
+
+    python -m pytest tests
+"""
+import importlib.util
+import os
+import unittest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yt-dlp-gui.py")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("ytdlp_gui", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+app = load_app()
+
+
+class CountingJournal:
+    """Stands in for JobJournal; records the status of every save."""
+
+    def __init__(self):
+        self.saved = []
+
+    def save(self, job):
+        self.saved.append(job.status)
+
+
+class JournalWritesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.journal = CountingJournal()
+        self.job = app.Job("https://example.com/video")
+        self.job.journal = self.journal
+
+    def test_progress_ticks_do_not_rewrite_the_row(self):
+        self.job.update(status="downloading")
+        for tick in range(100):
+            self.job.update(status="downloading", progress=f"{tick}%", percent=tick)
+        self.assertEqual(self.journal.saved, ["downloading"])
+
+    def test_status_pid_and_output_changes_are_saved(self):
+        self.job.update(status="downloading")
+        self.job.update(pid=1234, command=["yt-dlp"])
+        self.job.update(pid=1234)
+        self.job.update(output_path="/tmp/video.mp4")
+        self.job.update(status="done")
+        self.assertEqual(self.journal.saved, ["downloading", "downloading", "downloading", "done"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""MediaInfoCache rows in the state database.
+
+    python -m pytest tests
+"""
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yt-dlp-gui.py")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("ytdlp_gui", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+app = load_app()
+
+PROBE = {
+    "format": {"filename": "clip.mp4", "duration": "212.0", "size": "4096", "bit_rate": "154",
+               "format_name": "mov,mp4,m4a,3gp,3g2,mj2", "tags": {"encoder": "Lavf60"}},
+    "streams": [
+        {"index": 0, "codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080,
+         "disposition": {"default": 1, "attached_pic": 0}, "tags": {"language": "und"}},
+        {"index": 1, "codec_type": "audio", "codec_name": "aac", "sample_rate": "48000"},
+        {"index": 2, "codec_type": "video", "codec_name": "mjpeg", "disposition": {"attached_pic": 1}},
+    ],
+}
+
+
+class MediaInfoCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix="ytdlp-gui-test-")
+        self.cache = app.MediaInfoCache(app.StateStore(os.path.join(self.workdir, "state.db")))
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def media_file(self, name, size=4096):
+        path = os.path.join(self.workdir, name)
+        with open(path, "wb") as f:
+            f.truncate(size)
+        return path
+
+    def test_round_trip_keeps_what_media_info_reads(self):
+        path = self.media_file("clip.mp4")
+        self.cache.store(path, PROBE)
+        media = self.cache.get(path)
+        self.assertEqual((media.video_codec, media.audio_codec), ("h264", "aac"))
+        self.assertEqual((media.duration, media.size, media.bit_rate), (212.0, 4096, 154.0))
+        self.assertEqual(media.video_stream["width"], 1920)
+        self.assertEqual(len(media.streams), 3)
+        self.assertNotIn("tags", media.probe["format"])
+        self.assertNotIn("sample_rate", media.streams[1])
+
+    def test_changed_file_misses(self):
+        path = self.media_file("clip.mp4")
+        self.cache.store(path, PROBE)
+        with open(path, "ab") as f:
+            f.write(b"more")
+        self.assertIsNone(self.cache.get(path))
+
+    def test_oldest_rows_are_pruned(self):
+        self.cache.max_entries = 3
+        paths = [self.media_file(f"clip{i}.mp4") for i in range(5)]
+        for path in paths:
+            self.cache.store(path, PROBE)
+        self.cache.prune()
+        self.assertEqual([self.cache.get(path) is not None for path in paths],
+                         [False, False, True, True, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+"""ProgressParser on yt-dlp --progress-template lines and ffmpeg -progress blocks.
+
+    python -m pytest tests
+"""
+import importlib.util
+import os
+import unittest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yt-dlp-gui.py")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("ytdlp_gui", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+app = load_app()
+
+
+def ytdlp_line(*fields):
+    return f"{app.PROGRESS_MARKER} " + "|".join(str(field) for field in fields)
+
+
+class YtDlpProgressTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = app.ProgressParser()
+
+    def test_download_line(self):
+        is_progress, event = self.parser.feed(
+            ytdlp_line("download", "downloading", 2500000, 10000000, "NA", 1250000.5, 6))
+        self.assertTrue(is_progress)
+        self.assertEqual((event.stage, event.status), ("download", "downloading"))
+        self.assertEqual((event.done, event.total, event.speed, event.eta), (2500000, 10000000, 1250000.5, 6))
+        self.assertEqual(event.percent, 25.0)
+        self.assertEqual(event.short(), "25% ETA 0:06")
+
+    def test_na_fields(self):
+        _, event = self.parser.feed(ytdlp_line("download", "downloading", 1024, "NA", "NA", "NA", "NA"))
+        self.assertEqual(event.done, 1024)
+        self.assertIsNone(event.total)
+        self.assertIsNone(event.speed)
+        self.assertIsNone(event.eta)
+        self.assertIsNone(event.percent)
+        self.assertEqual(event.short(), "")
+
+    def test_estimated_total_is_used_when_the_total_is_unknown(self):
+        _, event = self.parser.feed(ytdlp_line("download", "downloading", 500, "NA", 2000.0, "NA", "NA"))
+        self.assertEqual(event.total, 2000.0)
+        self.assertEqual(event.percent, 25.0)
+
+    def test_finished_download_is_complete(self):
+        _, event = self.parser.feed(ytdlp_line("download", "finished", 2000, 2000, "NA", "NA", "NA"))
+        self.assertEqual(event.percent, 100.0)
+
+    def test_postprocess_line(self):
+        is_progress, event = self.parser.feed(ytdlp_line("postprocess", "started", "Merger"))
+        self.assertTrue(is_progress)
+        self.assertEqual((event.stage, event.status, event.detail), ("postprocess", "started", "Merger"))
+        self.assertEqual(event.describe(), "Post-processing: Merger (started)")
+
+    def test_other_output_is_not_progress(self):
+        self.assertEqual(self.parser.feed("[youtube] dQw4w9WgXcQ: Downloading webpage"), (False, None))
+        self.assertEqual(self.parser.feed(ytdlp_line("download", "downloading", 1)), (True, None))
+
+
+class FfmpegProgressTest(unittest.TestCase):
+
+    BLOCK = ("frame=250", "fps=50.0", "stream_0_0_q=28.0", "bitrate=1200.5kbits/s",
+             "total_size=1048576", "out_time_us=10000000", "out_time_ms=10000000",
+             "out_time=00:00:10.000000", "dup_frames=0", "drop_frames=0", "speed=2.5x")
+
+    def feed_block(self, parser, lines, progress="continue"):
+        for line in lines:
+            self.assertEqual(parser.feed(line), (True, None))
+        return parser.feed(f"progress={progress}")
+
+    def test_block_becomes_one_event(self):
+        parser = app.ProgressParser(duration=40.0)
+        is_progress, event = self.feed_block(parser, self.BLOCK)
+        self.assertTrue(is_progress)
+        self.assertEqual((event.stage, event.status), ("encode", "running"))
+        self.assertEqual((event.done, event.total, event.speed, event.frames), (10.0, 40.0, 2.5, 250))
+        self.assertEqual(event.percent, 25.0)
+        self.assertEqual(event.eta, 12.0)
+
+    def test_out_time_ms_is_microseconds(self):
+        parser = app.ProgressParser(duration=40.0)
+        _, event = self.feed_block(parser, ("out_time_ms=20000000", "speed=1x"))
+        self.assertEqual(event.done, 20.0)
+
+    def test_unknown_speed(self):
+        parser = app.ProgressParser(duration=40.0)
+        _, event = self.feed_block(parser, ("out_time_us=N/A", "out_time_ms=N/A", "speed=N/A"))
+        self.assertIsNone(event.done)
+        self.assertIsNone(event.speed)
+        self.assertIsNone(event.eta)
+        self.assertIsNone(event.percent)
+
+    def test_progress_end_finishes(self):
+        parser = app.ProgressParser(duration=40.0)
+        self.feed_block(parser, self.BLOCK)
+        _, event = self.feed_block(parser, ("out_time_us=40000000", "speed=2.4x"), progress="end")
+        self.assertEqual(event.status, "finished")
+        self.assertEqual(event.percent, 100.0)
+
+    def test_blocks_do_not_leak_into_each_other(self):
+        parser = app.ProgressParser(duration=40.0)
+        self.feed_block(parser, self.BLOCK)
+        _, event = self.feed_block(parser, ("out_time_us=20000000",))
+        self.assertIsNone(event.speed)
+        self.assertIsNone(event.frames)
+
+    def test_without_duration_there_is_no_percentage(self):
+        _, event = self.feed_block(app.ProgressParser(), self.BLOCK)
+        self.assertIsNone(event.percent)
+        self.assertIsNone(event.eta)
+
+
+class ShouldLogTest(unittest.TestCase):
+
+    def event(self, done, status="downloading"):
+        return app.ProgressEvent("download", status, done=done, total=1000)
+
+    def test_each_ten_percent_step_is_logged_once(self):
+        parser = app.ProgressParser()
+        logged = [done / 10 for done in range(0, 1000, 5) if parser.should_log(self.event(done))]
+        self.assertEqual(logged, [0, 10, 20, 30, 40, 50, 60, 70, 80, 90])
+
+    def test_unknown_percentage_is_not_logged(self):
+        parser = app.ProgressParser()
+        self.assertFalse(parser.should_log(app.ProgressEvent("download", "downloading", done=10)))
+
+    def test_completion_and_postprocessing_are_always_logged(self):
+        parser = app.ProgressParser()
+        self.assertTrue(parser.should_log(self.event(1000, status="finished")))
+        self.assertTrue(parser.should_log(app.ProgressEvent("postprocess", "started", detail="Merger")))
+        self.assertTrue(parser.should_log(app.ProgressEvent("postprocess", "finished", detail="Merger")))
+
+    def test_next_file_starts_over(self):
+        parser = app.ProgressParser()
+        for done in (0, 500, 1000):
+            parser.should_log(self.event(done, status="finished" if done == 1000 else "downloading"))
+        self.assertTrue(parser.should_log(self.event(0)))
+        self.assertTrue(parser.should_log(self.event(510)))
+
+
+if __name__ == "__main__":
+    unittest.main()
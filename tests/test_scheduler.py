@@ -0,0 +1,131 @@
+"""JobScheduler lane accounting when a running download hands itself to the
+encode pool (see DownloadEngine.run_download).
+
+    python -m pytest tests
+"""
+import importlib.util
+import os
+import threading
+import time
+import unittest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yt-dlp-gui.py")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("ytdlp_gui", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+app = load_app()
+
+
+class ConcurrencyProbe:
+    """Runner that records how many jobs it ran at once."""
+
+    def __init__(self, seconds=0.05):
+        self.seconds = seconds
+        self.running = 0
+        self.peak = 0
+        self.ran = []
+        self._lock = threading.Lock()
+
+    def __call__(self, job):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+            self.ran.append(job)
+
+
+class StagedHandoffTest(unittest.TestCase):
+
+    def setUp(self):
+        self.encodes = ConcurrencyProbe()
+        self.encoder = app.JobScheduler(self.encodes, max_workers=4)
+        self.scheduler = app.JobScheduler(self.run_job, max_workers=4, lane_limits={"encode": 1})
+        self.converts = ConcurrencyProbe()
+
+    def run_job(self, job):
+        if job.kind == "convert":
+            self.converts(job)
+            return
+        # What run_download does with a staged download
+        job.lane = "encode"
+        job.update(status="waiting")
+        self.encoder.submit(job)
+
+    def test_lane_counts_return_to_zero_after_staged_handoff(self):
+        for _ in range(4):
+            job = app.Job("https://example.com/video")
+            job.update(status="extracting", started_at=time.time())
+            self.scheduler.submit(job)
+        self.assertTrue(self.scheduler.wait(timeout=5))
+        self.assertTrue(self.encoder.wait(timeout=5))
+        self.assertEqual(self.scheduler.lane_counts(), {})
+        self.assertEqual(self.encoder.lane_counts(), {})
+        self.assertEqual(len(self.encodes.ran), 4)
+
+    def test_encode_cap_still_holds_after_handoff(self):
+        for _ in range(4):
+            self.scheduler.submit(app.Job("https://example.com/video"))
+        self.assertTrue(self.scheduler.wait(timeout=5))
+        for _ in range(4):
+            job = app.Job("/tmp/input.mkv", kind="convert")
+            job.lane = "encode"
+            self.scheduler.submit(job)
+        self.assertTrue(self.scheduler.wait(timeout=5))
+        self.assertEqual(self.converts.peak, 1)
+        self.assertTrue(self.encoder.wait(timeout=5))
+
+
+@unittest.skipUnless(app.CAN_PAUSE, "pausing needs SIGSTOP")
+class QueuedPauseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.gate = threading.Event()
+        self.ran = []
+        self.scheduler = app.JobScheduler(self.run_job, max_workers=1)
+
+    def run_job(self, job):
+        if job.kind == "convert":
+            self.gate.wait(5)
+        else:
+            self.ran.append((job, job.status))
+
+    def waiting_download(self):
+        job = app.Job("https://example.com/video")
+        job.update(status="waiting", started_at=time.time())
+        return job
+
+    def test_paused_waiting_job_is_held_until_resumed(self):
+        blocker = app.Job("/tmp/input.mkv", kind="convert")
+        self.scheduler.submit(blocker)
+        job = self.waiting_download()
+        self.scheduler.submit(job)
+        self.assertTrue(self.scheduler.pause(job))
+        self.gate.set()
+        self.assertFalse(self.scheduler.wait(timeout=0.3))
+        self.assertEqual(self.ran, [])
+        self.assertEqual(job.status, "paused")
+        self.assertTrue(self.scheduler.resume(job))
+        self.assertTrue(self.scheduler.wait(timeout=5))
+        self.assertEqual(self.ran, [(job, "waiting")])
+
+    def test_cancel_drops_queued_waiting_job(self):
+        blocker = app.Job("/tmp/input.mkv", kind="convert")
+        self.scheduler.submit(blocker)
+        job = self.waiting_download()
+        self.scheduler.submit(job)
+        self.assertTrue(self.scheduler.cancel(job))
+        self.gate.set()
+        self.assertTrue(self.scheduler.wait(timeout=5))
+        self.assertEqual(self.ran, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
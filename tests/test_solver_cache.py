@@ -0,0 +1,67 @@
+"""SolverScriptCache warm-up: who waits for the first YouTube probe.
+
+    python -m pytest tests
+"""
+import importlib.util
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "yt-dlp-gui.py")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("ytdlp_gui", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+app = load_app()
+
+VIDEO = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+class WarmUpTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix="ytdlp-gui-test-")
+        self.cache = app.SolverScriptCache(self.workdir)
+        self.first = self.cache.begin(VIDEO)
+
+    def tearDown(self):
+        self.cache.end(self.first)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_first_youtube_probe_holds_the_warm_up(self):
+        self.assertTrue(self.first[1])
+
+    def test_other_urls_do_not_wait(self):
+        for url in ("https://vimeo.com/76979871",
+                    "https://www.youtube.com/@channel/videos",
+                    "https://www.youtube.com/playlist?list=PL0123456789"):
+            started = time.monotonic()
+            token = self.cache.begin(url)
+            self.assertLess(time.monotonic() - started, 0.5)
+            self.assertFalse(token[1])
+            self.cache.end(token)
+
+    def test_youtube_probe_waits_a_bounded_time(self):
+        timeout = app.SOLVER_WARM_TIMEOUT
+        app.SOLVER_WARM_TIMEOUT = 0.2
+        try:
+            started = time.monotonic()
+            token = self.cache.begin("https://youtu.be/dQw4w9WgXcQ")
+            waited = time.monotonic() - started
+        finally:
+            app.SOLVER_WARM_TIMEOUT = timeout
+        self.assertFalse(token[1])
+        self.assertGreaterEqual(waited, 0.2)
+        self.assertLess(waited, 2)
+        self.cache.end(token)
+
+
+if __name__ == "__main__":
+    unittest.main()
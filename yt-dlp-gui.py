@@ -1,5 +1,3 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
 import subprocess
 import os
 import threading
@@ -10,32 +8,3556 @@ import shutil
 import json
 import webbrowser
 import queue
+import collections
+import time
+import argparse
+import hashlib
+import heapq
+import fnmatch
+import sqlite3
+import tempfile
+import signal
+import logging
+import logging.handlers
+import io
+import importlib.util
+import multiprocessing
+
+# Reference point for the startup timing report (see StartupTimer)
+PROCESS_STARTED = time.perf_counter()
+
+# Tk is imported on demand (see load_tk) so the headless batch mode can run on
+# machines without a display, or without the tkinter package at all.
+tk = ttk = messagebox = filedialog = None
 
 IS_WINDOWS = platform.system() == "Windows"
 IS_MACOS = platform.system() == "Darwin"
 IS_LINUX = platform.system() == "Linux"
 
+# Machine-readable progress: yt-dlp prints one marked, '|'-separated line per
+# tick (NA for unknown values) and ffmpeg writes key=value blocks via -progress
+PROGRESS_MARKER = "[gui-progress]"
+YTDLP_PROGRESS_TEMPLATES = (
+    "download:" + PROGRESS_MARKER + " download|%(progress.status)s|%(progress.downloaded_bytes)s|"
+    "%(progress.total_bytes)s|%(progress.total_bytes_estimate)s|%(progress.speed)s|%(progress.eta)s",
+    "postprocess:" + PROGRESS_MARKER + " postprocess|%(progress.status)s|%(progress.postprocessor)s",
+)
+_FFMPEG_PROGRESS_RE = re.compile(
+    r'^(frame|fps|stream_\d+_\d+_q|bitrate|total_size|out_time(?:_us|_ms)?|'
+    r'dup_frames|drop_frames|speed|progress)=(.*)$')
+
+# Known yt-dlp failures, matched once per line; the group name is the diagnosis
+_DIAGNOSTIC_RE = re.compile(
+    r'(?P<cookie_dpapi>failed to decrypt with dpapi)'
+    r'|(?P<cookie_locked>could not copy chrome cookie database)'
+    r'|(?P<cookie_rejected>sign in to confirm|cookies are no longer valid)'
+    r'|(?P<js_challenge>(?:signature|n challenge) solving failed)',
+    re.IGNORECASE)
+DIAGNOSTIC_MESSAGES = {
+    'cookie_dpapi': (
+        "COOKIE ERROR - DECRYPTION FAILED (DPAPI)",
+        "Chromium-based browsers (Chrome, Edge, Brave, etc.)\n"
+        "use Application Bound Encryption on Windows,\n"
+        "which prevents external tools from reading cookies.\n"
+        "\n"
+        "Workarounds:\n"
+        "  1. Switch to Firefox (recommended, not affected).\n"
+        "  2. Use 'From file' with a cookies.txt exported\n"
+        "     via the 'Get cookies.txt LOCALLY' browser\n"
+        "     extension, then select it here.\n"
+    ),
+    'cookie_locked': (
+        "COOKIE ERROR - BROWSER DATABASE IS LOCKED",
+        "Chrome, Edge, Brave, and other Chromium-based\n"
+        "browsers lock their cookie database while running.\n"
+        "\n"
+        "Workarounds:\n"
+        "  1. Close the browser completely, then retry.\n"
+        "  2. Switch to Firefox (recommended, works while open).\n"
+        "  3. Use 'From file' with a cookies.txt exported\n"
+        "     via the 'Get cookies.txt LOCALLY' browser\n"
+        "     extension, then select it here.\n"
+    ),
+    'cookie_rejected': (
+        "SIGN-IN REQUIRED - COOKIES MISSING OR EXPIRED",
+        "YouTube asked to sign in (bot check, age gate,\n"
+        "or the cookies it was given are no longer valid).\n"
+        "\n"
+        "Workarounds:\n"
+        "  1. Enable 'Use Cookies' (Firefox recommended).\n"
+        "  2. Make sure you are logged in to YouTube in that\n"
+        "     browser; browser cookies are read again for\n"
+        "     the next download.\n"
+    ),
+    'js_challenge': (
+        "JS CHALLENGE ERROR",
+        "YouTube requires solving JavaScript challenges\n"
+        "to serve video formats. Make sure you have:\n"
+        "\n"
+        "  1. Node.js installed (https://nodejs.org)\n"
+        "  2. yt-dlp is up to date (yt-dlp -U)\n"
+    ),
+}
+
+# Compression presets: name -> (target size in MB, audio bitrate in kbps)
+COMPRESSION_PRESETS = {
+    'Discord 8MB (Video)': (8, 96),
+    'Discord 25MB (Nitro Classic)': (25, 128),
+    'Discord 50MB (Nitro)': (50, 128),
+    'Discord 100MB (Nitro Boost)': (100, 192),
+    'Twitter/X 512MB': (512, 192),
+    'Instagram 100MB': (100, 192),
+    'WhatsApp 16MB': (16, 96),
+    'Telegram 2GB': (2048, 256)
+}
+DEFAULT_COMPRESSION = {'target_size': 8, 'video_bitrate': 500, 'audio_bitrate': 96}
+
+VIDEO_FORMATS = ('mp4', 'mkv', 'webm', 'avi', 'mov')
+AUDIO_FORMATS = ('mp3', 'aac', 'm4a', 'opus', 'flac', 'wav', 'ogg', 'alac')
+
+# Codecs each container can hold without re-encoding (None = accepts everything)
+CONTAINER_VIDEO_CODECS = {
+    'mp4':  ('h264', 'hevc', 'mpeg4', 'av1'),
+    'mov':  ('h264', 'hevc', 'mpeg4'),
+    'mkv':  None,
+    'webm': ('vp8', 'vp9', 'av1'),
+    'avi':  ('mpeg4', 'msmpeg4v3', 'mjpeg', 'h264'),
+}
+CONTAINER_AUDIO_CODECS = {
+    'mp4':  ('aac', 'mp3', 'ac3', 'eac3', 'flac', 'alac', 'opus'),
+    'mov':  ('aac', 'mp3', 'ac3', 'alac', 'pcm_s16le'),
+    'mkv':  None,
+    'webm': ('vorbis', 'opus'),
+    'avi':  ('mp3', 'ac3', 'pcm_s16le'),
+}
+
+# Direct downloads copy source streams into the container, so H.264 (which few
+# players accept in AVI) is not copied there; everything else as above
+DIRECT_VIDEO_CODECS = dict(CONTAINER_VIDEO_CODECS, avi=('mpeg4', 'msmpeg4v3', 'mjpeg'))
+# yt-dlp codec ids (avc1.64001F, mp4a.40.2, ...) by prefix -> ffprobe codec names
+FORMAT_CODEC_PREFIXES = (
+    ("avc", "h264"), ("h264", "h264"), ("hvc1", "hevc"), ("hev1", "hevc"), ("hevc", "hevc"),
+    ("vp09", "vp9"), ("vp9", "vp9"), ("vp8", "vp8"), ("av01", "av1"), ("mp4v", "mpeg4"),
+    ("mp4a", "aac"), ("aac", "aac"), ("opus", "opus"), ("vorbis", "vorbis"), ("mp3", "mp3"),
+    ("ac-3", "ac3"), ("ec-3", "eac3"), ("flac", "flac"),
+)
+# A compressed download uses source formats as they are when their estimated
+# size is within FORMAT_PICK_MARGIN of the target and fills at least
+# FORMAT_PICK_MIN_FILL of it (a much smaller pick looks worse than an encode)
+FORMAT_PICK_MARGIN = 0.95
+FORMAT_PICK_MIN_FILL = 0.5
+
+# Encoder speed/size trade-offs: profile -> libx264 preset, libvpx-vp9 -cpu-used
+# (lower is slower and smaller; first passes never go below 4)
+PERFORMANCE_PROFILES = {
+    'fastest':  {'x264_preset': 'veryfast', 'vp9_cpu_used': 5},
+    'balanced': {'x264_preset': 'medium', 'vp9_cpu_used': 3},
+    'smallest': {'x264_preset': 'slow', 'vp9_cpu_used': 1},
+}
+DEFAULT_PERFORMANCE_PROFILE = 'balanced'
+
+# Target-size encodes: measured output may miss by this much before a corrective
+# pass runs (overshoot is never tolerated: an encode with no attempt within the
+# target fails), and at most this many second passes run
+SIZE_TARGET_UNDERSHOOT = 0.85
+SIZE_TARGET_MAX_ATTEMPTS = 3
+
+# App state (download archive, job journal) lives in this SQLite file next to
+# the config; running jobs write their byte progress at most this often (s)
+STATE_DB_NAME = ".ytdlp-gui-state.db"
+JOURNAL_PROGRESS_INTERVAL = 2.0
+
+# Each download works in its own folder here (inside the output folder): compressed
+# downloads land in it before being encoded, others keep their .part files there
+STAGING_DIRNAME = ".ytdlp-staging"
+
+# Cancelling asks a process to exit (SIGTERM) and kills it after this many seconds
+CANCEL_GRACE_SECONDS = 5.0
+# Pausing suspends the process group (SIGSTOP/SIGCONT); not available on Windows
+CAN_PAUSE = hasattr(signal, "SIGSTOP")
+
+# Queued jobs start highest priority first, then in submission order
+JOB_PRIORITIES = {"High": 1, "Normal": 0, "Low": -1}
+
+# yt-dlp networking. None means auto: fragment concurrency comes from a
+# connection budget shared by the parallel downloads (at most
+# MAX_AUTO_FRAGMENTS each), chunk size from DEFAULT_HTTP_CHUNK_SIZE, buffer
+# size from yt-dlp itself. Sizes are yt-dlp style strings ("10M", "16K").
+NETWORK_DEFAULTS = {
+    "concurrent_fragments": None,
+    "http_chunk_size": None,
+    "buffer_size": None,
+    "external_downloader": None,
+    "retries": 10,
+    "fragment_retries": 10,
+}
+FRAGMENT_CONNECTION_BUDGET = 16
+MAX_AUTO_FRAGMENTS = 8
+# Chunked HTTP requests also sidestep YouTube's per-connection throttling
+DEFAULT_HTTP_CHUNK_SIZE = "10M"
+EXTERNAL_DOWNLOADERS = ("aria2c",)
+
+# GUI console: lines kept in the widget; everything also goes to a rotating log
+DEFAULT_CONSOLE_MAX_LINES = 2000
+CONSOLE_LOG_BYTES = 5 * 1024 * 1024
+CONSOLE_LOG_BACKUPS = 3
+# Console drain interval (ms): fastest while a backlog remains, normal after a
+# busy tick, doubling up to the idle ceiling while nothing arrives
+CONSOLE_POLL_BACKLOG_MS = 16
+CONSOLE_POLL_MS = 50
+CONSOLE_POLL_IDLE_MS = 500
+
+# External binaries the app uses and how each reports its version. Resolved
+# paths and versions are cached in the config (see BinaryRegistry).
+BINARY_VERSION_ARGS = {
+    "yt-dlp": ["--version"],
+    "ffmpeg": ["-version"],
+    "ffprobe": ["-version"],
+    "node": ["--version"],
+}
+# In-process yt-dlp (see YtDlpWorkerPool): idle workers kept for the next job,
+# and the minimum gap between download progress updates a worker sends
+YTDLP_POOL_MAX_IDLE = 4
+YTDLP_POOL_PROGRESS_INTERVAL = 0.1
+# YoutubeDL instances a worker keeps for extract-only commands (see _YtDlpWorker)
+YTDLP_POOL_REUSE_INSTANCES = 2
+# Browser cookies are read into a private cookie file once and reused for this
+# long (or until a download reports them rejected), see CookieBroker
+COOKIE_JAR_TTL_SECONDS = 30 * 60
+# yt-dlp keeps the EJS challenge-solver scripts it fetches for
+# --remote-components in <cache dir>/challenge-solver/<script>.json, tagged with
+# the script version. Every command is pointed at one cache dir of the app's own
+# (or --solver-cache), see SolverScriptCache
+SOLVER_CACHE_DIRNAME = "yt-dlp"
+SOLVER_CACHE_SECTION = "challenge-solver"
+SOLVER_SCRIPTS = ("lib", "core")
+# Longest a YouTube probe waits for the first one to fetch the scripts
+# before going ahead on its own
+SOLVER_WARM_TIMEOUT = 60
+# Per-job metrics (see MetricsRegistry): written to logs/ next to the console
+# log unless --metrics-dir says otherwise. Histogram bucket bounds per metric;
+# the JSON lines file is rotated once past METRICS_JSONL_BYTES
+METRICS_PREFIX = "ytdlp_gui_"
+METRICS = {
+    "jobs_total": ("counter", "Finished jobs by kind and final status"),
+    "subprocesses_total": ("counter", "External commands (yt-dlp, ffmpeg, ffprobe) run for jobs"),
+    "downloaded_bytes_total": ("counter", "Bytes downloaded by yt-dlp"),
+    "encoded_frames_total": ("counter", "Video frames encoded by ffmpeg"),
+    "job_seconds": ("histogram", "Time from start to finish per job",
+                    (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)),
+    "stage_seconds": ("histogram", "Time per job spent in each stage (job status)",
+                      (0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800)),
+    "download_speed_bytes": ("histogram", "Average download speed per job in bytes/s",
+                             (64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2,
+                              64 * 1024 ** 2)),
+    "encode_fps": ("histogram", "Average video encode speed per job in frames/s",
+                   (5, 15, 30, 60, 120, 240, 480)),
+}
+METRICS_JSONL_BYTES = 5 * 1024 * 1024
+# Time from process start to an interactive window the startup report warns above
+STARTUP_BUDGET_SECONDS = 1.5
+
+MEDIA_EXTENSIONS = ('mp4', 'mkv', 'webm', 'avi', 'mov', 'mp3', 'aac', 'm4a', 'opus', 'flac',
+                    'wav', 'ogg', 'alac', 'wma', 'wmv', 'ts', 'flv')
+
+def load_tk():
+    """Import tkinter into the module globals (GUI mode only)."""
+    global tk, ttk, messagebox, filedialog
+    import tkinter as tk
+    from tkinter import ttk, messagebox, filedialog
+
+def get_base_path():
+    """Get the base directory of the application"""
+    if getattr(sys, 'frozen', False):
+        # Running as compiled executable
+        return os.path.dirname(sys.executable)
+    else:
+        # Running as script
+        return os.path.dirname(os.path.abspath(__file__))
+
+def compression_spec_for_preset(preset):
+    """Return the compression spec for a preset name; the video bitrate is
+    left to be calculated from the real duration."""
+    target_size_mb, audio_bitrate = COMPRESSION_PRESETS.get(preset, (8, 96))
+    return {'target_size': target_size_mb, 'video_bitrate': None, 'audio_bitrate': audio_bitrate}
+
+def codec_compatibility(output_format, media):
+    """Return (video_ok, audio_ok): whether each source stream can be stream-copied
+    into output_format. Unknown codecs are treated as incompatible; a stream the
+    probe shows is absent needs no encoding and counts as compatible."""
+    supported_v = CONTAINER_VIDEO_CODECS.get(output_format)
+    supported_a = CONTAINER_AUDIO_CODECS.get(output_format)
+    vcodec = media.video_codec if media else None
+    acodec = media.audio_codec if media else None
+    v_ok = supported_v is None or (vcodec in supported_v if vcodec else bool(media and not media.video_stream))
+    a_ok = supported_a is None or (acodec in supported_a if acodec else bool(media and not media.audio_stream))
+    return v_ok, a_ok
+
+def parse_timestamp(text):
+    """Parse '83', '1:23', '1:02:03.5' into seconds; blank gives None. Raises ValueError.
+    Minutes and seconds after the first field must be below 60, and only the
+    last field may have a fraction."""
+    text = str(text).strip()
+    if not text:
+        return None
+    parts = text.split(":")
+    if len(parts) > 3:
+        raise ValueError(f"invalid time: {text!r}")
+    seconds = 0.0
+    for index, part in enumerate(parts):
+        pattern = r'^\d+(\.\d+)?$' if index == len(parts) - 1 else r'^\d+$'
+        if not re.match(pattern, part):
+            raise ValueError(f"invalid time: {text!r}")
+        value = float(part)
+        if index and value >= 60:
+            raise ValueError(f"invalid time: {text!r} (minutes and seconds go up to 59)")
+        seconds = seconds * 60 + value
+    return seconds
+
+def make_clip(start=None, end=None):
+    """Validated (start, end) section in seconds, or None for the whole video.
+    Either side may be None (from the beginning / to the end). Raises ValueError."""
+    if start is None and end is None:
+        return None
+    if end is not None and end <= (start or 0):
+        raise ValueError("the clip end must be after its start")
+    return (start, end)
+
+def clip_length(clip, duration):
+    """Seconds covered by a clip of a `duration`-long source (None if unknown)."""
+    start, end = clip
+    if duration:
+        end = duration if end is None else min(end, duration)
+    if end is None:
+        return None
+    return max(0.0, end - (start or 0))
+
+def _clip_time_label(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    whole, _, fraction = f"{secs:g}".partition(".")
+    fraction = f".{fraction}" if fraction else ""
+    if hours:
+        return f"{int(hours)}h{int(minutes):02d}m{int(whole):02d}{fraction}s"
+    return f"{int(minutes)}m{int(whole):02d}{fraction}s" if minutes else f"{whole}{fraction}s"
+
+def clip_label(clip):
+    """Filename-safe clip description, e.g. '1m05s-1m30s' or '45s-end'."""
+    start, end = clip
+    return f"{_clip_time_label(start or 0)}-{_clip_time_label(end) if end is not None else 'end'}"
+
+def format_codec(codec):
+    """ffprobe-style name for a yt-dlp vcodec/acodec value; None for 'none' or unknown."""
+    if not codec or codec == "none":
+        return None
+    codec = codec.lower()
+    for prefix, name in FORMAT_CODEC_PREFIXES:
+        if codec.startswith(prefix):
+            return name
+    return codec
+
+def find_media_files(root, patterns=None, recursive=True):
+    """List media files under root matching any of the glob patterns (sorted)."""
+    patterns = patterns or [f"*.{ext}" for ext in MEDIA_EXTENSIONS]
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in filenames:
+            if any(fnmatch.fnmatch(name.lower(), pattern.lower()) for pattern in patterns):
+                found.append(os.path.join(dirpath, name))
+        if not recursive:
+            break
+    return sorted(found)
+
+def conversion_targets(inputs, output_dir, output_format, input_root=None, suffix=""):
+    """Pair each input file with its output path (`suffix` is added to the name).
+    Files found under input_root keep their relative sub-folder; clashing
+    names (clip.mp4 and clip.mkv -> clip.mp4) get a numbered suffix."""
+    taken = set()
+    for input_path in inputs:
+        rel_dir = ""
+        if input_root:
+            rel_dir = os.path.relpath(os.path.dirname(input_path), input_root)
+            rel_dir = "" if rel_dir == "." else rel_dir
+        stem = os.path.splitext(os.path.basename(input_path))[0] + suffix
+        output_path = os.path.join(output_dir, rel_dir, f"{stem}.{output_format}")
+        counter = 2
+        while os.path.normcase(output_path) in taken:
+            output_path = os.path.join(output_dir, rel_dir, f"{stem} ({counter}).{output_format}")
+            counter += 1
+        taken.add(os.path.normcase(output_path))
+        yield input_path, output_path
+
+# Video URLs whose (extractor, id) is known without asking yt-dlp
+_YOUTUBE_ID_RE = re.compile(
+    r'^https?://(?:(?:www|m|music)\.)?(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|live/|embed/)'
+    r'|youtu\.be/)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])')
+
+def url_video_key(url):
+    """(extractor, video id) for URLs recognisable offline, else None.
+    Watch URLs that also name a playlist are left to the probe."""
+    match = _YOUTUBE_ID_RE.match(url)
+    if match and "list=" not in url:
+        return "Youtube", match.group(1)
+    return None
+
+def terminate_orphan(pid, names=("yt-dlp", "ffmpeg")):
+    """Kill a process left behind by a previous run of the app, but only if
+    it still looks like one of our tools (pids get reused). Returns True if
+    a process was terminated."""
+    try:
+        if IS_WINDOWS:
+            listing = subprocess.run(["tasklist", "/FI", f"PID eq {pid}", "/FO", "CSV", "/NH"],
+                                     capture_output=True, text=True, creationflags=subprocess_flags())
+            if not any(name in listing.stdout.lower() for name in names):
+                return False
+            subprocess.run(["taskkill", "/PID", str(pid), "/T", "/F"],
+                           capture_output=True, creationflags=subprocess_flags())
+            return True
+        if os.path.exists(f"/proc/{pid}/cmdline"):
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                command = f.read().replace(b"\0", b" ").decode("utf-8", "replace").lower()
+        else:
+            command = subprocess.run(["ps", "-p", str(pid), "-o", "command="],
+                                     capture_output=True, text=True).stdout.lower()
+        if not any(name in command for name in names):
+            return False
+        # SIGTERM; yt-dlp keeps its .part file for --continue. Our children lead
+        # their own process group, which also holds yt-dlp's ffmpeg
+        try:
+            os.killpg(pid, signal.SIGTERM)
+            os.killpg(pid, signal.SIGCONT)  # in case it was left paused
+        except OSError:
+            os.kill(pid, signal.SIGTERM)
+        return True
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+def signal_process_group(process, sig):
+    """Send `sig` to a child started with start_new_session (POSIX only), so
+    helpers it spawned (yt-dlp's ffmpeg) get it too."""
+    try:
+        os.killpg(process.pid, sig)
+    except OSError:
+        try:
+            process.send_signal(sig)
+        except OSError:
+            pass
+
+def stop_process(process, grace=CANCEL_GRACE_SECONDS):
+    """Ask a child process (and its children) to exit, killing it if it is still
+    running after `grace` seconds. Returns immediately."""
+    if process.poll() is not None:
+        return
+    if IS_WINDOWS:
+        subprocess.run(["taskkill", "/PID", str(process.pid), "/T", "/F"],
+                       capture_output=True, creationflags=subprocess_flags())
+        return
+    signal_process_group(process, signal.SIGTERM)
+    # A stopped (paused) process only acts on SIGTERM once it is continued
+    signal_process_group(process, signal.SIGCONT)
+    def kill_if_alive():
+        if process.poll() is None:
+            signal_process_group(process, signal.SIGKILL)
+    timer = threading.Timer(grace, kill_if_alive)
+    timer.daemon = True
+    timer.start()
+
+def priority_name(priority):
+    for name, value in JOB_PRIORITIES.items():
+        if value == priority:
+            return name
+    return str(priority)
+
+_SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?(?:/s)?\s*$', re.IGNORECASE)
+
+def parse_size(text):
+    """Parse a size or rate such as '500K', '2.5M', '4M/s' or '1048576'
+    (yt-dlp style) into bytes. Raises ValueError."""
+    match = _SIZE_RE.match(str(text))
+    if not match:
+        raise ValueError(f"invalid size: {text!r}")
+    scale = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}[match.group(2).upper()]
+    return int(float(match.group(1)) * scale)
+
 def subprocess_flags():
     """Return platform-appropriate subprocess creation flags."""
     if IS_WINDOWS:
         return subprocess.CREATE_NO_WINDOW
     return 0
 
+
+class Job:
+    """A single queued unit of work and its current state.
+    Worker threads mutate jobs; the UI thread picks up changes via `changed`."""
+    _next_id = 1
+    _id_lock = threading.Lock()
+    # Fields whose changes JobJournal.save writes out
+    JOURNALED = ("status", "output_path", "pid", "command")
+
+    def __init__(self, url, kind="download", options=None):
+        with Job._id_lock:
+            self.id = Job._next_id
+            Job._next_id += 1
+        self.url = url
+        self.kind = kind
+        self.options = options
+        self.lane = None
+        self.priority = JOB_PRIORITIES["Normal"]
+        self.title = ""
+        self.status = "queued"
+        self.progress = ""
+        self.parent_id = None   # playlist job this entry was expanded from
+        self.command = None     # external command currently running, and its pid
+        self.pid = None
+        self.process = None     # its Popen handle, for cancel/pause (see attach_process)
+        self.staged = None      # (metadata, staging dir, paths file) between download and encode
+        self.cancel_requested = False
+        self.paused = False
+        self._status_before_pause = None
+        self.journal = None     # JobJournal row this job writes to (see update)
+        self.journal_id = None
+        self.metrics = JobMetrics()
+        self.recorder = None    # MetricsRegistry that gets the metrics once the job finishes
+        # Latest parsed progress: percent of the current stage, seconds left
+        self.percent = None
+        self.eta = None
+        self.returncode = None
+        self.error = None
+        # Conversion jobs: where the result goes and how it is produced
+        self.output_path = None
+        self.output_format = None
+        self.compression = None
+        self.clip = None
+        self.action = None
+        self.started_at = None
+        self.finished_at = None
+        self.changed = True
+
+    def update(self, **fields):
+        """Set one or more attributes and flag the job for a UI refresh.
+        Status, output and process changes are also written to the journal;
+        repeating the current value (as every progress tick does) is not.
+        Every status change starts a stage in the job's metrics."""
+        journaled = any(name in Job.JOURNALED and getattr(self, name) != value
+                        for name, value in fields.items())
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.changed = True
+        if self.journal and journaled:
+            self.journal.save(self)
+        if "status" in fields:
+            self.metrics.enter(self.status, time.time())
+            if self.recorder and self.finished and not self.metrics.recorded:
+                self.metrics.recorded = True
+                self.recorder.record(self)
+
+    @property
+    def finished(self):
+        return self.status in ("done", "skipped", "failed", "cancelled")
+
+    def attach_process(self, process, command):
+        """Make `process` the job's running child. A cancel or pause requested
+        while no process was running is applied to it right away."""
+        self.process = process
+        self.metrics.processes += 1
+        self.update(command=command, pid=process.pid)
+        if self.cancel_requested:
+            stop_process(process)
+        elif self.paused and CAN_PAUSE:
+            signal_process_group(process, signal.SIGSTOP)
+
+    def release_process(self):
+        self.process = None
+
+    def cancel(self):
+        """Cancel the job. A queued job is finished at once; a running one has its
+        process stopped and is marked cancelled by the worker once it exits."""
+        if self.finished:
+            return
+        self.cancel_requested = True
+        if not self.started_at:
+            self.update(status="cancelled", progress="", finished_at=time.time())
+            return
+        self.update(progress="cancelling...")
+        process = self.process
+        if process:
+            stop_process(process)
+
+    def pause(self):
+        """Suspend the running process (frees its CPU and bandwidth). Returns True if paused."""
+        if not CAN_PAUSE or self.paused or self.finished or not self.started_at:
+            return False
+        self._status_before_pause = self.status
+        self.paused = True
+        process = self.process
+        if process:
+            signal_process_group(process, signal.SIGSTOP)
+        self.update(status="paused", eta=None)
+        return True
+
+    def resume(self):
+        """Continue a paused job. Returns True if it was paused."""
+        if not self.paused:
+            return False
+        self.paused = False
+        process = self.process
+        if process:
+            signal_process_group(process, signal.SIGCONT)
+        if self.status == "paused":
+            self.update(status=self._status_before_pause or "queued")
+        return True
+
+
+class JobMetrics:
+    """Where one job's time went and what it moved: stage timestamps (one per
+    status change, see Job.update), downloaded bytes and speeds from yt-dlp
+    progress, frames and time of ffmpeg video encodes, and the number of
+    external commands run. MetricsRegistry aggregates and exports them."""
+
+    def __init__(self):
+        self.stages = []            # (status, entered at) in order
+        self.bytes = 0              # finished files; yt-dlp counts each file from 0
+        self._file_bytes = 0
+        self.peak_speed = None
+        self.encode_frames = 0
+        self.encode_seconds = 0.0
+        self.processes = 0
+        self.recorded = False
+
+    def enter(self, status, now):
+        if not self.stages or self.stages[-1][0] != status:
+            self.stages.append((status, now))
+
+    def download_progress(self, event):
+        """Account one yt-dlp download ProgressEvent."""
+        if event.done is not None:
+            if event.done < self._file_bytes:
+                self.bytes += self._file_bytes
+            self._file_bytes = int(event.done)
+        if event.speed:
+            self.peak_speed = max(self.peak_speed or 0, round(event.speed, 1))
+
+    def encoded(self, frames, seconds):
+        self.encode_frames += int(frames)
+        self.encode_seconds += seconds
+
+    @property
+    def downloaded_bytes(self):
+        return self.bytes + self._file_bytes
+
+    def stage_seconds(self):
+        """{status: seconds} for every stage the job has left; the final status
+        (done, failed, ...) has no duration."""
+        seconds = {}
+        for (status, start), (_, end) in zip(self.stages, self.stages[1:]):
+            seconds[status] = seconds.get(status, 0.0) + end - start
+        return seconds
+
+    @property
+    def elapsed(self):
+        return self.stages[-1][1] - self.stages[0][1] if len(self.stages) > 1 else 0.0
+
+    @property
+    def average_speed(self):
+        seconds = self.stage_seconds().get("downloading")
+        return self.downloaded_bytes / seconds if seconds and self.downloaded_bytes else None
+
+    @property
+    def encode_fps(self):
+        return self.encode_frames / self.encode_seconds if self.encode_frames and self.encode_seconds else None
+
+    def to_dict(self):
+        stages = [{"stage": status, "start": round(start, 3),
+                   "seconds": round(end - start, 3) if end is not None else None}
+                  for (status, start), (_, end) in zip(self.stages, self.stages[1:] + [(None, None)])]
+        return {
+            "seconds": round(self.elapsed, 3),
+            "stages": stages,
+            "bytes": self.downloaded_bytes,
+            "average_speed": round(self.average_speed, 1) if self.average_speed else None,
+            "peak_speed": self.peak_speed,
+            "encode_frames": self.encode_frames,
+            "encode_fps": round(self.encode_fps, 2) if self.encode_fps else None,
+            "subprocesses": self.processes,
+        }
+
+
+class DownloadOptions:
+    """Plain snapshot of every setting that shapes a download.
+    The GUI builds one from its Tk variables and the headless mode from the
+    command line, so command construction never has to touch Tk.
+    compression: None or a spec dict ('target_size', 'video_bitrate' or None
+    for auto, 'audio_bitrate')."""
+
+    def __init__(self, output_dir, media="video", video_format="mp4", audio_format="mp3",
+                 compression=None, age_limit=None, cookies_browser=None, cookies_file=None,
+                 force=False, clip=None):
+        self.output_dir = output_dir
+        self.media = media
+        self.video_format = video_format
+        self.audio_format = audio_format
+        self.compression = compression
+        self.age_limit = age_limit
+        self.cookies_browser = cookies_browser
+        self.cookies_file = cookies_file
+        self.force = force          # download even if the archive already has it
+        self.clip = tuple(clip) if clip else None   # (start, end) seconds, see make_clip
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def settings_label(self):
+        """Human-readable form of the settings behind settings_key()."""
+        fmt = self.video_format if self.media == "video" else self.audio_format
+        label = f"{self.media} {fmt}"
+        if self.compression:
+            label += f", {self.compression['target_size']}MB"
+        if self.clip:
+            label += f", clip {clip_label(self.clip)}"
+        return label
+
+    def settings_key(self):
+        """Short stable key for everything that changes the produced file, so an
+        archived download only counts as done for the same settings."""
+        fmt = self.video_format if self.media == "video" else self.audio_format
+        compression = self.compression or {}
+        shape = [self.media, fmt, compression.get('target_size'), compression.get('video_bitrate'),
+                 compression.get('audio_bitrate'), os.path.normcase(os.path.abspath(self.output_dir))]
+        if self.clip:
+            shape.append(list(self.clip))   # appended only when set, so older keys stay valid
+        return hashlib.sha1(json.dumps(shape).encode("utf-8")).hexdigest()[:16]
+
+
+class JobScheduler:
+    """Run jobs on a bounded pool of worker threads.
+    Jobs start by priority, then in submission order, as slots free up. A job may name a `lane`
+    with its own concurrency cap (e.g. CPU-heavy encodes); jobs in other lanes
+    can overtake it while that lane is full. The pool size can be changed at
+    any time; it takes effect on the next dispatch. A running job may change
+    its lane (a staged download moving on to the encode lane); the slot is
+    still returned to the lane it was started in."""
+
+    def __init__(self, runner, max_workers=2, lane_limits=None):
+        self._runner = runner
+        self._max_workers = max(1, int(max_workers))
+        self._lane_limits = dict(lane_limits or {})
+        self._lane_counts = collections.Counter()
+        self._pending = {}   # lane -> heap of (-priority, sequence, job)
+        self._held = {}      # paused queued job -> its heap entry, requeued on resume
+        self._sequence = 0
+        self._running = {}   # job -> lane it was started in
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    @property
+    def max_workers(self):
+        return self._max_workers
+
+    def set_max_workers(self, count):
+        """Resize the pool; extra jobs are started immediately if it grew."""
+        with self._lock:
+            self._max_workers = max(1, int(count))
+            self._dispatch_locked()
+
+    def set_lane_limit(self, lane, limit):
+        """Cap concurrent jobs in a lane (None removes the cap)."""
+        with self._lock:
+            if limit is None:
+                self._lane_limits.pop(lane, None)
+            else:
+                self._lane_limits[lane] = max(1, int(limit))
+            self._dispatch_locked()
+
+    def submit(self, job):
+        """Queue a job and start it right away if a worker slot is free.
+        A paused job is held back until resume()."""
+        with self._lock:
+            self._sequence += 1
+            entry = (-job.priority, self._sequence, job)
+            if job.paused:
+                self._held[job] = entry
+                return
+            heapq.heappush(self._pending.setdefault(job.lane, []), entry)
+            self._dispatch_locked()
+
+    def cancel(self, job):
+        """Cancel a job: dropped from the queue if pending, else its process is stopped.
+        Returns True if the job was still queued here."""
+        with self._lock:
+            queued = bool(self._remove_pending_locked(job) or self._held.pop(job, None))
+            if not self._has_work_locked():
+                self._idle.notify_all()
+        job.cancel()
+        return queued
+
+    def pause(self, job):
+        """Pause a job (see Job.pause). A queued job that has already started,
+        like a staged download waiting for an encode slot, is held back
+        until resumed. Returns True if paused."""
+        if not job.pause():
+            return False
+        with self._lock:
+            entry = self._remove_pending_locked(job)
+            if entry:
+                self._held[job] = entry
+        return True
+
+    def resume(self, job):
+        """Resume a paused job; a held one goes back to its place in the queue."""
+        if not job.resume():
+            return False
+        with self._lock:
+            entry = self._held.pop(job, None)
+            if entry:
+                heapq.heappush(self._pending.setdefault(job.lane, []), entry)
+                self._dispatch_locked()
+        return True
+
+    def set_priority(self, job, priority):
+        """Change a job's priority; a pending job moves to its new place in the queue."""
+        with self._lock:
+            entry = self._remove_pending_locked(job)
+            job.update(priority=priority)
+            if entry:
+                heapq.heappush(self._pending[job.lane], (-priority, entry[1], job))
+                self._dispatch_locked()
+
+    def expected_concurrency(self):
+        """How many jobs will run side by side once the queue has filled the pool."""
+        with self._lock:
+            pending = sum(len(jobs) for jobs in self._pending.values())
+            return max(1, min(self._max_workers, len(self._running) + pending))
+
+    def _remove_pending_locked(self, job):
+        for jobs in self._pending.values():
+            for entry in jobs:
+                if entry[2] is job:
+                    jobs.remove(entry)
+                    heapq.heapify(jobs)
+                    return entry
+        return None
+
+    def active_count(self):
+        with self._lock:
+            return len(self._running)
+
+    def pending_count(self):
+        with self._lock:
+            return sum(len(jobs) for jobs in self._pending.values()) + len(self._held)
+
+    def lane_counts(self):
+        """Running jobs per lane they were started in."""
+        with self._lock:
+            return {lane: count for lane, count in self._lane_counts.items() if count}
+
+    def is_idle(self):
+        with self._lock:
+            return not self._has_work_locked()
+
+    def _has_work_locked(self):
+        return bool(self._running or self._held or any(self._pending.values()))
+
+    def wait(self, timeout=None):
+        """Block until every submitted job has finished. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._has_work_locked():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _next_lane_locked(self):
+        """Pending heap whose first job should start next, or None if all are blocked.
+        (The heap rather than the lane is returned: None is itself a valid lane.)"""
+        best = None
+        for lane, jobs in self._pending.items():
+            if not jobs:
+                continue
+            limit = self._lane_limits.get(lane)
+            if limit is not None and self._lane_counts[lane] >= limit:
+                continue
+            if best is None or jobs[0][:2] < best[0][:2]:
+                best = jobs
+        return best
+
+    def _dispatch_locked(self):
+        while len(self._running) < self._max_workers:
+            jobs = self._next_lane_locked()
+            if jobs is None:
+                break
+            _, _, job = heapq.heappop(jobs)
+            if job.finished:
+                continue    # cancelled while it was queued
+            lane = job.lane
+            self._running[job] = lane
+            self._lane_counts[lane] += 1
+            threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        try:
+            self._runner(job)
+        except Exception as e:
+            job.update(status="failed", error=str(e))
+        finally:
+            with self._lock:
+                # job.lane may have changed while it ran
+                self._lane_counts[self._running.pop(job)] -= 1
+                self._dispatch_locked()
+                if not self._has_work_locked():
+                    self._idle.notify_all()
+
+
+class VideoMetadata:
+    """Result of a single yt-dlp --dump-single-json probe.
+    info_path points at the JSON on disk for --load-info-json."""
+
+    def __init__(self, url, info, info_path):
+        self.url = url
+        self.info = info
+        self.info_path = info_path
+        self.fetched_at = time.time()
+
+    @property
+    def title(self):
+        return self.info.get("title") or self.url
+
+    @property
+    def duration(self):
+        duration = self.info.get("duration")
+        return float(duration) if duration else None
+
+    @property
+    def extractor(self):
+        return self.info.get("extractor_key") or self.info.get("extractor")
+
+    @property
+    def video_id(self):
+        return self.info.get("id")
+
+    @property
+    def is_playlist(self):
+        return self.info.get("_type") == "playlist"
+
+    @property
+    def formats(self):
+        return self.info.get("formats") or []
+
+    @property
+    def entries(self):
+        """Playlist entries (flat: id, url, title, ie_key), skipping unavailable ones."""
+        return [entry for entry in self.info.get("entries") or [] if entry]
+
+    @staticmethod
+    def entry_url(entry):
+        url = entry.get("webpage_url") or entry.get("url") or ""
+        return url if re.match(r'^https?://', url) else None
+
+    def estimate_filesize(self, fmt):
+        """Best available size estimate for a format dict, in bytes (or None)."""
+        size = fmt.get("filesize") or fmt.get("filesize_approx")
+        if not size and fmt.get("tbr") and self.duration:
+            size = fmt["tbr"] * 1000 / 8 * self.duration
+        return int(size) if size else None
+
+    def pick_formats(self, container, max_bytes=None):
+        """Best format (or video+audio pair) whose streams `container` holds
+        without re-encoding, optionally no larger than max_bytes (estimated).
+        Highest resolution wins, then the largest size. Returns
+        (selector, estimated bytes, height), or None."""
+        video_codecs = DIRECT_VIDEO_CODECS.get(container)
+        audio_codecs = CONTAINER_AUDIO_CODECS.get(container)
+        def fits(codec, allowed):
+            return codec is not None and (allowed is None or codec in allowed)
+        candidates, videos, audios = [], [], []
+        for fmt in self.formats:
+            size = self.estimate_filesize(fmt)
+            if not fmt.get("format_id") or not size:
+                continue
+            vcodec, acodec = format_codec(fmt.get("vcodec")), format_codec(fmt.get("acodec"))
+            if vcodec and acodec:
+                if fits(vcodec, video_codecs) and fits(acodec, audio_codecs):
+                    candidates.append((fmt["format_id"], size, fmt.get("height") or 0))
+            elif vcodec:
+                if fits(vcodec, video_codecs):
+                    videos.append((fmt["format_id"], size, fmt.get("height") or 0))
+            elif fits(acodec, audio_codecs):
+                audios.append((fmt["format_id"], size))
+        for video_id, video_size, height in videos:
+            for audio_id, audio_size in audios:
+                candidates.append((f"{video_id}+{audio_id}", video_size + audio_size, height))
+        if max_bytes:
+            candidates = [c for c in candidates if c[1] <= max_bytes]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda c: (c[2], c[1]))
+
+
+class MetadataCache:
+    """URL -> VideoMetadata cache with a TTL, backed by info JSON files.
+    Media URLs inside the info expire after a few hours, so entries are only
+    reused for `ttl` seconds. Info files from an earlier run are picked up
+    while they are still fresh."""
+
+    def __init__(self, directory, ttl=1800):
+        self.directory = directory
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _path_for(self, url):
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.info.json")
+
+    def get(self, url):
+        """Return fresh cached metadata for url, or None."""
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry and time.time() - entry.fetched_at < self.ttl and os.path.isfile(entry.info_path):
+            return entry
+
+        # Fall back to an info file left by an earlier run
+        path = self._path_for(url)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age < self.ttl:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = VideoMetadata(url, json.load(f), path)
+                entry.fetched_at = time.time() - age
+                with self._lock:
+                    self._entries[url] = entry
+                return entry
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def store(self, url, info):
+        """Write the info JSON to disk and cache it; returns the VideoMetadata."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path_for(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        os.replace(tmp_path, path)
+
+        entry = VideoMetadata(url, info, path)
+        with self._lock:
+            self._entries[url] = entry
+        self._prune()
+        return entry
+
+    def _prune(self):
+        """Drop expired entries and their info files."""
+        now = time.time()
+        with self._lock:
+            for url in [u for u, e in self._entries.items() if now - e.fetched_at >= self.ttl]:
+                del self._entries[url]
+        try:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.endswith(".info.json") and now - os.path.getmtime(path) >= self.ttl:
+                    os.remove(path)
+        except OSError:
+            pass
+
+
+class StateStore:
+    """The app's SQLite state database (next to the config file), shared by
+    the download archive, the job journal and the media probe cache. One
+    connection per process, serialised by a lock. Best effort: database errors
+    are swallowed, so a locked or read-only database never fails a download."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect_locked(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS downloads ("
+                " extractor TEXT NOT NULL, video_id TEXT NOT NULL, settings TEXT NOT NULL,"
+                " url TEXT, title TEXT, output_path TEXT, finished_at REAL NOT NULL,"
+                " PRIMARY KEY (extractor, video_id, settings))")
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(downloads)")}
+            if "label" not in columns:
+                conn.execute("ALTER TABLE downloads ADD COLUMN label TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS downloads_url ON downloads (url, settings)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, kind TEXT NOT NULL,"
+                " url TEXT NOT NULL, spec TEXT NOT NULL, status TEXT NOT NULL, stage TEXT,"
+                " output_path TEXT, bytes_done REAL, bytes_total REAL, command TEXT, pid INTEGER,"
+                " created_at REAL NOT NULL, updated_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (origin, status)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS media_info ("
+                " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime INTEGER NOT NULL,"
+                " probe TEXT NOT NULL, stored_at REAL NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def query(self, sql, params=()):
+        """Rows as dicts (empty on error)."""
+        with self._lock:
+            try:
+                return [dict(row) for row in self._connect_locked().execute(sql, params)]
+            except sqlite3.Error:
+                return []
+
+    def execute(self, sql, params=()):
+        """Run one statement in its own transaction. Returns the last row id, or None on error."""
+        with self._lock:
+            try:
+                with self._connect_locked() as conn:
+                    return conn.execute(sql, params).lastrowid
+            except sqlite3.Error:
+                return None
+
+
+class DownloadArchive:
+    """Completed downloads, keyed by extractor, video id and
+    DownloadOptions.settings_key(), so re-running a playlist (or pasting a URL
+    again) skips what already finished with the same settings."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def find(self, extractor, video_id, settings):
+        """The archived row for a video under these settings, or None."""
+        rows = self.store.query("SELECT * FROM downloads WHERE extractor = ? AND video_id = ? AND settings = ?",
+                                (extractor, str(video_id), settings))
+        return rows[0] if rows else None
+
+    def find_url(self, url, settings):
+        """The newest row downloaded from exactly this URL under these settings."""
+        rows = self.store.query("SELECT * FROM downloads WHERE url = ? AND settings = ? "
+                                "ORDER BY finished_at DESC LIMIT 1", (url, settings))
+        return rows[0] if rows else None
+
+    def contains(self, extractor, video_id, settings):
+        return self.find(extractor, video_id, settings) is not None
+
+    def entries(self, search=None, limit=1000):
+        """Newest-first archive rows, optionally filtered by title/URL substring."""
+        if search:
+            pattern = f"%{search}%"
+            return self.store.query("SELECT * FROM downloads WHERE title LIKE ? OR url LIKE ? "
+                                    "ORDER BY finished_at DESC LIMIT ?", (pattern, pattern, limit))
+        return self.store.query("SELECT * FROM downloads ORDER BY finished_at DESC LIMIT ?", (limit,))
+
+    def record(self, extractor, video_id, settings, url=None, title=None, output_path=None, label=None):
+        self.store.execute(
+            "INSERT OR REPLACE INTO downloads (extractor, video_id, settings, url, title,"
+            " output_path, finished_at, label) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (extractor, str(video_id), settings, url, title, output_path, time.time(), label))
+
+
+class JobJournal:
+    """Durable record of queued, running and finished jobs, so work that was
+    interrupted by a crash or by closing the app can be replayed on the next
+    start. Jobs attached to the journal write their row on every status, pid
+    or output change (see Job.update); byte progress is written at most every
+    JOURNAL_PROGRESS_INTERVAL seconds. `origin` separates GUI and batch rows."""
+
+    def __init__(self, store, origin):
+        self.store = store
+        self.origin = origin
+        self._closed = False
+        self._progress_written = {}
+
+    def add(self, job, spec):
+        """Journal a new job; `spec` is the JSON-able recipe to rebuild it."""
+        now = time.time()
+        job.journal_id = self.store.execute(
+            "INSERT INTO jobs (origin, kind, url, spec, status, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.origin, job.kind, job.url, json.dumps(spec), job.status, now, now))
+        job.journal = self if job.journal_id else None
+
+    def attach(self, job, row):
+        """Continue an existing row with a rebuilt job (on replay)."""
+        job.journal_id = row["id"]
+        job.journal = self
+        self.save(job)
+
+    def save(self, job):
+        if self._closed or not job.journal_id:
+            return
+        self.store.execute(
+            "UPDATE jobs SET status = ?, stage = ?, output_path = ?, command = ?, pid = ?, updated_at = ?"
+            " WHERE id = ?",
+            (job.status, job.progress, job.output_path, json.dumps(job.command) if job.command else None,
+             job.pid, time.time(), job.journal_id))
+
+    def progress(self, job, done, total):
+        """Record bytes done/total, throttled per job."""
+        if self._closed or not job.journal_id:
+            return
+        now = time.monotonic()
+        if now - self._progress_written.get(job.journal_id, 0) < JOURNAL_PROGRESS_INTERVAL:
+            return
+        self._progress_written[job.journal_id] = now
+        self.store.execute("UPDATE jobs SET bytes_done = ?, bytes_total = ?, stage = ?, updated_at = ?"
+                           " WHERE id = ?", (done, total, job.progress, time.time(), job.journal_id))
+
+    def unfinished(self):
+        """Rows of this origin that never reached a final status, oldest first."""
+        return self.store.query(
+            "SELECT * FROM jobs WHERE origin = ? AND status NOT IN ('done', 'skipped', 'failed', 'cancelled')"
+            " ORDER BY id", (self.origin,))
+
+    def prune(self, max_age=7 * 24 * 3600):
+        """Forget finished rows older than max_age seconds."""
+        self.store.execute("DELETE FROM jobs WHERE status IN ('done', 'skipped', 'failed', 'cancelled')"
+                           " AND updated_at < ?", (time.time() - max_age,))
+
+    def close(self):
+        """Stop writing: rows keep their last (running) state and replay next time."""
+        self._closed = True
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class MediaInfo:
+    """Parsed `ffprobe -show_format -show_streams` output for a local file."""
+
+    def __init__(self, path, probe):
+        self.path = path
+        self.probe = probe
+        fmt = probe.get("format") or {}
+        self.streams = probe.get("streams") or []
+        self.format_name = fmt.get("format_name")
+        self.duration = _to_float(fmt.get("duration"))
+        self.size = int(_to_float(fmt.get("size")) or 0) or None
+        self.bit_rate = _to_float(fmt.get("bit_rate"))
+
+    def _first(self, codec_type):
+        for stream in self.streams:
+            if stream.get("codec_type") == codec_type:
+                # Cover art is reported as a video stream; it is not real video
+                if (stream.get("disposition") or {}).get("attached_pic"):
+                    continue
+                return stream
+        return None
+
+    @property
+    def video_stream(self):
+        return self._first("video")
+
+    @property
+    def audio_stream(self):
+        return self._first("audio")
+
+    @property
+    def video_codec(self):
+        stream = self.video_stream
+        return stream.get("codec_name") if stream else None
+
+    @property
+    def audio_codec(self):
+        stream = self.audio_stream
+        return stream.get("codec_name") if stream else None
+
+
+class MediaInfoCache:
+    """Persistent ffprobe cache keyed by absolute path, validated by size and mtime.
+    Rows live in the state database, one per file, so a new probe is a single
+    insert; only the fields MediaInfo reads are kept. The oldest rows are
+    dropped past max_entries."""
+
+    # Probe fields MediaInfo reads; the rest of ffprobe's output is not stored
+    FORMAT_FIELDS = ("duration", "size", "bit_rate", "format_name")
+    STREAM_FIELDS = ("codec_type", "codec_name", "width", "height")
+    PRUNE_EVERY = 100
+
+    def __init__(self, store, max_entries=5000):
+        self.state = store
+        self.max_entries = max_entries
+        self._stored = 0
+
+    @staticmethod
+    def _signature(filepath):
+        st = os.stat(filepath)
+        return st.st_size, st.st_mtime_ns
+
+    @classmethod
+    def slim(cls, probe):
+        """The part of an ffprobe result MediaInfo needs."""
+        fmt = probe.get("format") or {}
+        streams = []
+        for stream in probe.get("streams") or []:
+            kept = {name: stream[name] for name in cls.STREAM_FIELDS if name in stream}
+            if (stream.get("disposition") or {}).get("attached_pic"):
+                kept["disposition"] = {"attached_pic": 1}
+            streams.append(kept)
+        return {"format": {name: fmt[name] for name in cls.FORMAT_FIELDS if name in fmt},
+                "streams": streams}
+
+    def get(self, filepath):
+        """Return the cached MediaInfo if the file is unchanged, else None."""
+        key = os.path.abspath(filepath)
+        try:
+            size, mtime = self._signature(key)
+        except OSError:
+            return None
+        rows = self.state.query("SELECT probe FROM media_info WHERE path = ? AND size = ? AND mtime = ?",
+                                (key, size, mtime))
+        if not rows:
+            return None
+        try:
+            return MediaInfo(key, json.loads(rows[0]["probe"]))
+        except ValueError:
+            return None
+
+    def store(self, filepath, probe):
+        """Cache a probe result for the file's current size/mtime; returns a MediaInfo."""
+        key = os.path.abspath(filepath)
+        size, mtime = self._signature(key)
+        probe = self.slim(probe)
+        self.state.execute("INSERT OR REPLACE INTO media_info (path, size, mtime, probe, stored_at)"
+                           " VALUES (?, ?, ?, ?, ?)", (key, size, mtime, json.dumps(probe), time.time()))
+        self._stored += 1
+        if self._stored % self.PRUNE_EVERY == 0:
+            self.prune()
+        return MediaInfo(key, probe)
+
+    def prune(self):
+        """Drop the oldest rows beyond max_entries."""
+        self.state.execute("DELETE FROM media_info WHERE path NOT IN"
+                           " (SELECT path FROM media_info ORDER BY stored_at DESC, rowid DESC LIMIT ?)",
+                           (self.max_entries,))
+
+
+def format_bytes(count):
+    """Human-readable byte count (1.5MiB)."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if count < 1024 or unit == "GiB":
+            return f"{count:.1f}{unit}" if unit != "B" else f"{int(count)}B"
+        count /= 1024
+
+def format_eta(seconds):
+    """Seconds as m:ss or h:mm:ss."""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class ProgressEvent:
+    """One progress update from yt-dlp or ffmpeg.
+    stage is 'download', 'postprocess' or 'encode'. done/total are bytes for
+    downloads and seconds of media for encodes; speed is bytes/s for downloads
+    and a realtime factor for encodes; eta is in seconds. frames counts the
+    video frames an encode has written so far."""
+
+    def __init__(self, stage, status, done=None, total=None, speed=None, eta=None, detail=None,
+                 frames=None):
+        self.stage = stage
+        self.status = status
+        self.done = done
+        self.total = total
+        self.speed = speed
+        self.eta = eta
+        self.detail = detail
+        self.frames = frames
+
+    @property
+    def percent(self):
+        if self.status == "finished":
+            return 100.0
+        if self.done is not None and self.total:
+            return min(100.0, self.done * 100.0 / self.total)
+        return None
+
+    def short(self):
+        """Compact text for the queue's progress column."""
+        text = f"{self.percent:.0f}%" if self.percent is not None else ""
+        if self.eta is not None and self.status != "finished":
+            text = f"{text} ETA {format_eta(self.eta)}".strip()
+        return text
+
+    def describe(self):
+        """Console line for this update."""
+        if self.stage == "postprocess":
+            return f"Post-processing: {self.detail} ({self.status})"
+        parts = [f"{self.percent:.1f}%" if self.percent is not None else self.status]
+        if self.stage == "download":
+            if self.total:
+                parts.append(f"of {format_bytes(self.total)}")
+            if self.speed:
+                parts.append(f"at {format_bytes(self.speed)}/s")
+        elif self.speed:
+            parts.append(f"at {self.speed:.2f}x")
+        if self.eta is not None and self.status != "finished":
+            parts.append(f"ETA {format_eta(self.eta)}")
+        return f"[{self.stage}] " + " ".join(parts)
+
+
+class ProgressParser:
+    """Turn yt-dlp --progress-template lines and ffmpeg -progress blocks into
+    ProgressEvents. Use one parser per process and feed it every output line;
+    `duration` (seconds) lets ffmpeg progress be expressed as a percentage."""
+
+    def __init__(self, duration=None):
+        self.duration = duration
+        self._block = {}
+        self._logged_step = None
+
+    def feed(self, line):
+        """Returns (is_progress, event). Progress lines should be kept off the
+        console; event is None while an ffmpeg block is still incomplete."""
+        line = line.strip()
+        if line.startswith(PROGRESS_MARKER):
+            return True, self._ytdlp_event(line[len(PROGRESS_MARKER):].strip().split("|"))
+        match = _FFMPEG_PROGRESS_RE.match(line)
+        if not match:
+            return False, None
+        self._block[match.group(1)] = match.group(2).strip()
+        if match.group(1) != "progress":
+            return True, None
+        block, self._block = self._block, {}
+        return True, self._ffmpeg_event(block)
+
+    def _ytdlp_event(self, fields):
+        if fields[0] == "postprocess" and len(fields) >= 3:
+            return ProgressEvent("postprocess", fields[1], detail=fields[2])
+        if fields[0] != "download" or len(fields) < 7:
+            return None
+        total = _to_float(fields[3]) or _to_float(fields[4])
+        return ProgressEvent("download", fields[1], done=_to_float(fields[2]), total=total,
+                             speed=_to_float(fields[5]), eta=_to_float(fields[6]))
+
+    def _ffmpeg_event(self, block):
+        # out_time_ms is (despite its name) microseconds, like out_time_us
+        micros = _to_float(block.get("out_time_us")) or _to_float(block.get("out_time_ms"))
+        done = micros / 1e6 if micros is not None else None
+        speed = _to_float(block.get("speed", "").rstrip("x"))
+        eta = None
+        if done is not None and self.duration and speed:
+            eta = max(0.0, (self.duration - done) / speed)
+        status = "finished" if block.get("progress") == "end" else "running"
+        return ProgressEvent("encode", status, done=done, total=self.duration, speed=speed, eta=eta,
+                             frames=_to_float(block.get("frame")))
+
+    def should_log(self, event):
+        """True for the updates worth a console line: each new 10% step,
+        completion and post-processing stages."""
+        if event.stage == "postprocess" or event.status == "finished":
+            self._logged_step = None
+            return True
+        percent = event.percent
+        if percent is None:
+            return False
+        step = int(percent // 10)
+        if step == self._logged_step:
+            return False
+        self._logged_step = step
+        return True
+
+
+def _file_signature(path):
+    """[mtime_ns, size] of a file (JSON-friendly), or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class BinaryRegistry:
+    """Where yt-dlp, ffmpeg, ffprobe and node live, resolved once per process.
+    Bundled copies in dependencies/ win over PATH. `cache` holds the paths and
+    versions found by an earlier run (persisted in the GUI config); an entry
+    is trusted while the file's mtime and size are unchanged, so a warm start
+    needs neither a PATH search nor a --version subprocess. verify() refreshes
+    everything and is meant for a background thread."""
+
+    def __init__(self, deps_path, cache=None):
+        self.deps_path = deps_path
+        self._cache = {name: dict(entry) for name, entry in (cache or {}).items() if isinstance(entry, dict)}
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def local_candidates(self, name):
+        """Bundled locations checked before PATH, in order."""
+        exe = f"{name}.exe" if IS_WINDOWS else name
+        if name in ("ffmpeg", "ffprobe"):
+            candidates = [os.path.join(self.deps_path, "ffmpeg", "bin", exe)]
+            if IS_WINDOWS:
+                candidates.append(os.path.join("C:\\ffmpeg\\bin", exe))
+            return candidates
+        return [os.path.join(self.deps_path, exe)]
+
+    def path(self, name):
+        """Absolute path of a binary, or None if it is not installed."""
+        with self._lock:
+            if name not in self._paths:
+                self._paths[name] = self._resolve_locked(name)
+            return self._paths[name]
+
+    def _resolve_locked(self, name):
+        for candidate in self.local_candidates(name):
+            if os.path.isfile(candidate):
+                return candidate
+        cached = self._cache.get(name)
+        if cached and cached.get("path") and _file_signature(cached["path"]) == cached.get("signature"):
+            return cached["path"]
+        return shutil.which(name)
+
+    def cached_version(self, name):
+        """Version recorded for the binary's current file, without running it."""
+        path = self.path(name)
+        with self._lock:
+            cached = self._cache.get(name)
+            if (path and cached and cached.get("path") == path
+                    and cached.get("signature") == _file_signature(path)):
+                return cached.get("version")
+        return None
+
+    def version(self, name):
+        """Version string of a binary, or None if it is missing or does not run.
+        Runs it with its version flag unless the cache already knows this file."""
+        version = self.cached_version(name)
+        if version:
+            return version
+        path = self.path(name)
+        if not path:
+            return None
+        try:
+            result = subprocess.run(
+                [path, *BINARY_VERSION_ARGS.get(name, ["--version"])],
+                capture_output=True, text=True, encoding='utf-8', errors='replace',
+                timeout=30, creationflags=subprocess_flags())
+        except (OSError, subprocess.SubprocessError):
+            return None
+        if result.returncode != 0:
+            return None
+        first_line = (result.stdout.strip().splitlines() or [""])[0].strip()
+        # "ffmpeg version 7.1-static Copyright ..." -> "7.1-static"
+        match = re.match(r'^\S+ version (\S+)', first_line)
+        version = (match.group(1) if match else first_line) or "unknown"
+        with self._lock:
+            self._cache[name] = {"path": path, "signature": _file_signature(path), "version": version}
+        return version
+
+    def verify(self, names=tuple(BINARY_VERSION_ARGS)):
+        """Resolve every binary afresh and check that it runs. Returns {name: version or None}."""
+        with self._lock:
+            self._paths.clear()
+        return {name: self.version(name) for name in names}
+
+    def snapshot(self):
+        """Cache entries to persist and pass back in on the next start."""
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._cache.items()}
+
+
+class StartupTimer:
+    """Milestones from process start to an interactive window, for the startup report."""
+
+    def __init__(self, started=PROCESS_STARTED, budget=STARTUP_BUDGET_SECONDS):
+        self.started = started
+        self.budget = budget
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter() - self.started))
+
+    def elapsed(self, name):
+        """Seconds from start to a milestone, or None if it was not reached."""
+        return next((seconds for mark, seconds in self.marks if mark == name), None)
+
+    @property
+    def over_budget(self):
+        interactive = self.elapsed("interactive")
+        return interactive is not None and interactive > self.budget
+
+    def report(self):
+        marks = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.marks)
+        return f"Startup: {marks} (budget {self.budget * 1000:.0f} ms)"
+
+    def to_dict(self):
+        return {"marks_ms": {name: round(seconds * 1000, 1) for name, seconds in self.marks},
+                "budget_ms": self.budget * 1000, "over_budget": self.over_budget}
+
+
+class _PipeWriter(io.TextIOBase):
+    """stdout/stderr of a pool worker: sends each complete line to the parent."""
+
+    def __init__(self, send, stream):
+        self._send = send
+        self._stream = stream
+        self._pending = ""
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self._pending += text.replace("\r", "\n")
+        *lines, self._pending = self._pending.split("\n")
+        for line in lines:
+            if line:
+                self._send((self._stream, line))
+        return len(text)
+
+    def finish(self):
+        if self._pending:
+            self._send((self._stream, self._pending))
+            self._pending = ""
+
+
+class _YtDlpWorker:
+    """One pool worker's yt-dlp state. Besides the imports, a worker keeps the
+    YoutubeDL instances of its last YTDLP_POOL_REUSE_INSTANCES option sets (the
+    command line without its URLs) for commands that only extract, such as
+    the metadata probes: repeated probes reuse the extractors, their in-memory
+    caches (player JS, tokens) and the open HTTP connections. Downloads write
+    per-job files and get a fresh instance each time, as do commands reading a
+    cookie file, since yt-dlp writes the jar back when the instance closes."""
+
+    def __init__(self, yt_dlp, send):
+        self.yt_dlp = yt_dlp
+        self.send = send
+        # YoutubeDL binds stdout/stderr when it is created, so the writers
+        # outlive single commands
+        self.out = _PipeWriter(send, "out")
+        self.err = _PipeWriter(send, "err")
+        self._instances = {}    # option key -> YoutubeDL, least recently used first
+        self._last_sent = [0.0, None]
+
+    def _download_hook(self, d):
+        # Hooks fire per chunk; status changes always go through
+        now = time.monotonic()
+        if d.get("status") == self._last_sent[1] and now - self._last_sent[0] < YTDLP_POOL_PROGRESS_INTERVAL:
+            return
+        self._last_sent[:] = [now, d.get("status")]
+        self.send(("progress", {"stage": "download", "status": d.get("status"), "done": d.get("downloaded_bytes"),
+                                "total": d.get("total_bytes") or d.get("total_bytes_estimate"),
+                                "speed": d.get("speed"), "eta": d.get("eta")}))
+
+    def _postprocess_hook(self, d):
+        self.send(("progress", {"stage": "postprocess", "status": d.get("status"),
+                                "detail": d.get("postprocessor")}))
+
+    def _instance(self, argv, parsed):
+        """(YoutubeDL for the command, option key if it may be kept for reuse)."""
+        ydl_opts = dict(parsed.ydl_opts, noprogress=True, progress_hooks=[self._download_hook],
+                        postprocessor_hooks=[self._postprocess_hook])
+        ydl_opts.pop("progress_template", None)
+        if not ydl_opts.get("simulate") or ydl_opts.get("cookiefile") or not parsed.urls:
+            return self.yt_dlp.YoutubeDL(ydl_opts), None
+        urls = set(parsed.urls)
+        key = tuple(arg for arg in argv if arg not in urls)
+        ydl = self._instances.pop(key, None)
+        if ydl is None:
+            while len(self._instances) >= YTDLP_POOL_REUSE_INSTANCES:
+                self._instances.pop(next(iter(self._instances))).close()
+            ydl = self.yt_dlp.YoutubeDL(ydl_opts)
+        self._instances[key] = ydl
+        return ydl, key
+
+    def run(self, argv):
+        """Run one yt-dlp command line the way the yt-dlp executable would, with
+        output and progress hooks forwarded through `send`. Returns the exit code."""
+        from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+        yt_dlp = self.yt_dlp
+        self._last_sent[:] = [0.0, None]
+        saved = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = self.out, self.err
+        ydl = key = None
+        code = 1
+        try:
+            parsed = yt_dlp.parse_options(argv)
+            if parsed.options.ffmpeg_location:
+                FFmpegPostProcessor._ffmpeg_location.set(parsed.options.ffmpeg_location)
+            ydl, key = self._instance(argv, parsed)
+            # download() reports the worst result since the instance was created
+            ydl._download_retcode = 0
+            if parsed.options.load_info_filename is not None:
+                code = ydl.download_with_info_file(yt_dlp.utils.expand_path(parsed.options.load_info_filename))
+            else:
+                code = ydl.download(parsed.urls)
+        except SystemExit as e:
+            # Option errors end in parser.error()
+            code = e.code if isinstance(e.code, int) else 2
+        except yt_dlp.utils.DownloadCancelled:
+            code = 101
+        except yt_dlp.utils.DownloadError:
+            code = 1    # already reported through stderr
+        except Exception as e:
+            self.err.write(f"ERROR: {e}\n")
+            code = 1
+        finally:
+            # An instance that failed is not trusted with the next command
+            if ydl is not None and (key is None or code != 0):
+                if key is not None:
+                    self._instances.pop(key, None)
+                ydl.close()
+            self.out.finish()
+            self.err.finish()
+            sys.stdout, sys.stderr = saved
+        return code
+
+    def close(self):
+        for ydl in self._instances.values():
+            ydl.close()
+        self._instances.clear()
+
+
+def _ytdlp_worker_main(conn):
+    """Pool worker: run the yt-dlp command lines received on `conn` until told to stop."""
+    if hasattr(os, "setsid"):
+        # Own process group, so cancel and pause also reach the ffmpeg it starts
+        os.setsid()
+    lock = threading.Lock()
+
+    def send(message):
+        # Fragment downloads call the progress hook from several threads
+        with lock:
+            conn.send(message)
+
+    def exit_with_parent():
+        parent = multiprocessing.parent_process()
+        if parent:
+            parent.join()
+        if hasattr(os, "killpg"):
+            os.killpg(os.getpgrp(), signal.SIGTERM)
+        os._exit(1)
+
+    threading.Thread(target=exit_with_parent, daemon=True).start()
+    import yt_dlp
+    worker = _YtDlpWorker(yt_dlp, send)
+    try:
+        while True:
+            try:
+                argv = conn.recv()
+            except (EOFError, OSError):
+                return
+            if argv is None:
+                return
+            send(("exit", worker.run(argv)))
+    finally:
+        worker.close()
+
+
+class _PooledProcess:
+    """Popen-like handle of a pool worker for Job.attach_process, stop_process and pause."""
+
+    def __init__(self, process):
+        self._process = process
+        self.pid = process.pid
+
+    def poll(self):
+        return self._process.exitcode
+
+    def send_signal(self, sig):
+        os.kill(self.pid, sig)
+
+
+class YtDlpWorkerPool:
+    """Runs yt-dlp command lines through the yt_dlp package (an optional
+    dependency) in long-lived worker processes instead of starting the yt-dlp
+    executable per command. A worker pays for interpreter startup and the
+    extractor/plugin imports once and then serves job after job, keeping
+    YoutubeDL instances for repeated probes (see _YtDlpWorker); progress
+    arrives from yt-dlp's progress hooks instead of parsed output. Each
+    running command has a worker of its own, so cancel and pause work on it
+    like on a child process (a stopped worker is simply not reused)."""
+
+    def __init__(self, max_idle=YTDLP_POOL_MAX_IDLE):
+        # spawn, not fork: the GUI process has Tk and worker threads running
+        self._context = multiprocessing.get_context("spawn")
+        self._max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @staticmethod
+    def available():
+        return importlib.util.find_spec("yt_dlp") is not None
+
+    def _acquire(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker[0].is_alive():
+                    return worker
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_ytdlp_worker_main, args=(child_conn,), daemon=True,
+                                        name="yt-dlp-worker")
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _release(self, worker):
+        with self._lock:
+            if not self._closed and worker[0].is_alive() and len(self._idle) < self._max_idle:
+                self._idle.append(worker)
+                return
+        self._stop(worker)
+
+    @staticmethod
+    def _stop(worker):
+        process, conn = worker
+        try:
+            conn.send(None)
+        except (OSError, ValueError):
+            pass
+        conn.close()
+        process.join(1)
+        if process.is_alive():
+            process.kill()
+
+    def run(self, argv):
+        """Run one command line (without the program name). Yields ('process', handle)
+        first, then ('out' | 'err', line) and ('progress', fields) messages, and
+        finally ('exit', code)."""
+        worker = self._acquire()
+        process, conn = worker
+        yield "process", _PooledProcess(process)
+        code = None
+        try:
+            conn.send(list(argv))
+            while True:
+                kind, value = conn.recv()
+                if kind == "exit":
+                    code = value
+                    break
+                yield kind, value
+        except (EOFError, OSError):
+            # The worker died (cancelled, or killed by a crash in yt-dlp)
+            process.join(5)
+            code = process.exitcode if process.exitcode is not None else -1
+        finally:
+            if code is not None:
+                self._release(worker)
+            else:
+                # Abandoned mid-command: the worker is still busy
+                process.kill()
+                conn.close()
+        yield "exit", code
+
+    def close(self):
+        """Stop the idle workers; busy ones stop after their command."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._stop(worker)
+
+
+class CookieBroker:
+    """Browser cookies read once into a private Netscape cookie file that all
+    jobs share. Reading them copies and decrypts the browser's cookie
+    database, which is slow and fails while Chromium browsers hold it locked,
+    so it happens once per browser per COOKIE_JAR_TTL_SECONDS, or again after
+    invalidate(). yt-dlp rewrites its --cookies file on exit, so every command
+    gets its own copy (checkout/release) and concurrent jobs never see a
+    half-written file. `extract(browser, path, log)` writes the file and
+    returns True on success."""
+
+    def __init__(self, extract):
+        self._extract = extract
+        self._jars = {}     # browser -> (path or None if reading failed, when)
+        self._lock = threading.Lock()
+        self._dir = None
+
+    def _jar(self, browser, log):
+        # Holding the lock while extracting makes concurrent jobs wait for one read
+        with self._lock:
+            entry = self._jars.get(browser)
+            if entry and time.monotonic() - entry[1] < COOKIE_JAR_TTL_SECONDS:
+                if entry[0] is None or os.path.isfile(entry[0]):
+                    return entry[0]
+            if self._dir is None:
+                self._dir = tempfile.mkdtemp(prefix="ytdlp-gui-cookies-")
+            path = os.path.join(self._dir, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', browser)}.txt")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            if not self._extract(browser, path, log):
+                path = None
+            self._jars[browser] = (path, time.monotonic())
+            return path
+
+    def checkout(self, browser, log):
+        """Private copy of the browser's cookie file for one command, or None if
+        the browser could not be read (callers fall back to --cookies-from-browser)."""
+        jar = self._jar(browser, log)
+        if not jar:
+            return None
+        fd, path = tempfile.mkstemp(prefix="job-", suffix=".txt", dir=self._dir)
+        with os.fdopen(fd, "wb") as copy, open(jar, "rb") as source:
+            shutil.copyfileobj(source, copy)
+        return path
+
+    def release(self, path):
+        try:
+            os.remove(path)
+        except (OSError, TypeError):
+            pass
+
+    def invalidate(self, browser):
+        """Read the browser again on the next checkout (e.g. after a sign-in prompt)."""
+        with self._lock:
+            return self._jars.pop(browser, None) is not None
+
+    def close(self):
+        with self._lock:
+            self._jars.clear()
+            directory, self._dir = self._dir, None
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class SolverScriptCache:
+    """The yt-dlp cache dir shared by every command, where yt-dlp keeps the
+    challenge-solver scripts it downloads for YouTube. Until the scripts are
+    on disk, the first YouTube video probe runs alone so parallel jobs do not
+    each download them (once per session, for at most SOLVER_WARM_TIMEOUT
+    seconds; other URLs never wait). A directory copied from
+    another machine works offline as long as its script versions match the
+    installed yt-dlp. Counts hits (a YouTube probe found the scripts cached)
+    and misses (yt-dlp had to download or replace them)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._warm = threading.Lock()
+        self._warmed = False
+
+    def args(self):
+        return ["--cache-dir", self.directory]
+
+    def _script_path(self, name):
+        return os.path.join(self.directory, SOLVER_CACHE_SECTION, f"{name}.json")
+
+    def snapshot(self):
+        """{script: (mtime_ns, size)} of the scripts on disk."""
+        scripts = {}
+        for name in SOLVER_SCRIPTS:
+            try:
+                st = os.stat(self._script_path(name))
+            except OSError:
+                continue
+            scripts[name] = (st.st_mtime_ns, st.st_size)
+        return scripts
+
+    def versions(self):
+        """{script: version} of the cached scripts."""
+        versions = {}
+        for name in SOLVER_SCRIPTS:
+            try:
+                with open(self._script_path(name), "r", encoding="utf-8") as f:
+                    versions[name] = json.load(f)["data"]["version"]
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+        return versions
+
+    def describe(self):
+        versions = self.versions()
+        cached = ", ".join(f"{name} {version}" for name, version in versions.items()) or "empty"
+        return f"{cached}; {self.hits} hit(s), {self.misses} miss(es)"
+
+    def begin(self, url):
+        """Call before probing `url`; pass the result to end(). Only YouTube
+        video URLs solve challenges, so only they wait for the warm-up."""
+        if not self._warmed and self.snapshot():
+            self._warmed = True
+        holds = False
+        key = url_video_key(url)
+        if not self._warmed and key and key[0] == "Youtube":
+            if self._warm.acquire(timeout=SOLVER_WARM_TIMEOUT):
+                if self._warmed:
+                    self._warm.release()
+                else:
+                    holds = True
+        return self.snapshot(), holds
+
+    def end(self, token, youtube=False):
+        """Count the probe started with begin(). Returns True if yt-dlp wrote
+        new scripts to the cache."""
+        before, holds = token
+        after = self.snapshot()
+        fetched = any(before.get(name) != signature for name, signature in after.items())
+        with self._lock:
+            if fetched:
+                self.misses += 1
+            elif youtube and before:
+                self.hits += 1
+        if holds:
+            self._warmed = True
+            self._warm.release()
+        return fetched
+
+    def stats(self):
+        with self._lock:
+            return {"dir": self.directory, "hits": self.hits, "misses": self.misses,
+                    "scripts": self.versions()}
+
+
+def _prom_labels(labels):
+    """Prometheus label set {name="value",...} for (name, value) pairs."""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class MetricsRegistry:
+    """Counters and histograms (see METRICS) over finished jobs. After every
+    job the totals are written to metrics-<origin>.prom in `directory`, in the
+    Prometheus text format (for node_exporter's textfile collector or any
+    scraper reading files), and the job's own breakdown (JobMetrics) is
+    appended to metrics.jsonl. Totals cover the current process only;
+    Prometheus treats the reset on restart like any counter reset."""
+
+    def __init__(self, directory, origin="gui"):
+        self.directory = directory
+        self.origin = origin
+        self._counters = {}     # (metric, labels) -> value
+        self._histograms = {}   # (metric, labels) -> [cumulative bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def _inc(self, metric, labels, amount=1):
+        key = (metric, labels)
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def _observe(self, metric, labels, value):
+        bounds = METRICS[metric][2]
+        entry = self._histograms.setdefault((metric, labels), [[0] * len(bounds), 0.0, 0])
+        for i, bound in enumerate(bounds):
+            if value <= bound:
+                entry[0][i] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def record(self, job):
+        """Add a finished job to the totals and export (called by Job.update)."""
+        metrics = job.metrics
+        labels = (("origin", self.origin), ("kind", job.kind))
+        line = {
+            "time": round(time.time(), 3),
+            "origin": self.origin,
+            "id": job.id,
+            "kind": job.kind,
+            "input": job.url,
+            "title": job.title or None,
+            "action": job.action,
+            "status": job.status,
+            "output": job.output_path,
+            "returncode": job.returncode,
+            "error": job.error,
+            **metrics.to_dict(),
+        }
+        with self._lock:
+            self._inc("jobs_total", labels + (("status", job.status),))
+            self._inc("subprocesses_total", labels, metrics.processes)
+            self._inc("downloaded_bytes_total", labels, metrics.downloaded_bytes)
+            self._inc("encoded_frames_total", labels, metrics.encode_frames)
+            self._observe("job_seconds", labels, metrics.elapsed)
+            for stage, seconds in metrics.stage_seconds().items():
+                self._observe("stage_seconds", labels + (("stage", stage),), seconds)
+            if metrics.average_speed:
+                self._observe("download_speed_bytes", labels, metrics.average_speed)
+            if metrics.encode_fps:
+                self._observe("encode_fps", labels, metrics.encode_fps)
+            try:
+                self._export_locked(line)
+            except OSError as e:
+                print(f"Could not write metrics to {self.directory}: {e}", file=sys.stderr)
+
+    def render(self):
+        """The totals in the Prometheus text exposition format."""
+        with self._lock:
+            return self._render_locked()
+
+    def _render_locked(self):
+        lines = []
+        for metric, (kind, help_text, *bounds) in METRICS.items():
+            name = METRICS_PREFIX + metric
+            lines.append(f"# HELP {name} {help_text}.")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (key, labels), value in sorted(self._counters.items()):
+                    if key == metric:
+                        lines.append(f"{name}{_prom_labels(labels)} {value}")
+                continue
+            for (key, labels), (buckets, total, count) in sorted(self._histograms.items()):
+                if key != metric:
+                    continue
+                for bound, cumulative in zip(bounds[0], buckets):
+                    lines.append(f"{name}_bucket{_prom_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_prom_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_prom_labels(labels)} {total:.3f}")
+                lines.append(f"{name}_count{_prom_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def _export_locked(self, line):
+        os.makedirs(self.directory, exist_ok=True)
+        # Written whole and renamed, so a scraper never reads half a file
+        prom_path = os.path.join(self.directory, f"metrics-{self.origin}.prom")
+        tmp_path = f"{prom_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self._render_locked())
+        os.replace(tmp_path, prom_path)
+
+        jsonl_path = os.path.join(self.directory, "metrics.jsonl")
+        try:
+            if os.path.getsize(jsonl_path) > METRICS_JSONL_BYTES:
+                os.replace(jsonl_path, f"{jsonl_path}.1")
+        except OSError:
+            pass
+        with open(jsonl_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(line) + "\n")
+
+
+class DownloadEngine:
+    """Tk-free command construction and job execution.
+    Shared by the GUI and the headless batch mode; all user choices arrive
+    through a DownloadOptions snapshot and all output goes through `log`."""
+
+    def __init__(self, base_path, log=None, origin="gui", binaries=None, solver_cache=None,
+                 metrics_dir=None):
+        self.base_path = base_path
+        self.deps_path = os.path.join(base_path, "dependencies")
+        self.binaries = binaries or BinaryRegistry(self.deps_path)
+        self.log = log or (lambda text: print(text, file=sys.stderr, flush=True))
+        self.cache_path = os.path.join(base_path, ".ytdlp-gui-cache")
+        self.metadata_cache = MetadataCache(os.path.join(self.cache_path, "info"))
+        self.solver_cache = SolverScriptCache(solver_cache or os.path.join(self.cache_path, SOLVER_CACHE_DIRNAME))
+        self.state = StateStore(os.path.join(base_path, STATE_DB_NAME))
+        self.media_cache = MediaInfoCache(self.state)
+        self.archive = DownloadArchive(self.state)
+        self.journal = JobJournal(self.state, origin)
+        self.metrics = MetricsRegistry(metrics_dir or os.path.join(base_path, "logs"), origin)
+        # Encoder tuning; encode_slots caps how many CPU-heavy encodes run at once
+        # (conversions and compressed downloads alike), and each gets that share
+        # of the cores instead of all of them
+        self.performance_profile = DEFAULT_PERFORMANCE_PROFILE
+        self.encode_slots = 1
+        self._encode_gate = threading.Condition()
+        self._encodes_running = 0
+        # Global download cap in bytes/s (None = unlimited), split across the
+        # downloads the caller's scheduler expects to run side by side
+        self.rate_limit = None
+        self.download_concurrency = None
+        # Fragment concurrency, chunk/buffer sizes and downloader (see NETWORK_DEFAULTS)
+        self.network = dict(NETWORK_DEFAULTS)
+        # In-process yt-dlp workers (see set_in_process); None runs the executable
+        self.ytdlp_pool = None
+        # Browser cookies are read once and shared by all jobs
+        self.cookies = CookieBroker(self.extract_browser_cookies)
+
+        # Bundled ffmpeg first, then the system one (see BinaryRegistry)
+        ffmpeg_path = self.binaries.path("ffmpeg")
+        self.ffmpeg_location = os.path.dirname(ffmpeg_path) if ffmpeg_path else ""
+
+    def find_ytdlp(self):
+        """Locate the yt-dlp binary (bundled first, then PATH)"""
+        return self.binaries.path("yt-dlp") or "yt-dlp"
+
+    def challenge_args(self):
+        """JS challenge arguments for yt-dlp: node at its resolved path, the
+        solver scripts from the shared cache (fetched from GitHub if missing)."""
+        node = self.binaries.path("node")
+        return ["--js-runtimes", f"node:{node}" if node else "node",
+                "--remote-components", "ejs:github", *self.solver_cache.args()]
+
+    def find_downloader(self, name):
+        """Locate an external downloader (bundled first, then PATH), or None."""
+        return self.binaries.path(name)
+
+    def close(self):
+        """Stop the in-process workers and delete the private cookie files."""
+        self.set_in_process(False)
+        self.cookies.close()
+
+    def set_in_process(self, enabled, log=None):
+        """Run yt-dlp through the yt_dlp package in pooled worker processes
+        (see YtDlpWorkerPool) or, when disabled or the package is missing, as
+        the yt-dlp executable. Returns True if the worker pool is in use."""
+        log = log or self.log
+        if enabled and not self.ytdlp_pool:
+            if not YtDlpWorkerPool.available():
+                log("The yt_dlp Python package is not installed; running the yt-dlp executable instead.")
+                return False
+            self.ytdlp_pool = YtDlpWorkerPool()
+        elif not enabled and self.ytdlp_pool:
+            self.ytdlp_pool.close()
+            self.ytdlp_pool = None
+        return self.ytdlp_pool is not None
+
+    def stream_ytdlp(self, job, cmd):
+        """Run a yt-dlp command for `job`, yielding (event, line) pairs: a
+        ProgressEvent (line None) or an output line (event None), stdout and
+        stderr merged. The exit code is left in job.returncode."""
+        if self.ytdlp_pool:
+            for kind, value in self.ytdlp_pool.run(cmd[1:]):
+                if kind == "process":
+                    job.attach_process(value, cmd)
+                elif kind == "progress":
+                    yield ProgressEvent(**value), None
+                elif kind == "exit":
+                    job.release_process()
+                    job.update(returncode=value)
+                else:
+                    yield None, value
+            return
+
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            creationflags=subprocess_flags(),
+            start_new_session=True
+        )
+        job.attach_process(process, cmd)
+        parser = ProgressParser()
+        while True:
+            output = process.stdout.readline()
+            if output == '' and process.poll() is not None:
+                break
+            if not output:
+                continue
+            is_progress, event = parser.feed(output)
+            if is_progress:
+                if event is not None:
+                    yield event, None
+                continue
+            yield None, output
+        job.release_process()
+        job.update(returncode=process.poll())
+
+    def run_ytdlp_capture(self, cmd):
+        """Run a short yt-dlp command to completion. Returns (returncode, stdout, stderr)."""
+        if self.ytdlp_pool:
+            output = {"out": [], "err": []}
+            code = None
+            for kind, value in self.ytdlp_pool.run(cmd[1:]):
+                if kind in output:
+                    output[kind].append(value)
+                elif kind == "exit":
+                    code = value
+            return code, "\n".join(output["out"]), "\n".join(output["err"])
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            creationflags=subprocess_flags()
+        )
+        return result.returncode, result.stdout, result.stderr
+
+    def auto_concurrent_fragments(self):
+        """Fragments fetched at once per download when not set: the connection
+        budget split across the downloads expected to run side by side."""
+        concurrent = self.download_concurrency() if self.download_concurrency else 1
+        return max(1, min(MAX_AUTO_FRAGMENTS, FRAGMENT_CONNECTION_BUDGET // max(1, concurrent)))
+
+    def network_args(self, log=None):
+        """yt-dlp retry, fragment, chunk/buffer and downloader arguments."""
+        net = dict(NETWORK_DEFAULTS, **self.network)
+        fragments = net["concurrent_fragments"] or self.auto_concurrent_fragments()
+        args = ["--retries", str(net["retries"]),
+                "--fragment-retries", str(net["fragment_retries"]),
+                "--concurrent-fragments", str(fragments),
+                "--http-chunk-size", str(net["http_chunk_size"] or DEFAULT_HTTP_CHUNK_SIZE)]
+        if net["buffer_size"]:
+            args.extend(["--buffer-size", str(net["buffer_size"])])
+        downloader = net["external_downloader"]
+        if downloader:
+            path = self.find_downloader(downloader)
+            if path:
+                # aria2c splits each file (and fragment) over as many connections (max 16)
+                connections = min(16, fragments)
+                args.extend(["--downloader", path,
+                             "--downloader-args", f"aria2c:-x {connections} -s {connections} -k 1M"])
+            else:
+                (log or self.log)(f"Warning: {downloader} not found, using the built-in downloader")
+        return args
+
+    def map_audio_format(self, format_name):
+        """Map UI audio format names to yt-dlp format strings"""
+        format_map = {
+            'ogg': 'vorbis',  # OGG container uses Vorbis codec
+            'alac': 'alac',
+            'mp3': 'mp3',
+            'aac': 'aac',
+            'm4a': 'm4a',
+            'opus': 'opus',
+            'flac': 'flac',
+            'wav': 'wav'
+        }
+        return format_map.get(format_name, format_name)
+
+    def calculate_bitrates_for_target_size(self, target_size_mb, duration_seconds, audio_bitrate_kbps):
+        """Calculate video bitrate needed to achieve target file size"""
+        # Convert target size to kilobits
+        target_size_kbits = target_size_mb * 8192  # 1 MB = 8192 kilobits
+
+        # Calculate total bitrate needed
+        total_bitrate_kbps = target_size_kbits / duration_seconds
+
+        # Subtract audio bitrate to get video bitrate
+        # Add small overhead for container (about 2%)
+        overhead_factor = 0.98
+        video_bitrate_kbps = (total_bitrate_kbps - audio_bitrate_kbps) * overhead_factor
+
+        # Ensure minimum viable bitrate
+        video_bitrate_kbps = max(100, int(video_bitrate_kbps))
+
+        return video_bitrate_kbps
+
+    def resolve_compression(self, spec, duration=None):
+        """Turn a compression spec into concrete bitrates for a given duration.
+        A spec without 'video_bitrate' (or with None) is auto-calculated from
+        the target size; unknown durations fall back to a 3 minute estimate."""
+        if not spec:
+            return None
+
+        audio_bitrate = spec['audio_bitrate']
+        video_bitrate = spec.get('video_bitrate')
+        if not video_bitrate:
+            est = duration if duration else 180
+            video_bitrate = self.calculate_bitrates_for_target_size(spec['target_size'], est, audio_bitrate)
+
+        return {
+            'target_size': spec['target_size'],
+            'video_bitrate': video_bitrate,
+            'audio_bitrate': audio_bitrate
+        }
+
+    def fetch_metadata(self, url, options, log=None, job=None):
+        """Extract a URL once with --dump-single-json and cache the result.
+        The same info JSON later feeds the download via --load-info-json, so
+        the extractor (JS challenges, cookie decryption) runs once per URL.
+        Playlists and channels are extracted flat (entries are only listed),
+        which leaves single videos unaffected.
+        Returns a VideoMetadata, or None if the probe failed."""
+        log = log or self.log
+        cached = self.metadata_cache.get(url)
+        if cached:
+            log(f"Using cached video information ({cached.title})")
+            return cached
+
+        try:
+            ytdlp_cmd = self.find_ytdlp()
+
+            log("Fetching video information...")
+
+            cmd = [ytdlp_cmd, *self.challenge_args(),
+                   "--dump-single-json", "--flat-playlist", "--no-warnings"]
+            cookie_file = self.checkout_cookies(options, log=log)
+            cmd.extend(self.cookie_args(options, cookie_file))
+            cmd.append(url)
+
+            probed = None
+            if job:
+                job.metrics.processes += 1
+            solver = self.solver_cache.begin(url)
+            try:
+                returncode, stdout, stderr = self.run_ytdlp_capture(cmd)
+                if returncode == 0 and stdout.strip():
+                    probed = json.loads(stdout)
+            finally:
+                self.cookies.release(cookie_file)
+                # Flat playlists list their entries without solving challenges
+                youtube = bool(probed) and probed.get("extractor_key") == "Youtube" \
+                    and probed.get("_type") != "playlist"
+                if self.solver_cache.end(solver, youtube=youtube):
+                    log(f"Challenge solver scripts saved to the shared cache ({self.solver_cache.describe()})")
+
+            if probed:
+                metadata = self.metadata_cache.store(url, probed)
+                if metadata.duration:
+                    duration = metadata.duration
+                    log(f"Video: {metadata.title} ({int(duration // 60)}m {int(duration % 60)}s)")
+                return metadata
+
+            error = stderr.strip().splitlines()[-1:] or ["no output"]
+            log(f"Warning: Could not fetch video information ({error[0]})")
+        except Exception as e:
+            log(f"Warning: Error fetching video information ({str(e)})")
+        return None
+
+    def extract_browser_cookies(self, browser, path, log=None):
+        """Read a browser's cookies into a Netscape cookie file at `path` (for
+        CookieBroker). yt-dlp saves its cookie jar on exit even without a URL to
+        download, so no request is made. Returns True if the file was written."""
+        log = log or self.log
+        log(f"Reading cookies from {browser}...")
+        cmd = [self.find_ytdlp(), "--cookies-from-browser", browser, "--cookies", path, "--no-warnings"]
+        try:
+            returncode, stdout, stderr = self.run_ytdlp_capture(cmd)
+        except OSError as e:
+            returncode, stderr = None, str(e)
+        if os.path.isfile(path) and os.path.getsize(path):
+            if not IS_WINDOWS:
+                os.chmod(path, 0o600)
+            log(f"Cookies from {browser} read once for all downloads "
+                f"(read again in {COOKIE_JAR_TTL_SECONDS // 60} minutes)")
+            return True
+        errors = [line for line in stderr.strip().splitlines() if "must provide at least one URL" not in line]
+        log(f"Warning: could not read cookies from {browser} "
+            f"({errors[-1] if errors else f'exit code {returncode}'}); each download will try itself")
+        return False
+
+    def checkout_cookies(self, options, log=None):
+        """Private copy of the shared browser cookie file for one yt-dlp command
+        (release it with self.cookies.release), or None."""
+        if not options.cookies_browser:
+            return None
+        return self.cookies.checkout(options.cookies_browser, log or self.log)
+
+    def cookie_args(self, options, cookie_file=None):
+        """yt-dlp cookie arguments for an options snapshot. `cookie_file` is a
+        checked-out copy of the browser cookies (see checkout_cookies)."""
+        if cookie_file:
+            return ["--cookies", cookie_file]
+        if options.cookies_browser:
+            return ["--cookies-from-browser", options.cookies_browser]
+        if options.cookies_file and os.path.isfile(options.cookies_file):
+            return ["--cookies", options.cookies_file]
+        return []
+
+    def build_command(self, url, options, log=None, metadata=None, staging_dir=None, paths_file=None,
+                      temp_dir=None, rate_limit=None, formats=None, cookie_file=None):
+        """Build the yt-dlp command based on selected options.
+        With prefetched metadata the command loads its info JSON instead of
+        extracting the URL a second time. Compressed video downloads are
+        stream-copied into `staging_dir`; the encode is a separate step (see
+        run_download).
+        Other downloads keep their partial files in `temp_dir` until finished.
+        `rate_limit` (bytes/s) is passed on as --limit-rate. `formats` is an explicit
+        format selector whose streams fit the container (no re-encode needed).
+        yt-dlp appends the final path of every file it writes to `paths_file`.
+        `cookie_file` replaces --cookies-from-browser (see checkout_cookies)."""
+        output_dir = options.output_dir
+        log = log or self.log
+        ytdlp_cmd = self.find_ytdlp()
+        cmd = [
+            ytdlp_cmd,
+            *self.challenge_args(),
+            "--no-mtime",           # Use current date as file timestamp, not YouTube's upload date
+            "--newline",            # Output progress on new lines for better console parsing
+            "--continue",           # Resume .part files left by an interrupted run
+            *self.network_args(log=log),
+        ]
+        if paths_file:
+            cmd.extend(["--print-to-file", "after_move:%(filepath)s", paths_file])
+        if rate_limit:
+            cmd.extend(["--limit-rate", str(int(rate_limit))])
+        for template in YTDLP_PROGRESS_TEMPLATES:
+            cmd.extend(["--progress-template", template])
+
+        if options.clip:
+            # Only the section is fetched (yt-dlp hands it to ffmpeg, which cuts at
+            # keyframes without re-encoding), so bytes scale with the clip length
+            start, end = options.clip
+            cmd.extend(["--download-sections", f"*{start or 0}-{end if end is not None else 'inf'}"])
+            log(f"Downloading only the clip {clip_label(options.clip)}")
+
+        # Add age limit if enabled
+        if options.age_limit:
+            cmd.extend(["--age-limit", str(options.age_limit)])
+            log(f"Setting age limit to {options.age_limit} years")
+
+        # Add cookies if enabled
+        cmd.extend(self.cookie_args(options, cookie_file))
+        if cookie_file:
+            log(f"Using cookies from {options.cookies_browser} (read once per session)")
+        elif options.cookies_browser:
+            log(f"Using cookies from {options.cookies_browser}")
+        elif options.cookies_file:
+            if os.path.isfile(options.cookies_file):
+                log(f"Using cookies file: {options.cookies_file}")
+            else:
+                log("Warning: Cookie file not found, proceeding without cookies")
+
+        if metadata is None:
+            metadata = self.fetch_metadata(url, options, log=log)
+        # Download from the prefetched info JSON when we have one
+        source_args = ["--load-info-json", metadata.info_path] if metadata else [url]
+
+        compression = options.compression
+
+        if options.media == "video":
+            # Video command - prioritize best quality
+            video_format = options.video_format
+            merge_format = video_format
+            remux_args = []
+
+            if compression:
+                # Compression enabled - yt-dlp only fetches and remuxes; the
+                # two-pass encode runs afterwards on the staged file, where the
+                # real duration is known and the output size can be measured
+                log("=" * 60)
+                log("COMPRESSION ENABLED")
+                log(f"Target File Size: ~{compression['target_size']}MB")
+                log(f"Audio Bitrate: {compression['audio_bitrate']}kbps")
+                if formats:
+                    log(f"Source formats {formats} already fit the target;")
+                    log("they are downloaded as they are, without re-encoding.")
+                else:
+                    log("The video is downloaded first, then encoded in two passes")
+                    log("and checked against the target size.")
+                log("=" * 60)
+
+            if formats:
+                # Source streams the container holds as they are (see
+                # pick_direct_formats), so the merge is a copy and nothing is re-encoded.
+                # A single muxed format is never merged, so --merge-output-format
+                # doesn't apply; the remux puts it in the container (also a copy)
+                postproc_args = "ffmpeg:-c:v copy -c:a copy"
+                remux_args = ["--remux-video", video_format]
+                output_dir = staging_dir or output_dir
+            elif staging_dir:
+                # Staged: the encode is a separate ffmpeg step, so yt-dlp only
+                # downloads. MKV holds any codec pair, so the merge is always a copy
+                merge_format = "mkv"
+                postproc_args = "ffmpeg:-c:v copy -c:a copy"
+                output_dir = staging_dir
+            else:
+                # No compression - stream copy whenever possible (fast remux)
+                # The format selector below requests codec-compatible streams,
+                # so the merge is just a container remux, not a full re-encode.
+                if video_format == "avi":
+                    # AVI requires MPEG-4 Part 2 video and MP3 audio for broad compatibility.
+                    # H.264 in AVI is not supported by most players (audio only, no video).
+                    postproc_args = ("ffmpeg:-c:v mpeg4 -q:v 3 " + " ".join(self.encoder_speed_args('mpeg4'))
+                                     + " -c:a mp3 -b:a 320k -ar 48000")
+                else:
+                    postproc_args = "ffmpeg:-c:v copy -c:a copy"
+
+            # Choose a format selector based on container compatibility.
+            # MP4/MOV/AVI only support certain codecs natively, so we prefer
+            # H.264 + AAC to avoid a slow full re-encode during the merge step.
+            # MKV and WEBM accept virtually any codec, so we just grab the best.
+            if formats:
+                format_selector = formats
+            elif video_format in ("mp4", "mov") and not compression:
+                format_selector = (
+                    "bestvideo[vcodec^=avc1]+bestaudio[acodec^=mp4a]/"
+                    "bestvideo[vcodec^=avc1]+bestaudio/"
+                    "bestvideo*+bestaudio/best"
+                )
+            else:
+                format_selector = "bestvideo*+bestaudio/best"
+
+            cmd.extend([
+                "-f", format_selector,
+                "--merge-output-format", merge_format,
+                *remux_args,
+                "--ffmpeg-location", self.ffmpeg_location,
+                "--postprocessor-args", postproc_args,
+                "--windows-filenames",
+                *self.output_args(output_dir, temp_dir, options.clip),
+                *source_args
+            ])
+        else:
+            # Audio command - best quality
+            audio_format = options.audio_format
+            # Map UI format to yt-dlp format (e.g., 'ogg' -> 'vorbis')
+            ytdlp_audio_format = self.map_audio_format(audio_format)
+
+            if compression:
+                # Compression enabled for audio
+                audio_bitrate = compression['audio_bitrate']
+                log("=" * 60)
+                log("COMPRESSION ENABLED (Audio)")
+                log(f"Audio Bitrate: {audio_bitrate}kbps")
+                log("Note: Lower bitrate reduces file size but may affect quality.")
+                log("=" * 60)
+                bitrate = f"{audio_bitrate}k"
+                audio_quality = "0"
+            else:
+                # Set audio quality based on format
+                if audio_format in ["mp3", "aac", "opus", "ogg"]:
+                    # For lossy formats, use highest bitrate
+                    audio_quality = "0"  # Best quality for VBR
+                    bitrate = "320k"
+                else:
+                    # For lossless formats (flac, wav, alac, m4a)
+                    audio_quality = "0"
+                    bitrate = None
+
+            cmd.extend([
+                "-f", "bestaudio/best",
+                "-x",  # Extract audio
+                "--audio-format", ytdlp_audio_format,
+                "--audio-quality", audio_quality,
+                "--ffmpeg-location", self.ffmpeg_location,
+            ])
+
+            if bitrate:
+                cmd.extend(["--postprocessor-args", f"audio:-b:a {bitrate} -ar 48000"])
+            else:
+                cmd.extend(["--postprocessor-args", "audio:-ar 48000"])
+
+            cmd.extend([
+                "--windows-filenames",
+                *self.output_args(output_dir, temp_dir, options.clip),
+                *source_args
+            ])
+
+        return cmd
+
+    def output_args(self, output_dir, temp_dir=None, clip=None):
+        """yt-dlp output arguments. With a temp_dir, .part files and fragments are
+        written there and only finished files are moved to output_dir. Clips
+        carry their section in the name so they never replace the full video."""
+        template = "%(title)s" + (f" (clip {clip_label(clip)})" if clip else "") + ".%(ext)s"
+        if temp_dir:
+            return ["-P", f"home:{output_dir}", "-P", f"temp:{temp_dir}", "-o", template]
+        return ["-o", os.path.join(output_dir, template)]
+
+    def run_download(self, job, log=None, submit=None, encode=None):
+        """Run the yt-dlp command for one job using its options snapshot.
+        Blocks until yt-dlp exits; returns True on success.
+        With a `submit` callback, playlists are expanded into one job per entry
+        (see expand_playlist) instead of being downloaded in a single run.
+        Compressed video downloads are staged for a separate encode; with
+        an `encode` callback the job is handed to it (status 'waiting', lane
+        'encode') for run_staged_encode, otherwise it is encoded here."""
+        url = job.url
+        options = job.options
+        log = log or self.log
+        staging_dir = work_dir = cookie_file = None
+        handed_off = False
+        paths_file = os.path.join(self.cache_path, "jobs", f"{os.getpid()}-{job.id}.paths")
+
+        try:
+            job.recorder = self.metrics
+            job.update(status="extracting", started_at=time.time())
+
+            # One extraction per URL: the probe result drives both the bitrate
+            # calculation and the download itself
+            metadata = self.fetch_metadata(url, options, log=log, job=job)
+            if job.cancel_requested:
+                log("Cancelled.")
+                job.update(status="cancelled", progress="")
+                return False
+            if metadata:
+                job.update(title=metadata.title)
+                if metadata.is_playlist and submit:
+                    return self.expand_playlist(job, metadata, submit, log=log)
+                archived = None
+                if not options.force and metadata.video_id and not metadata.is_playlist:
+                    archived = self.archived_download(metadata.extractor, metadata.video_id, options)
+                if archived:
+                    log(f"Already downloaded with these settings: {archived['output_path'] or archived['title']}")
+                    job.update(status="skipped", progress="already downloaded",
+                               output_path=archived["output_path"], percent=100.0, eta=None)
+                    return True
+
+            direct_formats = self.pick_direct_formats(metadata, options, log=log)
+
+            # Journaled jobs keep their work folder across restarts, so a replayed
+            # job finds (and continues) its partial download. Cancelling removes it.
+            work_name = f"job-{job.journal_id}" if job.journal_id else f"job-{os.getpid()}-{job.id}"
+            work_dir = os.path.join(options.output_dir, STAGING_DIRNAME, work_name)
+            os.makedirs(work_dir, exist_ok=True)
+            if options.compression and options.media == "video":
+                staging_dir = work_dir
+            os.makedirs(os.path.dirname(paths_file), exist_ok=True)
+
+            # Build the command based on selected options
+            rate_limit = self.download_rate_limit()
+            if rate_limit:
+                log(f"Download rate limited to {format_bytes(rate_limit)}/s")
+            cookie_file = self.checkout_cookies(options, log=log)
+            cmd = self.build_command(url, options, log=log, metadata=metadata,
+                                     staging_dir=staging_dir, paths_file=paths_file,
+                                     temp_dir=None if staging_dir else work_dir, rate_limit=rate_limit,
+                                     formats=direct_formats, cookie_file=cookie_file)
+
+            log(f"Running command: {' '.join(cmd)}"
+                + (" (in-process)" if self.ytdlp_pool else ""))
+            job.update(status="downloading")
+
+            # Stream the output: progress becomes events, everything else is
+            # checked once against the known failure patterns and logged
+            parser = ProgressParser()
+            merge_notified = False
+            diagnosed = set()
+            for event, output in self.stream_ytdlp(job, cmd):
+                if event:
+                    if event.stage == "download":
+                        # (a playlist alternates between downloading and processing)
+                        # (lines still buffered when a pause lands must not un-pause the row)
+                        job.update(status="paused" if job.paused else "downloading",
+                                   progress=event.short(), percent=event.percent, eta=event.eta)
+                        job.metrics.download_progress(event)
+                        if job.journal:
+                            job.journal.progress(job, event.done, event.total)
+                    elif event.status == "started" and job.status == "downloading":
+                        job.update(status="processing", progress="", percent=None, eta=None)
+                    if event.stage == "postprocess" and event.detail == "Merger" and not merge_notified:
+                        # Notify user about the merging stage
+                        log("\n" + "=" * 60)
+                        log("MERGING VIDEO AND AUDIO STREAMS...")
+                        if staging_dir:
+                            log("Stream copy in progress - the encode follows as a separate step.")
+                        elif options.media == "video" and options.video_format == "avi":
+                            log("AVI requires full re-encoding (MPEG-4 Part 2 + MP3).")
+                            log("This will take significantly longer than other formats.")
+                        else:
+                            log("Stream copy in progress - this should be quick.")
+                        log("=" * 60 + "\n")
+                        merge_notified = True
+                    if parser.should_log(event):
+                        log(event.describe())
+                    continue
+
+                diagnosis = _DIAGNOSTIC_RE.search(output)
+                if diagnosis:
+                    # Both cookie failures share one explanation per job
+                    key = diagnosis.lastgroup
+                    topic = "cookie" if key.startswith("cookie") else key
+                    if topic not in diagnosed:
+                        diagnosed.add(topic)
+                        heading, body = DIAGNOSTIC_MESSAGES[key]
+                        log("\n" + "=" * 60)
+                        log(heading)
+                        log("=" * 60)
+                        log(body)
+                        log("=" * 60 + "\n")
+                    if key == "cookie_rejected" and cookie_file and self.cookies.invalidate(options.cookies_browser):
+                        log(f"Cookies from {options.cookies_browser} will be read again for the next job")
+
+                log(output.strip())
+
+            self.cookies.release(cookie_file)
+            cookie_file = None
+            return_code = job.returncode
+
+            if job.cancel_requested:
+                log("Download cancelled.")
+                job.update(status="cancelled", progress="", eta=None)
+                return False
+            if return_code != 0:
+                log(f"Download failed with return code: {return_code}")
+                job.update(status="failed")
+                return False
+            if staging_dir and direct_formats and self.place_direct_downloads(job, staging_dir, paths_file,
+                                                                             log=log):
+                return self._complete_download(job, metadata, log)
+            if staging_dir and encode:
+                # Hand the staged file to the encode pool and free this download slot
+                job.staged = (metadata, staging_dir, paths_file)
+                job.lane = "encode"
+                job.update(status="waiting", progress="queued for encoding", percent=None, eta=None)
+                log("Download finished; queued for encoding.")
+                encode(job)
+                handed_off = True
+                return True
+            if staging_dir:
+                if not self.encode_staged_downloads(job, staging_dir, paths_file, log=log):
+                    job.update(status="cancelled" if job.cancel_requested else "failed")
+                    return False
+            else:
+                written = self.read_printed_paths(paths_file)
+                if written:
+                    job.update(output_path=written[-1])
+            return self._complete_download(job, metadata, log)
+
+        except Exception as e:
+            log(f"Error: {str(e)}")
+            job.update(status="failed", error=str(e))
+            return False
+
+        finally:
+            self.cookies.release(cookie_file)
+            if not handed_off:
+                self._cleanup_download(job, paths_file, work_dir)
+
+    def run_staged_encode(self, job, log=None):
+        """Second stage of a download handed off by run_download: encode the staged
+        file(s) (see encode_staged_downloads), then archive and clean up as
+        run_download would have. Returns True on success."""
+        log = log or self.log
+        metadata, staging_dir, paths_file = job.staged
+        try:
+            if job.cancel_requested:
+                log("Download cancelled.")
+                job.update(status="cancelled", progress="", eta=None)
+                return False
+            if not self.encode_staged_downloads(job, staging_dir, paths_file, log=log):
+                job.update(status="cancelled" if job.cancel_requested else "failed")
+                return False
+            return self._complete_download(job, metadata, log)
+        except Exception as e:
+            log(f"Error: {str(e)}")
+            job.update(status="failed", error=str(e))
+            return False
+        finally:
+            job.staged = None
+            self._cleanup_download(job, paths_file, staging_dir)
+
+    def discard_staged(self, job, log=None):
+        """Finish a staged download that was cancelled before its encode started
+        (dropped from the encode queue), removing its staged files."""
+        log = log or self.log
+        metadata, staging_dir, paths_file = job.staged
+        job.staged = None
+        log("Download cancelled.")
+        job.update(status="cancelled", progress="", eta=None)
+        self._cleanup_download(job, paths_file, staging_dir)
+
+    def _complete_download(self, job, metadata, log):
+        options = job.options
+        if metadata and metadata.video_id and not metadata.is_playlist:
+            self.archive.record(metadata.extractor, metadata.video_id, options.settings_key(),
+                                url=job.url, title=metadata.title, output_path=job.output_path,
+                                label=options.settings_label())
+        log("Download completed successfully!")
+        job.update(status="done", progress="100%", percent=100.0, eta=None)
+        return True
+
+    def _cleanup_download(self, job, paths_file, work_dir):
+        try:
+            os.remove(paths_file)
+        except OSError:
+            pass
+        # While the app is closing (journal frozen) partial files stay for the resume
+        if work_dir and not self.journal.closed:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            try:
+                os.rmdir(os.path.dirname(work_dir))  # only succeeds once the last job is done
+            except OSError:
+                pass
+        job.update(finished_at=time.time())
+
+    def expand_playlist(self, job, metadata, submit, log=None):
+        """Turn a playlist/channel job into one job per entry, handed to `submit`
+        in playlist order. Entries the archive already holds for these settings
+        arrive already finished (status 'skipped'); callers only schedule the
+        rest. Nested playlists (channel tabs) expand again when their job runs."""
+        log = log or self.log
+        entries = metadata.entries
+        log(f"Playlist: {metadata.title} ({len(entries)} entries)")
+        queued = skipped = 0
+        for entry in entries:
+            entry_url = metadata.entry_url(entry)
+            if not entry_url:
+                continue
+            child = Job(entry_url, options=job.options)
+            child.parent_id = job.id
+            child.priority = job.priority
+            child.title = entry.get("title") or ""
+            extractor = entry.get("ie_key") or entry.get("extractor_key")
+            archived = None
+            if extractor and entry.get("id") and not job.options.force:
+                archived = self.archived_download(extractor, entry["id"], job.options)
+            if archived:
+                child.update(status="skipped", progress="already downloaded",
+                             output_path=archived["output_path"])
+                skipped += 1
+            else:
+                queued += 1
+            submit(child)
+        log(f"Queued {queued} entries" + (f", skipped {skipped} already downloaded" if skipped else ""))
+        job.update(status="done", progress=f"{queued} queued, {skipped} skipped",
+                   percent=100.0, eta=None, returncode=0)
+        return True
+
+    def journal_job(self, job):
+        """Add a new job to the journal with what is needed to rebuild it."""
+        if job.kind == "convert":
+            spec = {"output_path": job.output_path, "output_format": job.output_format,
+                    "compression": job.compression, "clip": job.clip}
+        else:
+            spec = {"options": job.options.to_dict(), "parent_id": job.parent_id}
+        spec["priority"] = job.priority
+        self.journal.add(job, spec)
+
+    def interrupted_jobs(self, log=None):
+        """Rebuild the jobs an earlier run left unfinished, terminating any of
+        their processes that are still running. Rebuilt jobs keep their journal
+        rows; they are returned queued, ready to be submitted."""
+        log = log or self.log
+        jobs = []
+        for row in self.journal.unfinished():
+            if row["pid"] and terminate_orphan(row["pid"]):
+                log(f"Stopped a leftover process (pid {row['pid']}) from an earlier run")
+            try:
+                spec = json.loads(row["spec"])
+                if row["kind"] == "convert":
+                    if not os.path.isfile(row["url"]):
+                        raise ValueError("input file is gone")
+                    job = self.make_conversion_job(row["url"], spec["output_path"], spec["output_format"],
+                                                   spec["compression"], spec.get("clip"))
+                else:
+                    job = Job(row["url"], options=DownloadOptions.from_dict(spec["options"]))
+                    job.parent_id = spec.get("parent_id")
+                job.priority = spec.get("priority", job.priority)
+            except (ValueError, KeyError, TypeError) as e:
+                self._abandon_journal_row(row, str(e))
+                continue
+            self.journal.attach(job, row)
+            jobs.append(job)
+        self.journal.prune()
+        return jobs
+
+    def _abandon_journal_row(self, row, error):
+        self.state.execute("UPDATE jobs SET status = 'failed', stage = ?, updated_at = ? WHERE id = ?",
+                           (f"not resumable: {error}", time.time(), row["id"]))
+
+    def archived_download(self, extractor, video_id, options):
+        """Archive row for a video under these options, or None. A row whose
+        file has since been deleted or moved does not count."""
+        row = self.archive.find(extractor, video_id, options.settings_key())
+        if row and row["output_path"] and not os.path.exists(row["output_path"]):
+            return None
+        return row
+
+    def archived_url(self, url, options):
+        """Pre-schedule duplicate check: the archive row for a URL, found by its
+        video id when recognisable offline, else by the exact URL. No network."""
+        key = url_video_key(url)
+        if key:
+            return self.archived_download(key[0], key[1], options)
+        row = self.archive.find_url(url, options.settings_key())
+        if row and row["output_path"] and not os.path.exists(row["output_path"]):
+            return None
+        return row
+
+    def pick_direct_formats(self, metadata, options, log=None):
+        """Format selector that makes the ffmpeg re-encode unnecessary, or None.
+        Compressed (auto bitrate): the best formats whose estimated size already
+        fits the target. AVI: formats whose codecs AVI holds as they are."""
+        log = log or self.log
+        if options.media != "video" or not metadata or metadata.is_playlist:
+            return None
+        compression = options.compression
+        if compression:
+            if compression.get('video_bitrate'):
+                return None     # a hand-picked bitrate asks for the encode
+            target = compression['target_size'] * 1024 * 1024
+            # A clip is that fraction of each format's full size
+            fraction = 1.0
+            if options.clip and metadata.duration:
+                fraction = max(0.01, clip_length(options.clip, metadata.duration) / metadata.duration)
+            pick = metadata.pick_formats(options.video_format, max_bytes=target * FORMAT_PICK_MARGIN / fraction)
+            if not pick or pick[1] * fraction < target * FORMAT_PICK_MIN_FILL:
+                return None
+        elif options.video_format == "avi":
+            pick = metadata.pick_formats("avi")
+            if not pick:
+                return None
+        else:
+            return None
+        log(f"Using formats {pick[0]} (~{format_bytes(pick[1])}"
+            + (f", {pick[2]}p" if pick[2] else "") + "): no re-encode needed")
+        return pick[0]
+
+    def download_rate_limit(self):
+        """This download's share of the global rate cap (bytes/s), or None.
+        yt-dlp fixes --limit-rate at launch, so the share is taken when it starts."""
+        if not self.rate_limit:
+            return None
+        concurrent = self.download_concurrency() if self.download_concurrency else 1
+        return max(1, int(self.rate_limit / max(1, concurrent)))
+
+    def acquire_encode_slot(self, job=None, log=None):
+        """Wait for one of the `encode_slots` shared by every CPU-heavy encode.
+        Returns False if the job was cancelled while waiting."""
+        with self._encode_gate:
+            if self._encodes_running >= max(1, self.encode_slots):
+                (log or self.log)("Waiting for a free encoder slot...")
+                if job:
+                    job.update(progress="waiting for encoder")
+            while self._encodes_running >= max(1, self.encode_slots):
+                if job and job.cancel_requested:
+                    return False
+                self._encode_gate.wait(0.5)
+            self._encodes_running += 1
+            return True
+
+    def release_encode_slot(self):
+        with self._encode_gate:
+            self._encodes_running -= 1
+            self._encode_gate.notify_all()
+
+    def set_encode_slots(self, count):
+        """Change the encode cap; waiting encodes start at once if it grew."""
+        with self._encode_gate:
+            self.encode_slots = max(1, int(count))
+            self._encode_gate.notify_all()
+
+    def read_printed_paths(self, paths_file):
+        """Paths yt-dlp wrote via --print-to-file (empty if none)."""
+        try:
+            with open(paths_file, 'r', encoding='utf-8') as f:
+                return [line.strip() for line in f if line.strip()]
+        except OSError:
+            return []
+
+    def place_direct_downloads(self, job, staging_dir, paths_file, log=None):
+        """Move staged files downloaded in already-fitting formats (see
+        pick_direct_formats) to the output folder. If any is over the target
+        after all (sizes were estimates), nothing is moved and False is returned."""
+        log = log or self.log
+        options = job.options
+        target = options.compression['target_size'] * 1024 * 1024
+        staged = [path for path in self.read_printed_paths(paths_file) if os.path.isfile(path)]
+        if not staged:
+            return False
+        oversized = [path for path in staged if os.path.getsize(path) > target]
+        if oversized:
+            log(f"{os.path.basename(oversized[0])} is {format_bytes(os.path.getsize(oversized[0]))}, "
+                f"above the estimate; encoding it to the target instead.")
+            return False
+        for path in staged:
+            output_path = os.path.join(options.output_dir, os.path.basename(path))
+            os.replace(path, output_path)
+            job.update(output_path=output_path)
+        log(f"Already within {options.compression['target_size']}MB; skipped the re-encode.")
+        return True
+
+    def encode_staged_downloads(self, job, staging_dir, paths_file, log=None):
+        """Encode every file yt-dlp left in `staging_dir` to the job's format (and
+        target size), writing the results to the output folder. Returns True on success."""
+        log = log or self.log
+        options = job.options
+        staged = self.read_printed_paths(paths_file)
+        if not staged:
+            # Older yt-dlp builds without --print-to-file: take whatever landed
+            staged = find_media_files(staging_dir, recursive=False)
+        staged = [path for path in staged if os.path.isfile(path)]
+        if not staged:
+            log("Error: yt-dlp finished but no downloaded file was found.")
+            return False
+
+        job.update(status="encoding", progress="")
+        if not self.acquire_encode_slot(job, log=log):
+            return False
+        try:
+            for path in staged:
+                name = os.path.splitext(os.path.basename(path))[0]
+                output_path = os.path.join(options.output_dir, f"{name}.{options.video_format}")
+                if not self.run_conversion(path, output_path, options.video_format,
+                                           options.compression, log=log, job=job):
+                    if job.cancel_requested:
+                        self.remove_partial_output(output_path)
+                    return False
+                job.update(output_path=output_path)
+            return True
+        finally:
+            self.release_encode_slot()
+
+    def encoder_threads(self):
+        """Threads per encoder: the cores split across concurrent encodes."""
+        return max(1, (os.cpu_count() or 1) // max(1, self.encode_slots))
+
+    def encoder_speed_args(self, codec, media=None, pass_number=2):
+        """Speed and threading arguments for a video encoder under the current
+        performance profile. libvpx-vp9 is single-threaded unless row-mt and
+        tile columns are enabled, so those are always set for it."""
+        profile = PERFORMANCE_PROFILES.get(self.performance_profile,
+                                           PERFORMANCE_PROFILES[DEFAULT_PERFORMANCE_PROFILE])
+        threads = str(self.encoder_threads())
+        if codec == 'libx264':
+            return ['-preset', profile['x264_preset'], '-threads', threads]
+        if codec == 'libvpx-vp9':
+            cpu_used = profile['vp9_cpu_used']
+            if pass_number == 1:
+                cpu_used = max(cpu_used, 4)
+            # One tile column per 256px of width, as a power of two (max 2^6)
+            width = (media.video_stream or {}).get('width') if media else None
+            tiles = 2
+            if width:
+                tiles = 0
+                while tiles < 6 and 256 << (tiles + 1) <= width:
+                    tiles += 1
+            return ['-deadline', 'good', '-cpu-used', str(cpu_used), '-row-mt', '1',
+                    '-tile-columns', str(tiles), '-threads', threads]
+        return ['-threads', threads]
+
+    def tool_path(self, name):
+        """Path to an ffmpeg-suite binary (ffmpeg, ffprobe), falling back to PATH.
+        Resolved once by the registry unless ffmpeg_location was pointed elsewhere."""
+        ffmpeg_path = self.binaries.path("ffmpeg")
+        if self.ffmpeg_location and self.ffmpeg_location != (os.path.dirname(ffmpeg_path) if ffmpeg_path else ""):
+            exe = os.path.join(self.ffmpeg_location, f"{name}.exe" if IS_WINDOWS else name)
+            if os.path.isfile(exe):
+                return exe
+        return self.binaries.path(name) or name
+
+    def probe_media(self, filepath, job=None):
+        """Probe a media file with a single ffprobe call (format + all streams).
+        Results are cached on disk keyed by (path, size, mtime), so unchanged
+        files are never probed twice. Returns a MediaInfo, or None on failure."""
+        cached = self.media_cache.get(filepath)
+        if cached:
+            return cached
+        if job:
+            job.metrics.processes += 1
+        try:
+            result = subprocess.run(
+                [self.tool_path("ffprobe"), "-v", "error", "-print_format", "json",
+                 "-show_format", "-show_streams", filepath],
+                capture_output=True, text=True, encoding='utf-8', errors='replace',
+                creationflags=subprocess_flags()
+            )
+            if result.returncode == 0 and result.stdout.strip():
+                return self.media_cache.store(filepath, json.loads(result.stdout))
+        except Exception:
+            pass
+        return None
+
+    def plan_conversion(self, input_path, output_format, compression=None):
+        """Decide up front whether a conversion is a cheap remux ('copy') or a
+        CPU-bound re-encode ('encode'), using the same rules as run_conversion."""
+        if output_format in AUDIO_FORMATS:
+            return "encode"
+        if compression:
+            try:
+                if os.path.getsize(input_path) / (1024 * 1024) > compression['target_size']:
+                    return "encode"
+            except OSError:
+                return "encode"
+            # Under the target: copied if the streams fit the container (see the size guard)
+        v_compat, a_compat = codec_compatibility(output_format, self.probe_media(input_path))
+        return "copy" if v_compat and a_compat else "encode"
+
+    def make_conversion_job(self, input_path, output_path, output_format, compression=None, clip=None):
+        """Create a planned conversion job; its lane is the planned action."""
+        job = Job(input_path, kind="convert")
+        job.output_path = output_path
+        job.output_format = output_format
+        job.compression = compression
+        job.clip = clip
+        job.action = job.lane = self.plan_conversion(input_path, output_format, compression)
+        return job
+
+    def run_conversion_job(self, job, log=None):
+        """Run a queued conversion job. Blocks until ffmpeg exits; returns True on success."""
+        log = log or self.log
+        job.recorder = self.metrics
+        job.update(status="converting", started_at=time.time())
+        try:
+            if os.path.abspath(job.url) == os.path.abspath(job.output_path):
+                log("Skipped: output format is the same as input.")
+                job.update(status="failed", error="output would overwrite the input")
+                return False
+            os.makedirs(os.path.dirname(job.output_path), exist_ok=True)
+            encoding = job.action == "encode"
+            if encoding and not self.acquire_encode_slot(job, log=log):
+                succeeded = False
+            else:
+                try:
+                    succeeded = self.run_conversion(job.url, job.output_path, job.output_format,
+                                                    job.compression, log=log, job=job, clip=job.clip)
+                finally:
+                    if encoding:
+                        self.release_encode_slot()
+            if succeeded:
+                job.update(status="done", progress="100%", percent=100.0, eta=None)
+                return True
+            if job.cancel_requested:
+                self.remove_partial_output(job.output_path)
+                log("Conversion cancelled.")
+                job.update(status="cancelled", progress="", eta=None)
+                return False
+            job.update(status="failed")
+            return False
+        finally:
+            job.update(finished_at=time.time())
+
+    def run_conversion(self, input_path, output_path, output_format, compression=None, log=None, job=None,
+                       clip=None):
+        """Convert a local file with ffmpeg. Returns True on success.
+        compression: spec dict with 'target_size', 'video_bitrate', 'audio_bitrate' or None.
+        clip: (start, end) seconds to keep (see make_clip); stream copies cut at keyframes."""
+        log = log or self.log
+        spec = compression
+        try:
+            ffmpeg_exe = self.tool_path("ffmpeg")
+
+            is_audio_output = output_format in AUDIO_FORMATS
+            # One ffprobe (or a cache hit) answers every duration/codec question below
+            media = self.probe_media(input_path, job=job)
+            source_duration = media.duration if media else None
+            # Everything below (size guard, bitrates, progress) works on the clip's length
+            clip_seconds = clip_length(clip, source_duration) if clip else None
+            duration = None
+
+            # --- File-size guard: skip compression if file is already under target ---
+            if compression:
+                target_size_mb = compression['target_size']
+                input_size_bytes = os.path.getsize(input_path)
+                if clip_seconds and source_duration:
+                    input_size_bytes *= clip_seconds / source_duration
+                input_size_mb = input_size_bytes / (1024 * 1024)
+                # A video stream the container can't hold has to be re-encoded
+                # anyway, and only the target-size encode keeps that under target
+                fits_container = is_audio_output or codec_compatibility(output_format, media)[0]
+
+                if input_size_mb <= target_size_mb and fits_container:
+                    log("=" * 50)
+                    log(f"Input file is already {input_size_mb:.1f}MB, which is")
+                    log(f"under the {target_size_mb}MB target. Using stream copy")
+                    log(f"to avoid unnecessary re-encoding and size bloat.")
+                    log("=" * 50)
+                    compression = None
+                else:
+                    if input_size_mb <= target_size_mb:
+                        log(f"Input is under the {target_size_mb}MB target, but its video "
+                            f"can't be copied into .{output_format}; encoding to the target.")
+                    # Recalculate bitrates with actual file duration for accuracy
+                    duration = clip_seconds or source_duration
+                    if not duration or duration <= 0:
+                        log("Warning: Could not determine duration, estimating 3 minutes.")
+                        duration = 180
+                    compression = self.resolve_compression(spec, duration)
+
+            # --- Compression path: two-pass encode, measured against the target ---
+            if compression and not is_audio_output:
+                return self.encode_to_target_size(input_path, output_path, output_format, spec,
+                                                  duration, media=media, log=log, job=job, clip=clip)
+
+            cmd = [ffmpeg_exe, "-i", input_path, "-y"]
+
+            if is_audio_output:
+                # Audio output: strip video, encode audio
+                cmd.append("-vn")
+                if compression:
+                    # Compressed audio: calculate bitrate from target size and duration
+                    if not duration:
+                        duration = clip_seconds or source_duration
+                        if not duration or duration <= 0:
+                            duration = 180
+                    audio_kbps = max(32, int((compression['target_size'] * 8192) / duration * 0.98))
+                    log(f"Compressing audio to ~{compression['target_size']}MB ({audio_kbps}kbps)")
+                    codec_map = {
+                        'mp3': ['-c:a', 'libmp3lame'], 'aac': ['-c:a', 'aac'],
+                        'm4a': ['-c:a', 'aac'], 'opus': ['-c:a', 'libopus'],
+                        'ogg': ['-c:a', 'libvorbis'],
+                    }
+                    cmd.extend(codec_map.get(output_format, ['-c:a', 'libmp3lame']))
+                    cmd.extend(['-b:a', f'{audio_kbps}k'])
+                else:
+                    codec_map = {
+                        'mp3': ['-c:a', 'libmp3lame', '-b:a', '320k'],
+                        'aac': ['-c:a', 'aac', '-b:a', '320k'],
+                        'm4a': ['-c:a', 'aac', '-b:a', '320k'],
+                        'opus': ['-c:a', 'libopus', '-b:a', '320k'],
+                        'flac': ['-c:a', 'flac'],
+                        'wav': ['-c:a', 'pcm_s16le'],
+                        'ogg': ['-c:a', 'libvorbis', '-b:a', '320k'],
+                        'alac': ['-c:a', 'alac'],
+                    }
+                    cmd.extend(codec_map.get(output_format, ['-c:a', 'copy']))
+            else:
+                # Video output without compression: stream copy when codecs are
+                # compatible with the target container, re-encode only when needed.
+                src_vcodec = media.video_codec if media else None
+                src_acodec = media.audio_codec if media else None
+                log(f"Source codecs: video={src_vcodec or 'unknown'}, audio={src_acodec or 'unknown'}")
+
+                v_compat, a_compat = codec_compatibility(output_format, media)
+
+                # Video codec decision
+                if v_compat:
+                    v_args = ['-c:v', 'copy']
+                else:
+                    # Re-encode to the most appropriate codec for this container
+                    log(f"Re-encoding video: {src_vcodec} is not compatible with .{output_format}")
+                    v_encode_map = {
+                        'mp4':  ['-c:v', 'libx264', '-crf', '18'],
+                        'mov':  ['-c:v', 'libx264', '-crf', '18'],
+                        'webm': ['-c:v', 'libvpx-vp9', '-crf', '30', '-b:v', '0'],
+                        'avi':  ['-c:v', 'mpeg4', '-q:v', '3'],
+                    }
+                    v_args = v_encode_map.get(output_format, ['-c:v', 'libx264', '-crf', '18'])
+                    v_args = v_args + self.encoder_speed_args(v_args[1], media)
+
+                # Audio codec decision
+                if a_compat:
+                    a_args = ['-c:a', 'copy']
+                else:
+                    log(f"Re-encoding audio: {src_acodec} is not compatible with .{output_format}")
+                    a_encode_map = {
+                        'mp4':  ['-c:a', 'aac', '-b:a', '320k'],
+                        'mov':  ['-c:a', 'aac', '-b:a', '320k'],
+                        'webm': ['-c:a', 'libopus', '-b:a', '320k'],
+                        'avi':  ['-c:a', 'mp3', '-b:a', '320k'],
+                    }
+                    a_args = a_encode_map.get(output_format, ['-c:a', 'aac', '-b:a', '320k'])
+
+                cmd.extend(v_args + a_args)
+
+                # Log what's happening so the user knows if it'll be fast or slow
+                if v_compat and a_compat:
+                    log("Stream copy mode (fast remux, no re-encoding)")
+                elif not v_compat and not a_compat:
+                    log("Full re-encode required - this will take longer.")
+
+            if clip:
+                copies_video = any(a == '-c:v' and b == 'copy' for a, b in zip(cmd, cmd[1:]))
+                before_input, after_input = self.clip_args(input_path, clip, keyframe_start=copies_video, log=log)
+                cmd[1:1] = before_input
+                cmd.extend(after_input)
+            cmd.append(output_path)
+
+            log(f"Converting: {os.path.basename(input_path)} -> {os.path.basename(output_path)}")
+            return_code = self._run_ffmpeg(cmd, log, job=job, duration=clip_seconds or source_duration)
+
+            if return_code == 0:
+                log(f"\nConversion completed successfully!")
+                log(f"Output: {output_path}")
+                return True
+            log(f"\nConversion failed with return code: {return_code}")
+            return False
+        except Exception as e:
+            log(f"Error: {str(e)}")
+            return False
+
+    def keyframe_before(self, input_path, seconds):
+        """Timestamp of the last video keyframe at or before `seconds`, or None."""
+        try:
+            result = subprocess.run(
+                [self.tool_path("ffprobe"), "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+                 "-show_entries", "frame=best_effort_timestamp_time", "-of", "csv=p=0",
+                 "-read_intervals", f"{max(0.0, seconds - 30):.3f}%{seconds + 0.001:.3f}", input_path],
+                capture_output=True, text=True, timeout=60, creationflags=subprocess_flags())
+        except (OSError, subprocess.SubprocessError):
+            return None
+        keyframes = [_to_float(line.strip().rstrip(",")) for line in result.stdout.splitlines()]
+        keyframes = [t for t in keyframes if t is not None and t <= seconds + 0.001]
+        return max(keyframes) if keyframes else None
+
+    def clip_args(self, input_path, clip, keyframe_start=False, log=None):
+        """ffmpeg arguments (before -i, after -i) that keep only `clip`.
+        A stream copy can only start on a keyframe, so with keyframe_start the
+        start moves back to the keyframe before it (the clip gets slightly longer
+        rather than starting on a broken frame)."""
+        log = log or self.log
+        start, end = clip
+        start = start or 0.0
+        if keyframe_start and start:
+            keyframe = self.keyframe_before(input_path, start)
+            if keyframe is not None and keyframe < start:
+                log(f"Stream copy: clip starts at the keyframe at {keyframe:.2f}s (asked for {start:.2f}s)")
+                start = keyframe
+        before_input = ["-ss", f"{start:.3f}"] if start else []
+        after_input = ["-t", f"{end - start:.3f}"] if end is not None else []
+        return before_input, after_input
+
+    def remove_partial_output(self, path):
+        """Delete what a cancelled ffmpeg run wrote (-y already truncated any older file)."""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _run_ffmpeg(self, cmd, log, job=None, duration=None, label=None):
+        """Run one ffmpeg command, streaming its output to `log`. Returns the exit code.
+        Progress is read from -progress and, given a job, shown on it (prefixed
+        with `label`, e.g. 'pass 1/2')."""
+        cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+        log(f"Running: {' '.join(cmd)}")
+        parser = ProgressParser(duration)
+        # Only real video encodes count towards the job's encode fps
+        encodes_video = "-vn" not in cmd and ("-c:v" not in cmd or cmd[cmd.index("-c:v") + 1] != "copy")
+        frames = 0
+        started = time.monotonic()
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            creationflags=subprocess_flags(),
+            start_new_session=True
+        )
+        if job:
+            job.attach_process(process, cmd)
+        while True:
+            output = process.stdout.readline()
+            if output == '' and process.poll() is not None:
+                break
+            if not output:
+                continue
+            is_progress, event = parser.feed(output)
+            if not is_progress:
+                log(output.strip())
+            elif event:
+                frames = event.frames or frames
+                if job:
+                    text = event.short()
+                    job.update(progress=f"{label} {text}".strip() if label else text,
+                               percent=event.percent, eta=event.eta)
+                if parser.should_log(event):
+                    log(event.describe() if not label else f"{label}: {event.describe()}")
+        if job:
+            job.release_process()
+            if encodes_video and frames:
+                job.metrics.encoded(frames, time.monotonic() - started)
+        return process.poll()
+
+    def size_target_encoder_args(self, output_format, video_bitrate, audio_bitrate, pass_number, media=None):
+        """ffmpeg codec arguments for one pass of a target-size encode.
+        Pass 1 only analyses video, so it gets no audio and the faster settings."""
+        if output_format == "webm":
+            codec, audio = 'libvpx-vp9', ['-c:a', 'libopus']
+        else:
+            codec, audio = 'libx264', ['-c:a', 'libmp3lame' if output_format == "avi" else 'aac']
+        video = ['-c:v', codec, '-b:v', f'{video_bitrate}k',
+                 *self.encoder_speed_args(codec, media, pass_number)]
+        if pass_number == 1:
+            return video + ['-an']
+        return video + audio + ['-b:a', f'{audio_bitrate}k', '-ar', '48000']
+
+    def corrected_video_bitrate(self, video_bitrate, actual_bytes, target_bytes, audio_bitrate, duration):
+        """Scale the video bitrate by how far the measured output missed the target.
+        The audio track is (near) constant bitrate, so only the video share is scaled."""
+        audio_bytes = audio_bitrate * 125 * duration
+        wanted = target_bytes * 0.99 - audio_bytes
+        produced = max(1, actual_bytes - audio_bytes)
+        corrected = int(video_bitrate * wanted / produced)
+        if actual_bytes > target_bytes:
+            corrected = min(corrected, video_bitrate - 1)
+        return max(50, corrected)
+
+    def encode_to_target_size(self, input_path, output_path, output_format, spec, duration,
+                              media=None, log=None, job=None, clip=None):
+        """Two-pass encode to spec['target_size'] MB, then measure the real output.
+        A miss (any overshoot, or an undershoot past SIZE_TARGET_UNDERSHOOT with an
+        auto bitrate) re-runs only the second pass with a corrected bitrate, reusing
+        the first-pass statistics. Every attempt is written to its own file and the
+        largest one within the target becomes `output_path`. With a clip, only that
+        section is encoded (and `duration` is its length). Returns True once a file
+        within the target has been written; False if no attempt fit."""
+        log = log or self.log
+        ffmpeg_exe = self.tool_path("ffmpeg")
+        before_input, after_input = self.clip_args(input_path, clip, log=log) if clip else ([], [])
+        target_bytes = spec['target_size'] * 1024 * 1024
+        audio_bitrate = spec['audio_bitrate']
+        auto_bitrate = not spec.get('video_bitrate')
+        video_bitrate = self.resolve_compression(spec, duration)['video_bitrate']
+
+        log("=" * 50)
+        log(f"COMPRESSING to ~{spec['target_size']}MB (two-pass, {self.performance_profile} profile)")
+        log(f"Duration: {int(duration // 60)}m {int(duration % 60)}s")
+        log(f"Video bitrate: {video_bitrate}kbps  |  Audio bitrate: {audio_bitrate}kbps")
+        log("=" * 50)
+
+        # Per-job pass log, so parallel encodes never share x264/libvpx stats files
+        passlog_dir = tempfile.mkdtemp(prefix="ytdlp-gui-2pass-")
+        passlog = os.path.join(passlog_dir, "pass")
+        null_output = "NUL" if IS_WINDOWS else os.devnull
+        # Second passes write next to the output (same filesystem, so the kept
+        # attempt is renamed into place)
+        stem, ext = os.path.splitext(output_path)
+        attempts = []
+        try:
+            cmd = [ffmpeg_exe, "-y", *before_input, "-i", input_path, *after_input,
+                   *self.size_target_encoder_args(output_format, video_bitrate, audio_bitrate, 1, media),
+                   "-pass", "1", "-passlogfile", passlog, "-f", "null", null_output]
+            return_code = self._run_ffmpeg(cmd, log, job=job, duration=duration, label="pass 1/2")
+            if return_code != 0:
+                log(f"\nFirst pass failed with return code: {return_code}")
+                return False
+
+            overshot = False
+            best = None     # (bytes, path) of the largest attempt within the target
+            for attempt in range(1, SIZE_TARGET_MAX_ATTEMPTS + 1):
+                label = "pass 2/2" if attempt == 1 else f"correction {attempt - 1}"
+                attempt_path = f"{stem}.size-attempt{attempt}{ext}"
+                attempts.append(attempt_path)
+                cmd = [ffmpeg_exe, "-y", *before_input, "-i", input_path, *after_input,
+                       *self.size_target_encoder_args(output_format, video_bitrate, audio_bitrate, 2, media),
+                       "-pass", "2", "-passlogfile", passlog, attempt_path]
+                return_code = self._run_ffmpeg(cmd, log, job=job, duration=duration, label=label)
+                if return_code != 0:
+                    log(f"\nConversion failed with return code: {return_code}")
+                    return False
+
+                actual_bytes = os.path.getsize(attempt_path)
+                actual_mb = actual_bytes / (1024 * 1024)
+                log(f"Encoded size: {actual_mb:.2f}MB at {video_bitrate}kbps "
+                    f"(target {spec['target_size']}MB, attempt {attempt})")
+
+                if actual_bytes > target_bytes:
+                    overshot = True
+                else:
+                    if not best or actual_bytes > best[0]:
+                        best = (actual_bytes, attempt_path)
+                    # A hand-picked bitrate that fits is honoured, however small
+                    if not auto_bitrate or overshot or actual_bytes >= target_bytes * SIZE_TARGET_UNDERSHOOT:
+                        break
+
+                if attempt == SIZE_TARGET_MAX_ATTEMPTS:
+                    break
+                new_bitrate = self.corrected_video_bitrate(video_bitrate, actual_bytes, target_bytes,
+                                                           audio_bitrate, duration)
+                if new_bitrate == video_bitrate:
+                    break
+                log(f"Re-encoding with corrected video bitrate: {video_bitrate}kbps -> {new_bitrate}kbps")
+                video_bitrate = new_bitrate
+
+            if not best:
+                message = f"output is {actual_mb:.2f}MB, above the {spec['target_size']}MB target"
+                log(f"\nError: {message} after {len(attempts)} attempt(s).")
+                if job:
+                    job.update(error=f"over target size: {message}")
+                return False
+            os.replace(best[1], output_path)
+            log(f"\nConversion completed successfully! ({best[0] / (1024 * 1024):.2f}MB)")
+            log(f"Output: {output_path}")
+            return True
+        finally:
+            shutil.rmtree(passlog_dir, ignore_errors=True)
+            for path in attempts:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
 class YtDlpGUI:
-    def __init__(self, root):
+    def __init__(self, root, startup=None, report_startup=False):
         self.root = root
-        
-        def get_base_path():
-            """Get the base directory of the application"""
-            if getattr(sys, 'frozen', False):
-                # Running as compiled executable
-                return os.path.dirname(sys.executable)
-            else:
-                # Running as script
-                return os.path.dirname(os.path.abspath(__file__))
+        # With report_startup the window closes again once it is interactive
+        # (see _on_first_paint); the timings decide the exit code
+        self.startup = startup or StartupTimer()
+        self.report_startup = report_startup
         
         self.base_path = get_base_path()
         self.deps_path = os.path.join(self.base_path, "dependencies")
+        config = self._load_config()
         
         def resource_path(relative_path):
             """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -62,16 +3584,11 @@ class YtDlpGUI:
                         padding=(10, 4))
         
         # Configuration
-        # Check for local ffmpeg first, then fall back to system paths
-        local_ffmpeg = os.path.join(self.deps_path, "ffmpeg", "bin")
-        if os.path.exists(local_ffmpeg):
-            self.ffmpeg_location = local_ffmpeg
-        elif IS_WINDOWS and os.path.exists("C:\\ffmpeg\\bin"):
-            self.ffmpeg_location = "C:\\ffmpeg\\bin"
-        else:
-            # On Linux/macOS, ffmpeg is typically on PATH already
-            ffmpeg_path = shutil.which("ffmpeg")
-            self.ffmpeg_location = os.path.dirname(ffmpeg_path) if ffmpeg_path else ""
+        # Command construction, probing and ffmpeg/yt-dlp lookup live in the engine;
+        # binary paths and versions from the last run are reused (see BinaryRegistry)
+        binaries = BinaryRegistry(self.deps_path, cache=config.get("binaries"))
+        self.engine = DownloadEngine(self.base_path, log=self.update_console, binaries=binaries)
+        self.startup.mark("engine")
         
         # Find user's desktop path (cross-platform)
         if IS_WINDOWS:
@@ -81,6 +3598,31 @@ class YtDlpGUI:
             if not os.path.isdir(self.output_dir):
                 self.output_dir = os.path.expanduser('~')
         
+        # Download queue: jobs run on a bounded pool of yt-dlp workers
+        self.jobs = []
+        self._new_jobs = queue.Queue()
+        parallel = config.get("max_parallel_downloads", 2)
+        self.scheduler = JobScheduler(self.run_download, max_workers=parallel)
+
+        # Conversion queue: one worker per core; remuxes are I/O-bound, so only
+        # CPU-heavy re-encodes (conversions and the encodes of compressed
+        # downloads) share one cap, by default half the cores
+        cores = os.cpu_count() or 2
+        encodes = config.get("max_parallel_encodes", max(1, cores // 2))
+        self.convert_scheduler = JobScheduler(self.run_conversion_job, max_workers=max(2, cores),
+                                              lane_limits={"encode": encodes})
+        self.engine.set_encode_slots(encodes)
+        self.engine.download_concurrency = self.scheduler.expected_concurrency
+        # Global download rate cap (MB/s in the config, 0 = unlimited)
+        self.engine.rate_limit = int(config.get("download_rate_limit_mbps", 0) * 1024 * 1024) or None
+        network = config.get("network", {})
+        self.engine.network.update({key: network[key] for key in NETWORK_DEFAULTS if key in network})
+        profile = config.get("performance_profile", DEFAULT_PERFORMANCE_PROFILE)
+        if profile in PERFORMANCE_PROFILES:
+            self.engine.performance_profile = profile
+        if config.get("in_process_ytdlp"):
+            self.engine.set_in_process(True)
+
         # Track which widget should receive mousewheel events
         self._scroll_target = None
         
@@ -90,8 +3632,14 @@ class YtDlpGUI:
         
         # --- Status Bar (pack BOTTOM first so it's always visible) ---
         self.status_var = tk.StringVar(value="Ready")
-        status_bar = ttk.Label(root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
-        status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        status_frame = ttk.Frame(root)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.console_stats_var = tk.StringVar(value="")
+        console_stats = ttk.Label(status_frame, textvariable=self.console_stats_var, relief=tk.SUNKEN,
+                                  anchor=tk.E, width=30)
+        console_stats.pack(side=tk.RIGHT)
+        status_bar = ttk.Label(status_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
+        status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
         # --- Header (shared across tabs) ---
         header_frame = ttk.Frame(root, padding=(15, 12, 15, 0))
@@ -115,8 +3663,27 @@ class YtDlpGUI:
                                         command=self.browse_output_dir, style="Secondary.TButton")
         browse_output_btn.pack(side=tk.LEFT, padx=(5, 0))
         
+        # Encoder profile (applies to every re-encode, in both tabs)
+        ttk.Label(output_dir_inner, text="Encoder profile:").pack(side=tk.LEFT, padx=(16, 4))
+        self.profile_var = tk.StringVar(value=self.engine.performance_profile)
+        profile_combo = ttk.Combobox(output_dir_inner, textvariable=self.profile_var,
+                                     values=tuple(PERFORMANCE_PROFILES), width=10, state="readonly")
+        profile_combo.pack(side=tk.LEFT)
+        profile_combo.bind("<<ComboboxSelected>>", lambda e: self.update_performance_profile())
+
+        ttk.Label(output_dir_inner, text="Encodes at once:").pack(side=tk.LEFT, padx=(16, 4))
+        self.encode_slots_var = tk.IntVar(value=self.engine.encode_slots)
+        ttk.Spinbox(output_dir_inner, from_=1, to=max(1, os.cpu_count() or 1), width=4, state="readonly",
+                    textvariable=self.encode_slots_var,
+                    command=self.update_encode_slots).pack(side=tk.LEFT)
+
         # --- Console Output (shared, pack before notebook so it claims space at bottom) ---
-        console_frame = ttk.LabelFrame(root, text="Console Output")
+        # The widget keeps only the newest lines; the full log is on disk
+        self.console_max_lines = max(100, int(config.get("console_max_lines", DEFAULT_CONSOLE_MAX_LINES)))
+        self.console_log_path = os.path.join(self.base_path, "logs", "ytdlp-gui.log")
+        self._console_file_log = self._open_console_log(self.console_log_path)
+        console_frame = ttk.LabelFrame(
+            root, text=f"Console Output (last {self.console_max_lines} lines, full log: logs/ytdlp-gui.log)")
         console_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=15, pady=(0, 8))
         
         console_inner = ttk.Frame(console_frame)
@@ -131,8 +3698,12 @@ class YtDlpGUI:
         console_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         self.console.config(yscrollcommand=console_scroll.set)
         
-        # Thread-safe console message queue
+        # Thread-safe console message queue of (enqueue time, text); the drain
+        # adapts its interval to the traffic and reports depth and lag
         self._console_queue = queue.Queue()
+        self._console_interval = CONSOLE_POLL_MS
+        self.console_metrics = {"depth": 0, "lag": 0.0, "max_lag": 0.0, "lines": 0, "ticks": 0,
+                                "interval_ms": CONSOLE_POLL_MS}
         self._poll_console_queue()
         
         # Console mousewheel: scrolls the console only, never the background
@@ -201,12 +3772,13 @@ class YtDlpGUI:
                 _dl_mousewheel(event)
         root.bind_all("<MouseWheel>", _global_mousewheel)
         
-        # --- YouTube URL ---
-        url_frame = ttk.LabelFrame(dl_frame, text="YouTube URL")
+        # --- YouTube URL(s) ---
+        url_frame = ttk.LabelFrame(dl_frame, text="YouTube URL(s) - one per line")
         url_frame.pack(fill=tk.X, pady=(0, 10))
-        
-        self.url_entry = ttk.Entry(url_frame, width=70)
-        self.url_entry.pack(fill=tk.X, padx=10, pady=8)
+
+        self.url_text = tk.Text(url_frame, width=70, height=4, wrap=tk.NONE,
+                                font=("Consolas", 9), undo=True)
+        self.url_text.pack(fill=tk.X, padx=10, pady=8)
         
         # --- Options ---
         options_frame = ttk.LabelFrame(dl_frame, text="Options")
@@ -241,6 +3813,9 @@ class YtDlpGUI:
         
         self.update_age_limit_state()
         
+        # --- Clip (only this section is downloaded) ---
+        self.clip_start_entry, self.clip_end_entry = self._add_clip_fields(options_frame)
+
         # --- Cookies ---
         cookies_frame = ttk.Frame(options_frame)
         cookies_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -382,16 +3957,7 @@ class YtDlpGUI:
         self.preset_var = tk.StringVar(value="discord_8mb")
         preset_combo = ttk.Combobox(self.simple_frame, textvariable=self.preset_var,
                                     state="readonly", width=40)
-        preset_combo['values'] = (
-            'Discord 8MB (Video)',
-            'Discord 25MB (Nitro Classic)',
-            'Discord 50MB (Nitro)',
-            'Discord 100MB (Nitro Boost)',
-            'Twitter/X 512MB',
-            'Instagram 100MB',
-            'WhatsApp 16MB',
-            'Telegram 2GB'
-        )
+        preset_combo['values'] = tuple(COMPRESSION_PRESETS)
         preset_combo.current(0)
         preset_combo.pack(fill=tk.X, pady=(5, 0))
         
@@ -431,11 +3997,75 @@ class YtDlpGUI:
         self.download_button = ttk.Button(dl_action_frame, text="Download",
                                             command=self.start_download, style="Action.TButton")
         self.download_button.pack(side=tk.LEFT)
-        
+
+        ttk.Label(dl_action_frame, text="Parallel downloads:").pack(side=tk.LEFT, padx=(16, 4))
+        self.parallel_var = tk.IntVar(value=self.scheduler.max_workers)
+        ttk.Spinbox(dl_action_frame, from_=1, to=16, width=4, state="readonly",
+                    textvariable=self.parallel_var,
+                    command=self.update_parallel_downloads).pack(side=tk.LEFT)
+
+        ttk.Label(dl_action_frame, text="Limit (MB/s, 0 = off):").pack(side=tk.LEFT, padx=(16, 4))
+        self.rate_limit_var = tk.StringVar(value=f"{(self.engine.rate_limit or 0) / (1024 * 1024):g}")
+        rate_spin = ttk.Spinbox(dl_action_frame, from_=0, to=1000, increment=0.5, width=5,
+                                textvariable=self.rate_limit_var, command=self.update_rate_limit)
+        rate_spin.pack(side=tk.LEFT)
+        rate_spin.bind("<Return>", lambda e: self.update_rate_limit())
+        rate_spin.bind("<FocusOut>", lambda e: self.update_rate_limit())
+
+        ttk.Label(dl_action_frame, text="Priority:").pack(side=tk.LEFT, padx=(16, 4))
+        self.priority_var = tk.StringVar(value="Normal")
+        ttk.Combobox(dl_action_frame, textvariable=self.priority_var, values=tuple(JOB_PRIORITIES),
+                     width=7, state="readonly").pack(side=tk.LEFT)
+
+        self.force_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dl_action_frame, text="Re-download", variable=self.force_var).pack(side=tk.LEFT, padx=(16, 0))
+
+        library_button = ttk.Button(dl_action_frame, text="Library",
+                                    command=self.show_library, style="Secondary.TButton")
+        library_button.pack(side=tk.RIGHT, padx=(5, 0))
+
+        network_button = ttk.Button(dl_action_frame, text="Network",
+                                    command=self.show_network_settings, style="Secondary.TButton")
+        network_button.pack(side=tk.RIGHT, padx=(5, 0))
+
         help_button = ttk.Button(dl_action_frame, text="Format Guide",
                                  command=self.show_format_guide, style="Secondary.TButton")
         help_button.pack(side=tk.RIGHT)
-        
+
+        # --- Download Queue ---
+        queue_frame = ttk.LabelFrame(dl_frame, text="Download Queue")
+        queue_frame.pack(fill=tk.X, pady=(0, 10))
+
+        queue_inner = ttk.Frame(queue_frame)
+        queue_inner.pack(fill=tk.X, padx=10, pady=(8, 4))
+
+        self.job_tree = ttk.Treeview(queue_inner, columns=("id", "url", "priority", "status", "progress"),
+                                     show="headings", height=6, selectmode="extended")
+        for column, heading, width, stretch in (("id", "#", 40, False),
+                                                ("url", "URL", 450, True),
+                                                ("priority", "Priority", 70, False),
+                                                ("status", "Status", 110, False),
+                                                ("progress", "Progress", 110, False)):
+            self.job_tree.heading(column, text=heading, anchor=tk.W)
+            self.job_tree.column(column, width=width, stretch=stretch, anchor=tk.W)
+        self.job_tree.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+        job_tree_scroll = ttk.Scrollbar(queue_inner, command=self.job_tree.yview)
+        job_tree_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.job_tree.config(yscrollcommand=job_tree_scroll.set)
+
+        queue_actions = ttk.Frame(queue_frame)
+        queue_actions.pack(fill=tk.X, padx=10, pady=(0, 8))
+        ttk.Button(queue_actions, text="Clear Finished", command=self.clear_finished_jobs,
+                   style="Secondary.TButton").pack(side=tk.LEFT)
+        self._add_job_control_buttons(queue_actions, self.job_tree)
+        ttk.Button(queue_actions, text="Prioritize", style="Secondary.TButton",
+                   command=self.prioritize_selected_jobs).pack(side=tk.LEFT, padx=(5, 0))
+        self.dl_progress_var = tk.StringVar(value="")
+        ttk.Label(queue_actions, textvariable=self.dl_progress_var, width=28).pack(side=tk.RIGHT)
+        self.dl_progress = ttk.Progressbar(queue_actions, mode="determinate", maximum=100, length=320)
+        self.dl_progress.pack(side=tk.RIGHT, padx=(0, 8))
+
         # =============================================================
         # TAB 2: File Converter
         # =============================================================
@@ -485,10 +4115,19 @@ class YtDlpGUI:
                 _conv_mousewheel(event)
         root.bind_all("<MouseWheel>", _global_mousewheel_updated)
         
-        # Input file
-        input_frame = ttk.LabelFrame(conv_frame, text="Input File")
+        # Input file or folder
+        input_frame = ttk.LabelFrame(conv_frame, text="Input")
         input_frame.pack(fill=tk.X, pady=(0, 10))
         
+        input_mode_row = ttk.Frame(input_frame)
+        input_mode_row.pack(fill=tk.X, padx=10, pady=(8, 0))
+
+        self.converter_input_mode = tk.StringVar(value="file")
+        ttk.Radiobutton(input_mode_row, text="Single file", variable=self.converter_input_mode,
+                        value="file", command=self.update_converter_input_mode).pack(side=tk.LEFT)
+        ttk.Radiobutton(input_mode_row, text="Folder (batch)", variable=self.converter_input_mode,
+                        value="folder", command=self.update_converter_input_mode).pack(side=tk.LEFT, padx=(10, 0))
+
         input_row = ttk.Frame(input_frame)
         input_row.pack(fill=tk.X, padx=10, pady=8)
         
@@ -499,6 +4138,21 @@ class YtDlpGUI:
                    command=self.browse_converter_input,
                    style="Secondary.TButton").pack(side=tk.LEFT, padx=(5, 0))
         
+        self.converter_batch_row = ttk.Frame(input_frame)
+        self.converter_batch_row.pack(fill=tk.X, padx=10, pady=(0, 8))
+
+        self.converter_recursive = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.converter_batch_row, text="Include subfolders",
+                        variable=self.converter_recursive).pack(side=tk.LEFT)
+        ttk.Label(self.converter_batch_row, text="File pattern:").pack(side=tk.LEFT, padx=(16, 4))
+        self.converter_pattern_entry = ttk.Entry(self.converter_batch_row, width=40)
+        self.converter_pattern_entry.pack(side=tk.LEFT)
+        self.converter_pattern_entry.insert(0, "*")
+        ttk.Label(self.converter_batch_row, text="(e.g. *.mkv;*.webm - '*' means all media files)",
+                  font=("Arial", 8), foreground="gray").pack(side=tk.LEFT, padx=(8, 0))
+
+        self.update_converter_input_mode()
+
         # Output format
         format_conv_frame = ttk.LabelFrame(conv_frame, text="Output Format")
         format_conv_frame.pack(fill=tk.X, pady=(0, 10))
@@ -521,6 +4175,9 @@ class YtDlpGUI:
                   text="Supports video-to-video, audio-to-audio, and video-to-audio conversion.",
                   font=("Arial", 8), foreground="gray").pack(side=tk.LEFT, padx=(12, 0))
         
+        # Trim: stream copies cut at the nearest keyframe, encodes cut exactly
+        self.conv_clip_start_entry, self.conv_clip_end_entry = self._add_clip_fields(format_conv_frame)
+
         # --- Converter Compression (mirrors Downloader compression) ---
         conv_compress_frame = ttk.LabelFrame(conv_frame, text="Compression (Optional)")
         conv_compress_frame.pack(fill=tk.X, pady=(0, 10))
@@ -554,16 +4211,7 @@ class YtDlpGUI:
         self.conv_preset_var = tk.StringVar(value="Discord 8MB (Video)")
         conv_preset_combo = ttk.Combobox(self.conv_simple_frame, textvariable=self.conv_preset_var,
                                          state="readonly", width=40)
-        conv_preset_combo['values'] = (
-            'Discord 8MB (Video)',
-            'Discord 25MB (Nitro Classic)',
-            'Discord 50MB (Nitro)',
-            'Discord 100MB (Nitro Boost)',
-            'Twitter/X 512MB',
-            'Instagram 100MB',
-            'WhatsApp 16MB',
-            'Telegram 2GB'
-        )
+        conv_preset_combo['values'] = tuple(COMPRESSION_PRESETS)
         conv_preset_combo.current(0)
         conv_preset_combo.pack(fill=tk.X, pady=(5, 0))
         
@@ -599,10 +4247,120 @@ class YtDlpGUI:
         # Convert button
         self.convert_button = ttk.Button(conv_frame, text="Convert",
                                          command=self.start_conversion, style="Action.TButton")
-        self.convert_button.pack(anchor=tk.W, pady=(5, 0))
-        
+        self.convert_button.pack(anchor=tk.W, pady=(5, 10))
+
+        # --- Conversion Queue ---
+        conv_queue_frame = ttk.LabelFrame(conv_frame, text="Conversion Queue")
+        conv_queue_frame.pack(fill=tk.X, pady=(0, 10))
+
+        conv_queue_inner = ttk.Frame(conv_queue_frame)
+        conv_queue_inner.pack(fill=tk.X, padx=10, pady=(8, 4))
+
+        self.conv_job_tree = ttk.Treeview(conv_queue_inner,
+                                          columns=("id", "input", "action", "status", "progress"),
+                                          show="headings", height=6, selectmode="extended")
+        for column, heading, width, stretch in (("id", "#", 40, False),
+                                                ("input", "Input", 460, True),
+                                                ("action", "Action", 80, False),
+                                                ("status", "Status", 110, False),
+                                                ("progress", "Progress", 110, False)):
+            self.conv_job_tree.heading(column, text=heading, anchor=tk.W)
+            self.conv_job_tree.column(column, width=width, stretch=stretch, anchor=tk.W)
+        self.conv_job_tree.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+        conv_tree_scroll = ttk.Scrollbar(conv_queue_inner, command=self.conv_job_tree.yview)
+        conv_tree_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.conv_job_tree.config(yscrollcommand=conv_tree_scroll.set)
+
+        conv_queue_actions = ttk.Frame(conv_queue_frame)
+        conv_queue_actions.pack(fill=tk.X, padx=10, pady=(0, 8))
+        ttk.Button(conv_queue_actions, text="Clear Finished", command=self.clear_finished_jobs,
+                   style="Secondary.TButton").pack(side=tk.LEFT)
+        self._add_job_control_buttons(conv_queue_actions, self.conv_job_tree)
+        self.conv_progress_var = tk.StringVar(value="")
+        ttk.Label(conv_queue_actions, textvariable=self.conv_progress_var, width=28).pack(side=tk.RIGHT)
+        self.conv_progress = ttk.Progressbar(conv_queue_actions, mode="determinate", maximum=100, length=240)
+        self.conv_progress.pack(side=tk.RIGHT, padx=(0, 8))
+        self.conv_limits_var = tk.StringVar()
+        ttk.Label(conv_queue_actions, textvariable=self.conv_limits_var,
+                  font=("Arial", 8), foreground="gray").pack(side=tk.LEFT, padx=(12, 0))
+        self._update_conv_limits_label()
+
+        # Keep the queue rows and status bar in sync with the worker threads
+        self._poll_jobs()
+
+        # Closing stops running jobs for a resume
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.startup.mark("window built")
+
+        # Dependency checks run after the first paint; unfinished jobs from last
+        # time resume once they pass
+        self._first_mapped = False
+        self.root.bind("<Map>", self._on_first_map, add="+")
+
         # Show donation dialog on startup (if not dismissed permanently)
-        self.root.after(300, self.show_donation_dialog)
+        if not report_startup:
+            self.root.after(300, self.show_donation_dialog)
+
+    # -----------------------------------------------------------------
+    # Startup: first paint, background dependency checks
+    # -----------------------------------------------------------------
+
+    def _on_first_map(self, event):
+        if event.widget is not self.root or self._first_mapped:
+            return
+        self._first_mapped = True
+        # The window is drawn in the idle pass after it is mapped
+        self.root.after_idle(self._on_first_paint)
+
+    def _on_first_paint(self):
+        """The window is up: report startup timings and verify dependencies off the UI thread."""
+        self.startup.mark("interactive")
+        if self.report_startup:
+            print(json.dumps(self.startup.to_dict(), indent=2))
+            self.root.destroy()
+            return
+        self.update_console(self.startup.report())
+        if self.startup.over_budget:
+            self.update_console(f"Warning: the window took longer than the {self.startup.budget:g}s "
+                                f"startup budget to become interactive")
+        versions = {}
+
+        def verify():
+            versions.update(self.engine.binaries.verify())
+            self.startup.mark("dependencies verified")
+
+        thread = threading.Thread(target=verify, daemon=True)
+        thread.start()
+        self._wait_for_dependencies(thread, versions)
+
+    def _wait_for_dependencies(self, thread, versions):
+        if thread.is_alive():
+            self.root.after(100, self._wait_for_dependencies, thread, versions)
+            return
+        self._dependencies_verified(versions)
+
+    def _dependencies_verified(self, versions):
+        """Remember what was found, stop if yt-dlp or ffmpeg is missing, else resume old jobs."""
+        cfg = self._load_config()
+        snapshot = self.engine.binaries.snapshot()
+        if cfg.get("binaries") != snapshot:
+            cfg["binaries"] = snapshot
+            self._save_config(cfg)
+        found = ", ".join(f"{name} {version}" for name, version in versions.items() if version)
+        seconds = self.startup.elapsed("dependencies verified") - self.startup.elapsed("interactive")
+        self.update_console(f"Dependencies: {found or 'none found'} (checked in {seconds * 1000:.0f} ms)")
+
+        missing = [name for name in ("yt-dlp", "ffmpeg") if not versions.get(name)]
+        if missing:
+            show_missing_dependency(missing[0], self.base_path)
+            self.engine.journal.close()
+            self.root.destroy()
+            return
+        if not versions.get("node"):
+            self.update_console("Note: node was not found. yt-dlp uses it to solve YouTube's "
+                                "JavaScript challenges; without it some formats may be missing.")
+        self.resume_interrupted_jobs()
     
     # -----------------------------------------------------------------
     # Donation / support dialog
@@ -753,58 +4511,23 @@ class YtDlpGUI:
             self.conv_simple_frame.pack_forget()
             self.conv_advanced_frame.pack(fill=tk.X, padx=30, pady=(5, 10))
     
-    def get_conv_compression_settings(self, duration=None):
-        """Calculate converter compression settings (mirrors get_compression_settings)."""
+    def get_conv_compression_settings(self):
+        """Read the converter compression controls into a spec (mirrors get_compression_settings)."""
         if not self.conv_compress_enabled.get():
             return None
         
         if self.conv_compress_mode_var.get() == "simple":
-            preset = self.conv_preset_var.get()
-            
-            preset_map = {
-                'Discord 8MB (Video)': (8, 96),
-                'Discord 25MB (Nitro Classic)': (25, 128),
-                'Discord 50MB (Nitro)': (50, 128),
-                'Discord 100MB (Nitro Boost)': (100, 192),
-                'Twitter/X 512MB': (512, 192),
-                'Instagram 100MB': (100, 192),
-                'WhatsApp 16MB': (16, 96),
-                'Telegram 2GB': (2048, 256)
-            }
-            
-            target_size_mb, audio_bitrate = preset_map.get(preset, (8, 96))
-            est = duration if duration else 180
-            video_bitrate = self.calculate_bitrates_for_target_size(target_size_mb, est, audio_bitrate)
-            
+            return compression_spec_for_preset(self.conv_preset_var.get())
+        try:
+            video_bitrate_str = self.conv_video_bitrate_entry.get().strip()
             return {
-                'target_size': target_size_mb,
-                'video_bitrate': video_bitrate,
-                'audio_bitrate': audio_bitrate
+                'target_size': float(self.conv_target_size_entry.get() or "8"),
+                'video_bitrate': int(video_bitrate_str) if video_bitrate_str else None,
+                'audio_bitrate': int(self.conv_audio_bitrate_entry.get() or "128")
             }
-        else:
-            try:
-                target_size = float(self.conv_target_size_entry.get() or "8")
-                video_bitrate_str = self.conv_video_bitrate_entry.get().strip()
-                audio_bitrate = int(self.conv_audio_bitrate_entry.get() or "128")
-                
-                if video_bitrate_str:
-                    video_bitrate = int(video_bitrate_str)
-                else:
-                    est = duration if duration else 180
-                    video_bitrate = self.calculate_bitrates_for_target_size(target_size, est, audio_bitrate)
-                
-                return {
-                    'target_size': target_size,
-                    'video_bitrate': video_bitrate,
-                    'audio_bitrate': audio_bitrate
-                }
-            except ValueError:
-                self.update_console("Warning: Invalid compression settings, using defaults")
-                return {
-                    'target_size': 8,
-                    'video_bitrate': 500,
-                    'audio_bitrate': 96
-                }
+        except ValueError:
+            self.update_console("Warning: Invalid compression settings, using defaults")
+            return dict(DEFAULT_COMPRESSION)
     
     def browse_output_dir(self):
         """Open folder dialog to select the output directory"""
@@ -813,300 +4536,107 @@ class YtDlpGUI:
             self.output_dir_entry.delete(0, tk.END)
             self.output_dir_entry.insert(0, directory)
     
+    def update_converter_input_mode(self):
+        """Show the batch options only in folder mode."""
+        if self.converter_input_mode.get() == "folder":
+            self.converter_batch_row.pack(fill=tk.X, padx=10, pady=(0, 8))
+        else:
+            self.converter_batch_row.pack_forget()
+
     def browse_converter_input(self):
-        """Open file dialog to select the input file for conversion"""
-        filetypes = [
-            ("Media Files", "*.mp4 *.mkv *.webm *.avi *.mov *.mp3 *.aac *.m4a *.opus *.flac *.wav *.ogg *.alac *.wma *.wmv *.ts *.flv"),
-            ("All Files", "*.*")
-        ]
-        filepath = filedialog.askopenfilename(title="Select Input File", filetypes=filetypes)
-        if filepath:
+        """Open a dialog to select the input file (or folder, in batch mode) for conversion"""
+        if self.converter_input_mode.get() == "folder":
+            path = filedialog.askdirectory(title="Select Input Folder")
+        else:
+            filetypes = [
+                ("Media Files", " ".join(f"*.{ext}" for ext in MEDIA_EXTENSIONS)),
+                ("All Files", "*.*")
+            ]
+            path = filedialog.askopenfilename(title="Select Input File", filetypes=filetypes)
+        if path:
             self.converter_input_entry.delete(0, tk.END)
-            self.converter_input_entry.insert(0, filepath)
+            self.converter_input_entry.insert(0, path)
     
     def start_conversion(self):
-        """Start the local file conversion process"""
+        """Plan and queue the conversion of one file or a whole folder"""
         input_path = self.converter_input_entry.get().strip()
+        folder_mode = self.converter_input_mode.get() == "folder"
         if not input_path:
-            messagebox.showerror("Error", "Please select an input file.")
+            messagebox.showerror("Error", "Please select an input folder." if folder_mode
+                                 else "Please select an input file.")
+            return
+        if folder_mode and not os.path.isdir(input_path):
+            messagebox.showerror("Error", "The selected input folder does not exist.")
             return
-        if not os.path.isfile(input_path):
+        if not folder_mode and not os.path.isfile(input_path):
             messagebox.showerror("Error", "The selected input file does not exist.")
             return
         
+        try:
+            clip = self.read_clip(self.conv_clip_start_entry, self.conv_clip_end_entry)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid clip times: {e}")
+            return
+        suffix = f" (clip {clip_label(clip)})" if clip else ""
+
         if not self.update_output_directory():
             return
         
         output_format = self.converter_format_var.get()
-        input_name = os.path.splitext(os.path.basename(input_path))[0]
-        output_path = os.path.join(self.output_dir, f"{input_name}.{output_format}")
-        
-        # Prevent overwriting the input file
-        if os.path.abspath(input_path) == os.path.abspath(output_path):
-            messagebox.showerror("Error", "Output format is the same as input. Choose a different format.")
-            return
+        compression = self.get_conv_compression_settings()
         
-        # Clear console and disable buttons
-        self._clear_console()
-        self.convert_button.config(state=tk.DISABLED)
-        self.download_button.config(state=tk.DISABLED)
-        self.status_var.set("Converting...")
+        if folder_mode:
+            pattern = self.converter_pattern_entry.get().strip()
+            patterns = [p.strip() for p in pattern.split(";") if p.strip() and p.strip() != "*"]
+            recursive = self.converter_recursive.get()
+        else:
+            # Prevent overwriting the input file
+            input_name = os.path.splitext(os.path.basename(input_path))[0]
+            output_path = os.path.join(self.output_dir, f"{input_name}{suffix}.{output_format}")
+            if os.path.abspath(input_path) == os.path.abspath(output_path):
+                messagebox.showerror("Error", "Output format is the same as input. Choose a different format.")
+                return
         
-        target_size_mb = self.get_conv_compression_settings()
-        threading.Thread(target=self.run_conversion,
-                         args=(input_path, output_path, output_format, target_size_mb),
-                         daemon=True).start()
-    
-    def get_media_duration(self, filepath):
-        """Get the duration of a media file in seconds using ffprobe."""
-        try:
-            if self.ffmpeg_location:
-                probe = os.path.join(self.ffmpeg_location, "ffprobe.exe" if IS_WINDOWS else "ffprobe")
-                if not os.path.isfile(probe):
-                    probe = "ffprobe"
-            else:
-                probe = "ffprobe"
-            
-            result = subprocess.run(
-                [probe, "-v", "error", "-show_entries", "format=duration",
-                 "-of", "default=noprint_wrappers=1:nokey=1", filepath],
-                capture_output=True, text=True, creationflags=subprocess_flags()
-            )
-            if result.returncode == 0 and result.stdout.strip():
-                return float(result.stdout.strip())
-        except Exception:
-            pass
-        return None
-    
-    def get_media_codecs(self, filepath):
-        """Probe the source file and return (video_codec, audio_codec) names.
-        Returns (None, None) on failure."""
-        try:
-            if self.ffmpeg_location:
-                probe = os.path.join(self.ffmpeg_location, "ffprobe.exe" if IS_WINDOWS else "ffprobe")
-                if not os.path.isfile(probe):
-                    probe = "ffprobe"
-            else:
-                probe = "ffprobe"
-
-            result = subprocess.run(
-                [probe, "-v", "error",
-                 "-select_streams", "v:0", "-show_entries", "stream=codec_name",
-                 "-of", "default=noprint_wrappers=1:nokey=1", filepath],
-                capture_output=True, text=True, creationflags=subprocess_flags()
-            )
-            vcodec = result.stdout.strip() if result.returncode == 0 else None
+        # Clear console (unless other jobs are still streaming into it)
+        if self.scheduler.is_idle() and self.convert_scheduler.is_idle():
+            self._clear_console()
+        self.status_var.set("Planning conversions...")
 
-            result = subprocess.run(
-                [probe, "-v", "error",
-                 "-select_streams", "a:0", "-show_entries", "stream=codec_name",
-                 "-of", "default=noprint_wrappers=1:nokey=1", filepath],
-                capture_output=True, text=True, creationflags=subprocess_flags()
-            )
-            acodec = result.stdout.strip() if result.returncode == 0 else None
+        def plan():
+            # Probing a large folder takes a while, so plan off the UI thread and
+            # submit each job as soon as it is planned
+            if folder_mode:
+                inputs = find_media_files(input_path, patterns or None, recursive)
+                self.update_console(f"Found {len(inputs)} media file(s) in {input_path}")
+                targets = conversion_targets(inputs, self.output_dir, output_format,
+                                             input_root=input_path, suffix=suffix)
+            else:
+                targets = conversion_targets([input_path], self.output_dir, output_format, suffix=suffix)
+            counts = collections.Counter()
+            for source, target in targets:
+                job = self.engine.make_conversion_job(source, target, output_format, compression, clip=clip)
+                counts[job.action] += 1
+                self.engine.journal_job(job)
+                self._new_jobs.put(job)
+                self.convert_scheduler.submit(job)
+            self.update_console(f"Queued {sum(counts.values())} conversion(s): "
+                                f"{counts['copy']} stream copy, {counts['encode']} re-encode")
 
-            return (vcodec or None, acodec or None)
-        except Exception:
-            return (None, None)
+        threading.Thread(target=plan, daemon=True).start()
 
-    def run_conversion(self, input_path, output_path, output_format, compression=None):
-        """Run ffmpeg conversion in a separate thread.
-        compression: dict with 'target_size', 'video_bitrate', 'audio_bitrate' or None."""
-        try:
-            # Determine ffmpeg executable path
-            if self.ffmpeg_location:
-                ffmpeg_exe = os.path.join(self.ffmpeg_location, "ffmpeg") if not IS_WINDOWS else os.path.join(self.ffmpeg_location, "ffmpeg.exe")
-                if not os.path.isfile(ffmpeg_exe):
-                    ffmpeg_exe = "ffmpeg"
-            else:
-                ffmpeg_exe = "ffmpeg"
-            
-            audio_only_formats = ('mp3', 'aac', 'm4a', 'opus', 'flac', 'wav', 'ogg', 'alac')
-            is_audio_output = output_format in audio_only_formats
-            duration = None
-            skip_compression_due_to_size = False
-            
-            # --- File-size guard: skip compression if file is already under target ---
-            if compression:
-                target_size_mb = compression['target_size']
-                input_size_bytes = os.path.getsize(input_path)
-                input_size_mb = input_size_bytes / (1024 * 1024)
-                
-                if input_size_mb <= target_size_mb:
-                    self.update_console("=" * 50)
-                    self.update_console(f"Input file is already {input_size_mb:.1f}MB, which is")
-                    self.update_console(f"under the {target_size_mb}MB target. Using stream copy")
-                    self.update_console(f"to avoid unnecessary re-encoding and size bloat.")
-                    self.update_console("=" * 50)
-                    compression = None
-                    skip_compression_due_to_size = True
-                else:
-                    # Recalculate bitrates with actual file duration for accuracy
-                    duration = self.get_media_duration(input_path)
-                    if not duration or duration <= 0:
-                        self.update_console("Warning: Could not determine duration, estimating 3 minutes.")
-                        duration = 180
-                    compression = self.get_conv_compression_settings(duration)
-            
-            cmd = [ffmpeg_exe, "-i", input_path, "-y"]
-            
-            # --- Compression path: use pre-calculated bitrates ---
-            if compression and not is_audio_output:
-                video_bitrate = compression['video_bitrate']
-                audio_bitrate = compression['audio_bitrate']
-                target_size_mb = compression['target_size']
-                
-                # Re-use cached duration if available, otherwise fetch
-                if not duration or duration <= 0:
-                    duration = self.get_media_duration(input_path) or 180
-                
-                self.update_console("=" * 50)
-                self.update_console(f"COMPRESSING to ~{target_size_mb}MB")
-                self.update_console(f"Duration: {int(duration // 60)}m {int(duration % 60)}s")
-                self.update_console(f"Video bitrate: {video_bitrate}kbps  |  Audio bitrate: {audio_bitrate}kbps")
-                self.update_console("=" * 50)
-                
-                # Format-specific compressed encoding
-                if output_format == "webm":
-                    cmd.extend(['-c:v', 'libvpx-vp9',
-                                '-b:v', f'{video_bitrate}k', '-maxrate', f'{video_bitrate}k',
-                                '-bufsize', f'{video_bitrate * 2}k',
-                                '-c:a', 'libopus', '-b:a', f'{audio_bitrate}k', '-ar', '48000'])
-                else:
-                    cmd.extend(['-c:v', 'libx264',
-                                '-b:v', f'{video_bitrate}k', '-maxrate', f'{video_bitrate}k',
-                                '-bufsize', f'{video_bitrate * 2}k', '-preset', 'medium',
-                                '-c:a', 'aac', '-b:a', f'{audio_bitrate}k', '-ar', '48000'])
-            elif is_audio_output:
-                # Audio output: strip video, encode audio
-                cmd.append("-vn")
-                if compression:
-                    # Compressed audio: calculate bitrate from target size and duration
-                    if not duration:
-                        duration = self.get_media_duration(input_path)
-                        if not duration or duration <= 0:
-                            duration = 180
-                    audio_kbps = max(32, int((compression['target_size'] * 8192) / duration * 0.98))
-                    self.update_console(f"Compressing audio to ~{compression['target_size']}MB ({audio_kbps}kbps)")
-                    codec_map = {
-                        'mp3': ['-c:a', 'libmp3lame'], 'aac': ['-c:a', 'aac'],
-                        'm4a': ['-c:a', 'aac'], 'opus': ['-c:a', 'libopus'],
-                        'ogg': ['-c:a', 'libvorbis'],
-                    }
-                    cmd.extend(codec_map.get(output_format, ['-c:a', 'libmp3lame']))
-                    cmd.extend(['-b:a', f'{audio_kbps}k'])
-                else:
-                    codec_map = {
-                        'mp3': ['-c:a', 'libmp3lame', '-b:a', '320k'],
-                        'aac': ['-c:a', 'aac', '-b:a', '320k'],
-                        'm4a': ['-c:a', 'aac', '-b:a', '320k'],
-                        'opus': ['-c:a', 'libopus', '-b:a', '320k'],
-                        'flac': ['-c:a', 'flac'],
-                        'wav': ['-c:a', 'pcm_s16le'],
-                        'ogg': ['-c:a', 'libvorbis', '-b:a', '320k'],
-                        'alac': ['-c:a', 'alac'],
-                    }
-                    cmd.extend(codec_map.get(output_format, ['-c:a', 'copy']))
-            else:
-                # Video output without compression: stream copy when codecs are
-                # compatible with the target container, re-encode only when needed.
-                if skip_compression_due_to_size:
-                    cmd.extend(['-c:v', 'copy', '-c:a', 'copy'])
-                else:
-                    src_vcodec, src_acodec = self.get_media_codecs(input_path)
-                    self.update_console(f"Source codecs: video={src_vcodec or 'unknown'}, audio={src_acodec or 'unknown'}")
-
-                    # Define which codecs each container natively supports
-                    container_video = {
-                        'mp4':  ('h264', 'hevc', 'mpeg4', 'av1'),
-                        'mov':  ('h264', 'hevc', 'mpeg4'),
-                        'mkv':  None,   # MKV accepts everything
-                        'webm': ('vp8', 'vp9', 'av1'),
-                        'avi':  ('mpeg4', 'msmpeg4v3', 'mjpeg', 'h264'),
-                    }
-                    container_audio = {
-                        'mp4':  ('aac', 'mp3', 'ac3', 'eac3', 'flac', 'alac', 'opus'),
-                        'mov':  ('aac', 'mp3', 'ac3', 'alac', 'pcm_s16le'),
-                        'mkv':  None,   # MKV accepts everything
-                        'webm': ('vorbis', 'opus'),
-                        'avi':  ('mp3', 'ac3', 'pcm_s16le'),
-                    }
+    def run_conversion_job(self, job):
+        """Run one queued conversion, or the encode stage of a staged download,
+        on a worker thread via the shared engine."""
+        def log(text):
+            self.update_console(f"[#{job.id}] {text}")
 
-                    supported_v = container_video.get(output_format)
-                    supported_a = container_audio.get(output_format)
-
-                    # Video codec decision
-                    v_compat = (supported_v is None) or (src_vcodec and src_vcodec in supported_v)
-                    if v_compat:
-                        v_args = ['-c:v', 'copy']
-                    else:
-                        # Re-encode to the most appropriate codec for this container
-                        self.update_console(f"Re-encoding video: {src_vcodec} is not compatible with .{output_format}")
-                        v_encode_map = {
-                            'mp4':  ['-c:v', 'libx264', '-crf', '18', '-preset', 'medium'],
-                            'mov':  ['-c:v', 'libx264', '-crf', '18', '-preset', 'medium'],
-                            'webm': ['-c:v', 'libvpx-vp9', '-crf', '30', '-b:v', '0'],
-                            'avi':  ['-c:v', 'mpeg4', '-q:v', '3'],
-                        }
-                        v_args = v_encode_map.get(output_format, ['-c:v', 'libx264', '-crf', '18', '-preset', 'medium'])
-
-                    # Audio codec decision
-                    a_compat = (supported_a is None) or (src_acodec and src_acodec in supported_a)
-                    if a_compat:
-                        a_args = ['-c:a', 'copy']
-                    else:
-                        self.update_console(f"Re-encoding audio: {src_acodec} is not compatible with .{output_format}")
-                        a_encode_map = {
-                            'mp4':  ['-c:a', 'aac', '-b:a', '320k'],
-                            'mov':  ['-c:a', 'aac', '-b:a', '320k'],
-                            'webm': ['-c:a', 'libopus', '-b:a', '320k'],
-                            'avi':  ['-c:a', 'mp3', '-b:a', '320k'],
-                        }
-                        a_args = a_encode_map.get(output_format, ['-c:a', 'aac', '-b:a', '320k'])
-
-                    cmd.extend(v_args + a_args)
-
-                    # Log what's happening so the user knows if it'll be fast or slow
-                    if v_compat and a_compat:
-                        self.update_console("Stream copy mode (fast remux, no re-encoding)")
-                    elif not v_compat and not a_compat:
-                        self.update_console("Full re-encode required - this will take longer.")
-            
-            cmd.append(output_path)
-            
-            self.update_console(f"Converting: {os.path.basename(input_path)} -> {os.path.basename(output_path)}")
-            self.update_console(f"Running: {' '.join(cmd)}")
-            
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                creationflags=subprocess_flags()
-            )
-            
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self.update_console(output.strip())
-            
-            if process.poll() == 0:
-                self.update_console(f"\nConversion completed successfully!")
-                self.update_console(f"Output: {output_path}")
-                self.status_var.set("Conversion completed")
-            else:
-                self.update_console(f"\nConversion failed with return code: {process.poll()}")
-                self.status_var.set("Conversion failed")
-        except Exception as e:
-            self.update_console(f"Error: {str(e)}")
-            self.status_var.set("Error occurred")
-        finally:
-            self.convert_button.config(state=tk.NORMAL)
-            self.download_button.config(state=tk.NORMAL)
+        if job.kind == "download":
+            ok = self.engine.run_staged_encode(job, log=log)
+            self.status_var.set("Download completed" if ok else "Download failed")
+        elif self.engine.run_conversion_job(job, log=log):
+            self.status_var.set("Conversion completed")
+        else:
+            self.status_var.set("Conversion failed")
     
     def update_format_selection(self):
         """Update UI based on selected format option"""
@@ -1162,6 +4692,129 @@ class YtDlpGUI:
             self.simple_frame.pack_forget()
             self.advanced_frame.pack(fill=tk.X, padx=30, pady=(5, 10))
 
+    def show_library(self):
+        """Browse the download archive in a popup window"""
+        library_window = tk.Toplevel(self.root)
+        library_window.title("Library")
+        library_window.geometry("900x500")
+
+        frame = ttk.Frame(library_window, padding="15")
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        search_row = ttk.Frame(frame)
+        search_row.pack(fill=tk.X, pady=(0, 8))
+        ttk.Label(search_row, text="Search:").pack(side=tk.LEFT)
+        search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_row, textvariable=search_var, width=40)
+        search_entry.pack(side=tk.LEFT, padx=(5, 0))
+        count_var = tk.StringVar()
+        ttk.Label(search_row, textvariable=count_var, foreground="gray").pack(side=tk.RIGHT)
+
+        tree_frame = ttk.Frame(frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        tree = ttk.Treeview(tree_frame, columns=("title", "settings", "file", "date"), show="headings")
+        for column, heading, width, stretch in (("title", "Title", 300, True),
+                                                ("settings", "Settings", 120, False),
+                                                ("file", "File", 300, True),
+                                                ("date", "Downloaded", 130, False)):
+            tree.heading(column, text=heading, anchor=tk.W)
+            tree.column(column, width=width, stretch=stretch, anchor=tk.W)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ttk.Scrollbar(tree_frame, command=tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.config(yscrollcommand=scrollbar.set)
+
+        def refresh(*_):
+            tree.delete(*tree.get_children())
+            rows = self.engine.archive.entries(search_var.get().strip() or None)
+            for row in rows:
+                tree.insert("", tk.END, values=(
+                    row["title"] or row["url"], row["label"] or "", row["output_path"] or "",
+                    time.strftime("%Y-%m-%d %H:%M", time.localtime(row["finished_at"]))))
+            count_var.set(f"{len(rows)} item(s)")
+        search_var.trace_add("write", refresh)
+        refresh()
+        search_entry.focus_set()
+
+    def show_network_settings(self):
+        """Edit the yt-dlp networking settings (applied to downloads started afterwards)"""
+        window = tk.Toplevel(self.root)
+        window.title("Network Settings")
+        window.resizable(False, False)
+
+        frame = ttk.Frame(window, padding="15")
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        net = self.engine.network
+        auto = self.engine.auto_concurrent_fragments()
+        fields = (
+            ("concurrent_fragments", "Concurrent fragments:",
+             f"DASH/HLS fragments fetched at once per download (blank = auto, now {auto})"),
+            ("http_chunk_size", "HTTP chunk size:", f"e.g. 10M (blank = {DEFAULT_HTTP_CHUNK_SIZE})"),
+            ("buffer_size", "Buffer size:", "e.g. 16K (blank = yt-dlp default)"),
+            ("retries", "Retries:", "per download"),
+            ("fragment_retries", "Fragment retries:", "per fragment"),
+        )
+        variables = {}
+        for row, (key, label, hint) in enumerate(fields):
+            ttk.Label(frame, text=label).grid(row=row, column=0, sticky=tk.W, pady=3)
+            variables[key] = tk.StringVar(value="" if net[key] is None else str(net[key]))
+            ttk.Entry(frame, textvariable=variables[key], width=10).grid(row=row, column=1, sticky=tk.W, padx=8)
+            ttk.Label(frame, text=hint, font=("Arial", 8), foreground="gray").grid(row=row, column=2, sticky=tk.W)
+
+        row = len(fields)
+        ttk.Label(frame, text="Downloader:").grid(row=row, column=0, sticky=tk.W, pady=3)
+        downloader_var = tk.StringVar(value=net["external_downloader"] or "built-in")
+        ttk.Combobox(frame, textvariable=downloader_var, values=("built-in",) + EXTERNAL_DOWNLOADERS,
+                     width=10, state="readonly").grid(row=row, column=1, sticky=tk.W, padx=8)
+        ttk.Label(frame, text="aria2c must be installed or placed in dependencies/",
+                  font=("Arial", 8), foreground="gray").grid(row=row, column=2, sticky=tk.W)
+
+        row += 1
+        in_process_var = tk.BooleanVar(value=self.engine.ytdlp_pool is not None)
+        ttk.Checkbutton(frame, text="Run yt-dlp in-process", variable=in_process_var).grid(
+            row=row, column=0, columnspan=2, sticky=tk.W, pady=3)
+        ttk.Label(frame, text="reuses worker processes between downloads (needs the yt_dlp Python package)",
+                  font=("Arial", 8), foreground="gray").grid(row=row, column=2, sticky=tk.W)
+
+        row += 1
+        ttk.Label(frame, text="Solver scripts:").grid(row=row, column=0, sticky=tk.W, pady=3)
+        ttk.Label(frame, text=self.engine.solver_cache.describe()).grid(
+            row=row, column=1, columnspan=2, sticky=tk.W, padx=8)
+
+        def save():
+            values = {}
+            try:
+                for key in ("concurrent_fragments", "retries", "fragment_retries"):
+                    text = variables[key].get().strip()
+                    values[key] = max(1 if key == "concurrent_fragments" else 0, int(text)) if text else None
+                for key in ("http_chunk_size", "buffer_size"):
+                    text = variables[key].get().strip()
+                    if text:
+                        parse_size(text)
+                    values[key] = text or None
+            except ValueError as e:
+                messagebox.showerror("Network Settings", f"Invalid value: {e}", parent=window)
+                return
+            for key in ("retries", "fragment_retries"):
+                if values[key] is None:
+                    values[key] = NETWORK_DEFAULTS[key]
+            downloader = downloader_var.get()
+            values["external_downloader"] = None if downloader == "built-in" else downloader
+            self.engine.network.update(values)
+            in_process = self.engine.set_in_process(in_process_var.get())
+            cfg = self._load_config()
+            cfg["network"] = values
+            cfg["in_process_ytdlp"] = in_process
+            self._save_config(cfg)
+            window.destroy()
+
+        buttons = ttk.Frame(frame)
+        buttons.grid(row=row + 1, column=0, columnspan=3, sticky=tk.E, pady=(12, 0))
+        ttk.Button(buttons, text="Cancel", command=window.destroy,
+                   style="Secondary.TButton").pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(buttons, text="Save", command=save, style="Secondary.TButton").pack(side=tk.RIGHT)
+
     def show_format_guide(self):
         """Display format guide in a popup window"""
         guide_window = tk.Toplevel(self.root)
@@ -1354,601 +5007,760 @@ class YtDlpGUI:
             else:
                 self.output_dir_entry.focus_set()
                 return False
-        return True
-    
-    def validate_url(self, url):
-        """Basic validation -- accept any URL (yt-dlp supports many sites)."""
-        pattern = r'^(https?://).+'
-        return bool(re.match(pattern, url))
-    
-    def update_console(self, text):
-        """Thread-safe console update via queue."""
-        self._console_queue.put(text)
-    
-    def _poll_console_queue(self):
-        """Drain the console message queue on the main thread (batched for performance)."""
-        try:
-            count = 0
-            self.console.config(state=tk.NORMAL)
-            while not self._console_queue.empty() and count < 50:
-                text = self._console_queue.get_nowait()
-                self.console.insert(tk.END, text + "\n")
-                count += 1
-            self.console.config(state=tk.DISABLED)
-            if count > 0:
-                self.console.see(tk.END)
-        except Exception:
-            pass
-        self.root.after(50, self._poll_console_queue)
-    
-    def _clear_console(self):
-        """Clear the console widget (handles disabled state)."""
-        self.console.config(state=tk.NORMAL)
-        self.console.delete(1.0, tk.END)
-        self.console.config(state=tk.DISABLED)
-    
-    def start_download(self):
-        """Start the download process"""
-        url = self.url_entry.get().strip()
-        
-        if not url:
-            messagebox.showerror("Error", "Please enter a URL")
-            return
-        
-        if not self.validate_url(url):
-            messagebox.showwarning("Warning", "URL does not appear to be valid. Please include http:// or https://")    
-            return
-        
-        # Clear console
-        self._clear_console()
-        
-        # Disable both action buttons during download
-        self.download_button.config(state=tk.DISABLED)
-        self.convert_button.config(state=tk.DISABLED)
-        self.status_var.set("Downloading...")
-        
-        # Start download in a separate thread
-        threading.Thread(target=self.run_download, args=(url,), daemon=True).start()
-    
-    def run_download(self, url):
-        """Run the yt-dlp command in a separate thread"""
-        try:
-            # Update output directory from the entry field
-            if not self.update_output_directory():
-                self.status_var.set("Download cancelled")
-                self.download_button.config(state=tk.NORMAL)
-                return
-            
-            # Build the command based on selected options
-            cmd = self.build_command(url)
-            
-            self.update_console(f"Running command: {' '.join(cmd)}")
-            
-            # Run the command and capture output
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                creationflags=subprocess_flags()
-            )
-            
-            # Stream the output
-            merge_notified = False
-            compress_notified = False
-            cookie_error_notified = False
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    output_lower = output.lower()
-                    
-                    # Detect cookie-related errors (database locked or DPAPI decryption failure)
-                    if not cookie_error_notified and (
-                        'could not copy chrome cookie database' in output_lower
-                        or 'failed to decrypt with dpapi' in output_lower
-                    ):
-                        cookie_error_notified = True
-                        is_dpapi = 'failed to decrypt with dpapi' in output_lower
-                        
-                        self.update_console("\n" + "=" * 60)
-                        if is_dpapi:
-                            self.update_console("COOKIE ERROR - DECRYPTION FAILED (DPAPI)")
-                            self.update_console("=" * 60)
-                            self.update_console(
-                                "Chromium-based browsers (Chrome, Edge, Brave, etc.)\n"
-                                "use Application Bound Encryption on Windows,\n"
-                                "which prevents external tools from reading cookies.\n"
-                                "\n"
-                                "Workarounds:\n"
-                                "  1. Switch to Firefox (recommended, not affected).\n"
-                                "  2. Use 'From file' with a cookies.txt exported\n"
-                                "     via the 'Get cookies.txt LOCALLY' browser\n"
-                                "     extension, then select it here.\n"
-                            )
-                        else:
-                            self.update_console("COOKIE ERROR - BROWSER DATABASE IS LOCKED")
-                            self.update_console("=" * 60)
-                            self.update_console(
-                                "Chrome, Edge, Brave, and other Chromium-based\n"
-                                "browsers lock their cookie database while running.\n"
-                                "\n"
-                                "Workarounds:\n"
-                                "  1. Close the browser completely, then retry.\n"
-                                "  2. Switch to Firefox (recommended, works while open).\n"
-                                "  3. Use 'From file' with a cookies.txt exported\n"
-                                "     via the 'Get cookies.txt LOCALLY' browser\n"
-                                "     extension, then select it here.\n"
-                            )
-                        self.update_console("=" * 60 + "\n")
-                    
-                    # Detect JS challenge / signature solving failures
-                    if 'signature solving failed' in output_lower or \
-                       'n challenge solving failed' in output_lower:
-                        self.update_console("\n" + "=" * 60)
-                        self.update_console("JS CHALLENGE ERROR")
-                        self.update_console("=" * 60)
-                        self.update_console(
-                            "YouTube requires solving JavaScript challenges\n"
-                            "to serve video formats. Make sure you have:\n"
-                            "\n"
-                            "  1. Node.js installed (https://nodejs.org)\n"
-                            "  2. yt-dlp is up to date (yt-dlp -U)\n"
-                        )
-                        self.update_console("=" * 60 + "\n")
-                    
-                    # Notify user about merging/processing stages
-                    if not merge_notified and ('merging' in output_lower or 'muxing' in output_lower):
-                        self.update_console("\n" + "=" * 60)
-                        self.update_console("MERGING VIDEO AND AUDIO STREAMS...")
-                        if self.compression_enabled.get():
-                            self.update_console("Re-encoding to target size. This may take several minutes.")
-                        elif self.format_var.get() == "video" and self.video_format_var.get() == "avi":
-                            self.update_console("AVI requires full re-encoding (MPEG-4 Part 2 + MP3).")
-                            self.update_console("This will take significantly longer than other formats.")
-                        else:
-                            self.update_console("Stream copy in progress - this should be quick.")
-                        self.update_console("=" * 60 + "\n")
-                        merge_notified = True
-                    
-                    if not compress_notified and self.compression_enabled.get() and \
-                       ('destination' in output_lower or 'post-process' in output_lower):
-                        self.update_console("\n" + "=" * 60)
-                        self.update_console("COMPRESSING VIDEO TO TARGET SIZE...")
-                        self.update_console("Please wait - this process cannot be rushed.")
-                        self.update_console("FFmpeg is re-encoding the video.")
-                        self.update_console("=" * 60 + "\n")
-                        compress_notified = True
-                    
-                    self.update_console(output.strip())
-            
-            return_code = process.poll()
-            
-            if return_code == 0:
-                self.update_console("Download completed successfully!")
-                self.status_var.set("Download completed")
-            else:
-                self.update_console(f"Download failed with return code: {return_code}")
-                self.status_var.set("Download failed")
-                
-        except Exception as e:
-            self.update_console(f"Error: {str(e)}")
-            self.status_var.set("Error occurred")
-            
-        finally:
-            # Re-enable action buttons
-            self.download_button.config(state=tk.NORMAL)
-            self.convert_button.config(state=tk.NORMAL)
-    
-    def map_audio_format(self, format_name):
-        """Map UI audio format names to yt-dlp format strings"""
-        format_map = {
-            'ogg': 'vorbis',  # OGG container uses Vorbis codec
-            'alac': 'alac',
-            'mp3': 'mp3',
-            'aac': 'aac',
-            'm4a': 'm4a',
-            'opus': 'opus',
-            'flac': 'flac',
-            'wav': 'wav'
-        }
-        return format_map.get(format_name, format_name)
+        return True
     
-    def get_video_duration(self, url):
-        """Fetch video duration in seconds"""
+    def validate_url(self, url):
+        """Basic validation -- accept any URL (yt-dlp supports many sites)."""
+        pattern = r'^(https?://).+'
+        return bool(re.match(pattern, url))
+
+    def _open_console_log(self, path):
+        """Rotating on-disk copy of everything written to the console (None if
+        the folder is not writable; the console then works without it)."""
         try:
-            ytdlp_cmd = self.find_ytdlp()
-            
-            self.update_console("Fetching video information to calculate compression...")
-            
-            # Build duration query with cookies if enabled
-            cmd = [ytdlp_cmd, "--js-runtimes", "node", "--remote-components", "ejs:github",
-                   "--print", "duration"]
-            if self.cookies_enabled.get():
-                if self.cookies_source_var.get() == "browser":
-                    cmd.extend(["--cookies-from-browser", self.cookies_browser_var.get()])
-                else:
-                    cookie_file = self.cookies_file_entry.get().strip()
-                    if cookie_file and os.path.isfile(cookie_file):
-                        cmd.extend(["--cookies", cookie_file])
-            cmd.append(url)
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                creationflags=subprocess_flags()
-            )
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=CONSOLE_LOG_BYTES, backupCount=CONSOLE_LOG_BACKUPS, encoding="utf-8")
+        except OSError:
+            return None
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger = logging.getLogger("ytdlp-gui.console")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        return logger
+
+    def update_console(self, text):
+        """Thread-safe console update via queue; also appended to the log file."""
+        self._console_queue.put((time.monotonic(), text))
+        if self._console_file_log:
+            self._console_file_log.info(text)
+
+    def _poll_console_queue(self):
+        """Drain the console message queue on the main thread.
+        Each tick takes the whole backlog present when it starts. The lines go
+        into a ring buffer the size of the console, so a burst larger than the
+        widget only inserts what can stay visible. They are coalesced into a
+        single insert, and then the oldest lines are trimmed. The next tick comes
+        sooner while lines keep arriving and backs off to CONSOLE_POLL_IDLE_MS
+        while the queue stays empty."""
+        try:
+            pending = collections.deque(maxlen=self.console_max_lines)
+            oldest = None
+            drained = 0
+            for _ in range(self._console_queue.qsize()):
+                try:
+                    queued_at, text = self._console_queue.get_nowait()
+                except queue.Empty:
+                    break
+                oldest = queued_at if oldest is None else oldest
+                pending.append(text)
+                drained += 1
             
-            if result.returncode == 0 and result.stdout.strip():
-                duration = float(result.stdout.strip())
-                self.update_console(f"Video duration: {int(duration // 60)}m {int(duration % 60)}s")
-                return duration
+            depth = self._console_queue.qsize()
+            if oldest is not None:
+                self._console_interval = CONSOLE_POLL_BACKLOG_MS if depth else CONSOLE_POLL_MS
             else:
-                self.update_console("Warning: Could not fetch duration, using 3 minute estimate")
-                return 180  # Default to 3 minutes
-        except Exception as e:
-            self.update_console(f"Warning: Error fetching duration ({str(e)}), using 3 minute estimate")
-            return 180
+                self._console_interval = min(CONSOLE_POLL_IDLE_MS, self._console_interval * 2)
+            self._update_console_metrics(depth, oldest, drained)
+
+            if pending:
+                self.console.config(state=tk.NORMAL)
+                self.console.insert(tk.END, "\n".join(pending) + "\n")
+                excess = int(self.console.index("end-1c").split(".")[0]) - 1 - self.console_max_lines
+                if excess > 0:
+                    self.console.delete("1.0", f"{excess + 1}.0")
+                self.console.config(state=tk.DISABLED)
+                self.console.see(tk.END)
+        except Exception:
+            pass
+        self.root.after(self._console_interval, self._poll_console_queue)
     
-    def calculate_bitrates_for_target_size(self, target_size_mb, duration_seconds, audio_bitrate_kbps):
-        """Calculate video bitrate needed to achieve target file size"""
-        # Convert target size to kilobits
-        target_size_kbits = target_size_mb * 8192  # 1 MB = 8192 kilobits
-        
-        # Calculate total bitrate needed
-        total_bitrate_kbps = target_size_kbits / duration_seconds
-        
-        # Subtract audio bitrate to get video bitrate
-        # Add small overhead for container (about 2%)
-        overhead_factor = 0.98
-        video_bitrate_kbps = (total_bitrate_kbps - audio_bitrate_kbps) * overhead_factor
-        
-        # Ensure minimum viable bitrate
-        video_bitrate_kbps = max(100, int(video_bitrate_kbps))
-        
-        return video_bitrate_kbps
+    def _update_console_metrics(self, depth, oldest, drained):
+        """Record queue depth and drain lag (age of the oldest line drained this
+        tick). Both are shown in the status bar until the console goes fully idle."""
+        metrics = self.console_metrics
+        lag = time.monotonic() - oldest if oldest is not None else 0.0
+        metrics.update(depth=depth, lag=lag, interval_ms=self._console_interval)
+        if oldest is not None:
+            metrics["max_lag"] = max(metrics["max_lag"], lag)
+            metrics["lines"] += drained
+            metrics["ticks"] += 1
+            self.console_stats_var.set(f"Console: {depth} queued, lag {lag * 1000:.0f} ms")
+        elif self._console_interval >= CONSOLE_POLL_IDLE_MS and self.console_stats_var.get():
+            self.console_stats_var.set("")
+
+    def _clear_console(self):
+        """Clear the console widget (handles disabled state)."""
+        self.console.config(state=tk.NORMAL)
+        self.console.delete(1.0, tk.END)
+        self.console.config(state=tk.DISABLED)
     
-    def get_compression_settings(self, url=None, duration=None):
-        """Calculate compression settings based on user selection"""
+    def get_compression_settings(self):
+        """Read the downloader compression controls into a spec (bitrates resolved per job)."""
         if not self.compression_enabled.get():
             return None
         
         if self.compression_mode_var.get() == "simple":
-            # Simple mode - use presets with calculated bitrates
-            preset = self.preset_var.get()
-            
-            # Map presets to target sizes and audio bitrates
-            preset_map = {
-                'Discord 8MB (Video)': (8, 96),
-                'Discord 25MB (Nitro Classic)': (25, 128),
-                'Discord 50MB (Nitro)': (50, 128),
-                'Discord 100MB (Nitro Boost)': (100, 192),
-                'Twitter/X 512MB': (512, 192),
-                'Instagram 100MB': (100, 192),
-                'WhatsApp 16MB': (16, 96),
-                'Telegram 2GB': (2048, 256)
-            }
-            
-            target_size_mb, audio_bitrate = preset_map.get(preset, (8, 96))
-            
-            # If we have duration, calculate proper video bitrate
-            if duration:
-                video_bitrate = self.calculate_bitrates_for_target_size(
-                    target_size_mb, duration, audio_bitrate
-                )
-            else:
-                # Fallback to estimation for 3-minute video
-                video_bitrate = self.calculate_bitrates_for_target_size(
-                    target_size_mb, 180, audio_bitrate
-                )
-            
+            # Simple mode - presets map to a target size and audio bitrate
+            return compression_spec_for_preset(self.preset_var.get())
+
+        # Advanced mode - use user input; an empty video bitrate means auto-calculate
+        try:
+            video_bitrate_str = self.video_bitrate_entry.get().strip()
             return {
-                'target_size': target_size_mb,
-                'video_bitrate': video_bitrate,
-                'audio_bitrate': audio_bitrate
+                'target_size': float(self.target_size_entry.get() or "8"),
+                'video_bitrate': int(video_bitrate_str) if video_bitrate_str else None,
+                'audio_bitrate': int(self.audio_bitrate_entry.get() or "128")
             }
-        else:
-            # Advanced mode - use user input
-            try:
-                target_size = float(self.target_size_entry.get() or "8")
-                video_bitrate_str = self.video_bitrate_entry.get().strip()
-                audio_bitrate = int(self.audio_bitrate_entry.get() or "128")
-                
-                if video_bitrate_str:
-                    # User specified video bitrate
-                    video_bitrate = int(video_bitrate_str)
-                else:
-                    # Auto-calculate video bitrate from target size and duration
-                    if duration:
-                        video_bitrate = self.calculate_bitrates_for_target_size(
-                            target_size, duration, audio_bitrate
-                        )
-                    else:
-                        # Fallback to estimation for 3-minute video
-                        video_bitrate = self.calculate_bitrates_for_target_size(
-                            target_size, 180, audio_bitrate
-                        )
-                
-                return {
-                    'target_size': target_size,
-                    'video_bitrate': video_bitrate,
-                    'audio_bitrate': audio_bitrate
-                }
-            except ValueError:
-                self.update_console("Warning: Invalid compression settings, using defaults")
-                return {
-                    'target_size': 8,
-                    'video_bitrate': 500,
-                    'audio_bitrate': 96
-                }
+        except ValueError:
+            self.update_console("Warning: Invalid compression settings, using defaults")
+            return dict(DEFAULT_COMPRESSION)
     
-    def find_ytdlp(self):
-        """Locate the yt-dlp binary (cross-platform)"""
-        if IS_WINDOWS:
-            local_ytdlp = os.path.join(self.deps_path, "yt-dlp.exe")
-        else:
-            local_ytdlp = os.path.join(self.deps_path, "yt-dlp")
-        
-        if os.path.exists(local_ytdlp):
-            return local_ytdlp
-        return "yt-dlp"
+    def _add_clip_fields(self, parent):
+        """Start/End time entries for clipping; returns (start_entry, end_entry)."""
+        clip_frame = ttk.Frame(parent)
+        clip_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Label(clip_frame, text="Clip from").pack(side=tk.LEFT)
+        start_entry = ttk.Entry(clip_frame, width=10)
+        start_entry.pack(side=tk.LEFT, padx=(6, 0))
+        ttk.Label(clip_frame, text="to").pack(side=tk.LEFT, padx=(6, 0))
+        end_entry = ttk.Entry(clip_frame, width=10)
+        end_entry.pack(side=tk.LEFT, padx=(6, 0))
+        ttk.Label(
+            clip_frame, text="(e.g. 1:23 or 83.5; leave blank for the whole video)",
+            font=("Arial", 8), foreground="gray"
+        ).pack(side=tk.LEFT, padx=(8, 0))
+        return start_entry, end_entry
     
-    def build_command(self, url):
-        """Build the yt-dlp command based on selected options"""
-        ytdlp_cmd = self.find_ytdlp()
-        cmd = [
-            ytdlp_cmd,
-            "--js-runtimes", "node",
-            "--remote-components", "ejs:github",
-            "--no-mtime",           # Use current date as file timestamp, not YouTube's upload date
-            "--retries", "10",      # Retry failed downloads
-            "--fragment-retries", "10",
-            "--newline",            # Output progress on new lines for better console parsing
-        ]
+    def read_clip(self, start_entry, end_entry):
+        """Clip from a pair of Start/End entries (None when both are blank). Raises ValueError."""
+        return make_clip(parse_timestamp(start_entry.get()), parse_timestamp(end_entry.get()))
+
+    def get_download_options(self):
+        """Snapshot the Downloader tab into a DownloadOptions (UI thread only)."""
+        cookies_browser = cookies_file = None
+        if self.cookies_enabled.get():
+            if self.cookies_source_var.get() == "browser":
+                cookies_browser = self.cookies_browser_var.get()
+            else:
+                cookies_file = self.cookies_file_entry.get().strip()
         
-        # Add age limit if enabled
+        age_limit = None
         if self.age_limit_enabled.get():
             age_limit = self.age_limit_entry.get().strip() or "18"
-            cmd.extend(["--age-limit", age_limit])
-            self.update_console(f"Setting age limit to {age_limit} years")
         
-        # Add cookies if enabled
-        if self.cookies_enabled.get():
-            if self.cookies_source_var.get() == "browser":
-                browser = self.cookies_browser_var.get()
-                cmd.extend(["--cookies-from-browser", browser])
-                self.update_console(f"Using cookies from {browser}")
-            else:
-                cookie_file = self.cookies_file_entry.get().strip()
-                if cookie_file and os.path.isfile(cookie_file):
-                    cmd.extend(["--cookies", cookie_file])
-                    self.update_console(f"Using cookies file: {cookie_file}")
-                else:
-                    self.update_console("Warning: Cookie file not found, proceeding without cookies")
+        return DownloadOptions(
+            output_dir=self.output_dir,
+            media=self.format_var.get(),
+            video_format=self.video_format_var.get(),
+            audio_format=self.audio_format_var.get(),
+            compression=self.get_compression_settings(),
+            age_limit=age_limit,
+            cookies_browser=cookies_browser,
+            cookies_file=cookies_file,
+            force=self.force_var.get(),
+            clip=self.read_clip(self.clip_start_entry, self.clip_end_entry),
+        )
+
+    def start_download(self):
+        """Queue every URL in the input box for download"""
+        urls = [line.strip() for line in self.url_text.get("1.0", tk.END).splitlines() if line.strip()]
         
-        # Get video duration if compression is enabled
-        duration = None
-        if self.compression_enabled.get() and self.format_var.get() == "video":
-            duration = self.get_video_duration(url)
+        if not urls:
+            messagebox.showerror("Error", "Please enter a URL")
+            return
         
-        # Get compression settings if enabled (now with duration)
-        compression = self.get_compression_settings(url, duration)
+        invalid = [url for url in urls if not self.validate_url(url)]
+        if invalid:
+            messagebox.showwarning(
+                "Warning",
+                "These URLs do not appear to be valid. Please include http:// or https://\n\n"
+                + "\n".join(invalid[:10])
+            )
+            return
         
-        if self.format_var.get() == "video":
-            # Video command - prioritize best quality
-            video_format = self.video_format_var.get()
-            
-            if compression:
-                # Compression enabled - re-encode with specified bitrates
-                video_bitrate = compression['video_bitrate']
-                audio_bitrate = compression['audio_bitrate']
-                
-                self.update_console("=" * 60)
-                self.update_console("COMPRESSION ENABLED")
-                self.update_console(f"Target File Size: ~{compression['target_size']}MB")
-                self.update_console(f"Video Bitrate: {video_bitrate}kbps")
-                self.update_console(f"Audio Bitrate: {audio_bitrate}kbps")
-                self.update_console("Note: Compression requires re-encoding and will take longer.")
-                self.update_console("This is normal - the video must be processed to reduce size.")
-                self.update_console("=" * 60)
-                
-                # Build compression FFmpeg arguments
-                if video_format == "mp4":
-                    postproc_args = f"ffmpeg:-c:v libx264 -b:v {video_bitrate}k -maxrate {video_bitrate}k -bufsize {video_bitrate*2}k -preset medium -c:a aac -b:a {audio_bitrate}k -ar 48000"
-                elif video_format == "mkv":
-                    postproc_args = f"ffmpeg:-c:v libx264 -b:v {video_bitrate}k -maxrate {video_bitrate}k -bufsize {video_bitrate*2}k -preset medium -c:a aac -b:a {audio_bitrate}k -ar 48000"
-                elif video_format == "webm":
-                    postproc_args = f"ffmpeg:-c:v libvpx-vp9 -b:v {video_bitrate}k -maxrate {video_bitrate}k -bufsize {video_bitrate*2}k -c:a libopus -b:a {audio_bitrate}k -ar 48000"
-                elif video_format == "mov":
-                    postproc_args = f"ffmpeg:-c:v libx264 -b:v {video_bitrate}k -maxrate {video_bitrate}k -bufsize {video_bitrate*2}k -preset medium -c:a aac -b:a {audio_bitrate}k -ar 48000"
-                elif video_format == "avi":
-                    postproc_args = f"ffmpeg:-c:v libx264 -b:v {video_bitrate}k -maxrate {video_bitrate}k -bufsize {video_bitrate*2}k -preset medium -c:a mp3 -b:a {audio_bitrate}k -ar 48000"
-                else:
-                    postproc_args = f"ffmpeg:-c:v libx264 -b:v {video_bitrate}k -maxrate {video_bitrate}k -bufsize {video_bitrate*2}k -preset medium -c:a aac -b:a {audio_bitrate}k -ar 48000"
-            else:
-                # No compression - stream copy whenever possible (fast remux)
-                # The format selector below requests codec-compatible streams,
-                # so the merge is just a container remux, not a full re-encode.
-                if video_format == "avi":
-                    # AVI requires MPEG-4 Part 2 video and MP3 audio for broad compatibility.
-                    # H.264 in AVI is not supported by most players (audio only, no video).
-                    postproc_args = "ffmpeg:-c:v mpeg4 -q:v 3 -c:a mp3 -b:a 320k -ar 48000"
-                else:
-                    postproc_args = "ffmpeg:-c:v copy -c:a copy"
-            
-            output_template = os.path.join(self.output_dir, "%(title)s.%(ext)s")
+        try:
+            self.read_clip(self.clip_start_entry, self.clip_end_entry)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid clip times: {e}")
+            return
 
-            # Choose a format selector based on container compatibility.
-            # MP4/MOV/AVI only support certain codecs natively, so we prefer
-            # H.264 + AAC to avoid a slow full re-encode during the merge step.
-            # MKV and WEBM accept virtually any codec, so we just grab the best.
-            if video_format in ("mp4", "mov") and not compression:
-                format_selector = (
-                    "bestvideo[vcodec^=avc1]+bestaudio[acodec^=mp4a]/"
-                    "bestvideo[vcodec^=avc1]+bestaudio/"
-                    "bestvideo*+bestaudio/best"
-                )
-            else:
-                format_selector = "bestvideo*+bestaudio/best"
+        # Resolve the output directory on the UI thread (it may prompt)
+        if not self.update_output_directory():
+            return
 
-            cmd.extend([
-                "-f", format_selector,
-                "--merge-output-format", video_format,
-                "--ffmpeg-location", self.ffmpeg_location,
-                "--postprocessor-args", postproc_args,
-                "--windows-filenames",
-                "-o", output_template,
-                url
-            ])
-        else:
-            # Audio command - best quality
-            audio_format = self.audio_format_var.get()
-            # Map UI format to yt-dlp format (e.g., 'ogg' -> 'vorbis')
-            ytdlp_audio_format = self.map_audio_format(audio_format)
-            
-            if compression:
-                # Compression enabled for audio
-                audio_bitrate = compression['audio_bitrate']
-                self.update_console("=" * 60)
-                self.update_console("COMPRESSION ENABLED (Audio)")
-                self.update_console(f"Audio Bitrate: {audio_bitrate}kbps")
-                self.update_console("Note: Lower bitrate reduces file size but may affect quality.")
-                self.update_console("=" * 60)
-                bitrate = f"{audio_bitrate}k"
-                audio_quality = "0"
-            else:
-                # Set audio quality based on format
-                if audio_format in ["mp3", "aac", "opus", "ogg"]:
-                    # For lossy formats, use highest bitrate
-                    audio_quality = "0"  # Best quality for VBR
-                    bitrate = "320k"
+        # Clear console only when nothing else is writing to it
+        if self.scheduler.is_idle() and self.convert_scheduler.is_idle():
+            self._clear_console()
+
+        options = self.get_download_options()
+        priority = JOB_PRIORITIES.get(self.priority_var.get(), JOB_PRIORITIES["Normal"])
+        skipped = 0
+        for url in urls:
+            job = Job(url, options=options)
+            job.priority = priority
+            archived = None if options.force else self.engine.archived_url(url, options)
+            if archived:
+                job.update(status="skipped", progress="already downloaded", title=archived["title"] or "",
+                           output_path=archived["output_path"])
+                skipped += 1
+            self.submit_download(job)
+
+        self.url_text.delete("1.0", tk.END)
+        self.update_console(f"Queued {len(urls) - skipped} download(s) "
+                            f"({self.scheduler.max_workers} in parallel)")
+        if skipped:
+            self.update_console(f"Skipped {skipped} already in the library "
+                                f"(tick 'Re-download' to fetch them again)")
+
+    def submit_download(self, job):
+        """Show a download job in the queue and schedule it unless it is
+        already finished (e.g. a skipped playlist entry). Thread-safe."""
+        self._new_jobs.put(job)
+        if not job.finished:
+            if not job.journal:
+                self.engine.journal_job(job)
+            self.scheduler.submit(job)
+
+    def resume_interrupted_jobs(self):
+        """Replay the jobs the last session left unfinished (crash or close)."""
+        def replay():
+            jobs = self.engine.interrupted_jobs(log=self.update_console)
+            if not jobs:
+                return
+            self.update_console(f"Resuming {len(jobs)} interrupted job(s) from the last session")
+            for job in jobs:
+                if job.kind == "convert":
+                    self._new_jobs.put(job)
+                    self.convert_scheduler.submit(job)
                 else:
-                    # For lossless formats (flac, wav, alac, m4a)
-                    audio_quality = "0"
-                    bitrate = None
-            
-            cmd.extend([
-                "-f", "bestaudio/best",
-                "-x",  # Extract audio
-                "--audio-format", ytdlp_audio_format,
-                "--audio-quality", audio_quality,
-                "--ffmpeg-location", self.ffmpeg_location,
-            ])
+                    self.submit_download(job)
+        threading.Thread(target=replay, daemon=True).start()
+
+    def on_close(self):
+        """Window close: running jobs are stopped and resumed on the next start."""
+        running = [job for job in self.jobs if job.started_at and not job.finished]
+        if running and not messagebox.askyesno(
+                "Quit",
+                f"{len(running)} job(s) are still running.\n\n"
+                "They will be resumed the next time the app starts. Quit now?"):
+            return
+        # Freeze the journal first so the dying processes are not recorded as failures
+        self.engine.journal.close()
+        for job in running:
+            if job.process:
+                stop_process(job.process)
+        self.engine.close()
+        self.root.destroy()
+
+    def run_download(self, job):
+        """Run one queued download on a worker thread via the shared engine"""
+        def log(text):
+            self.update_console(f"[#{job.id}] {text}")
+
+        # Staged downloads continue in the conversion pool's encode lane, so the
+        # next download starts while this one encodes
+        self.engine.run_download(job, log=log, submit=self.submit_download,
+                                 encode=self.convert_scheduler.submit)
+        if job.status == "done":
+            self.status_var.set("Download completed")
+        elif job.finished:
+            self.status_var.set("Download failed")
+
+    def update_parallel_downloads(self):
+        """Resize the download worker pool and remember the choice."""
+        count = self.parallel_var.get()
+        self.scheduler.set_max_workers(count)
+        cfg = self._load_config()
+        cfg["max_parallel_downloads"] = count
+        self._save_config(cfg)
+
+    def update_encode_slots(self):
+        """Change how many re-encodes run at once (conversions and compressed
+        downloads) and remember it."""
+        count = self.encode_slots_var.get()
+        self.engine.set_encode_slots(count)
+        self.convert_scheduler.set_lane_limit("encode", count)
+        self._update_conv_limits_label()
+        cfg = self._load_config()
+        cfg["max_parallel_encodes"] = count
+        self._save_config(cfg)
+
+    def _update_conv_limits_label(self):
+        self.conv_limits_var.set(f"Remux (copy) jobs run up to {self.convert_scheduler.max_workers} at once, "
+                                 f"re-encodes up to {self.engine.encode_slots}.")
+
+    def update_rate_limit(self):
+        """Apply the global download rate cap to downloads started from now on."""
+        try:
+            mbps = max(0.0, float(self.rate_limit_var.get() or 0))
+        except ValueError:
+            self.rate_limit_var.set(f"{(self.engine.rate_limit or 0) / (1024 * 1024):g}")
+            return
+        self.engine.rate_limit = int(mbps * 1024 * 1024) or None
+        cfg = self._load_config()
+        if cfg.get("download_rate_limit_mbps") != mbps:
+            cfg["download_rate_limit_mbps"] = mbps
+            self._save_config(cfg)
+
+    def update_performance_profile(self):
+        """Apply the encoder profile to encodes started from now on and remember it."""
+        profile = self.profile_var.get()
+        self.engine.performance_profile = profile
+        cfg = self._load_config()
+        cfg["performance_profile"] = profile
+        self._save_config(cfg)
+
+    def _add_job_control_buttons(self, parent, tree):
+        """Cancel / Pause / Resume buttons acting on the jobs selected in `tree`."""
+        ttk.Button(parent, text="Cancel", style="Secondary.TButton",
+                   command=lambda: self.cancel_selected_jobs(tree)).pack(side=tk.LEFT, padx=(5, 0))
+        pause_state = tk.NORMAL if CAN_PAUSE else tk.DISABLED
+        ttk.Button(parent, text="Pause", style="Secondary.TButton", state=pause_state,
+                   command=lambda: self.pause_selected_jobs(tree)).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(parent, text="Resume", style="Secondary.TButton", state=pause_state,
+                   command=lambda: self.resume_selected_jobs(tree)).pack(side=tk.LEFT, padx=(5, 0))
+
+    def _selected_jobs(self, tree):
+        selected = set(tree.selection())
+        return [job for job in self.jobs if str(job.id) in selected and self._tree_for(job) is tree]
+
+    def _scheduler_for(self, job):
+        """The scheduler that owns a job now: staged downloads move to the
+        conversion pool for their encode."""
+        return self.convert_scheduler if job.kind == "convert" or job.staged else self.scheduler
+
+    def cancel_selected_jobs(self, tree):
+        """Cancel the selected jobs; running processes are stopped and their
+        partial files removed."""
+        jobs = [job for job in self._selected_jobs(tree) if not job.finished]
+        running = [job for job in jobs if job.started_at]
+        if running and not messagebox.askyesno(
+                "Cancel", f"Stop {len(running)} running job(s)? Their partial files are deleted."):
+            return
+        for job in jobs:
+            staged = job.staged
+            if self._scheduler_for(job).cancel(job) and staged:
+                # Waiting for an encode slot: nothing will run it any more
+                self.engine.discard_staged(job, log=lambda text, job=job: self.update_console(f"[#{job.id}] {text}"))
+        if jobs:
+            self.update_console(f"Cancelled {len(jobs)} job(s)")
+
+    def prioritize_selected_jobs(self):
+        """Move the selected queued downloads to the front of the queue."""
+        jobs = [job for job in self._selected_jobs(self.job_tree) if not job.finished]
+        for job in jobs:
+            self.scheduler.set_priority(job, JOB_PRIORITIES["High"])
+
+    def pause_selected_jobs(self, tree):
+        """Suspend the selected running jobs until resumed (they keep their slot)."""
+        paused = [job for job in self._selected_jobs(tree) if self._scheduler_for(job).pause(job)]
+        if paused:
+            self.update_console(f"Paused {len(paused)} job(s)")
+
+    def resume_selected_jobs(self, tree):
+        resumed = [job for job in self._selected_jobs(tree) if self._scheduler_for(job).resume(job)]
+        if resumed:
+            self.update_console(f"Resumed {len(resumed)} job(s)")
+
+    def clear_finished_jobs(self):
+        """Remove completed, failed and cancelled jobs from the queue views."""
+        for job in [j for j in self.jobs if j.finished]:
+            self.jobs.remove(job)
+            tree = self._tree_for(job)
+            if tree.exists(str(job.id)):
+                tree.delete(str(job.id))
+
+    def _tree_for(self, job):
+        return self.conv_job_tree if job.kind == "convert" else self.job_tree
+
+    def _job_row_values(self, job):
+        if job.kind == "convert":
+            return (job.id, job.url, job.action, job.status, job.progress)
+        return (job.id, job.title or job.url, priority_name(job.priority), job.status, job.progress)
+
+    def _update_queue_progress(self, kind, bar, text_var):
+        """Overall progress of one queue: mean percent of its running jobs and
+        the longest remaining ETA."""
+        running = [job for job in self.jobs if job.kind == kind and job.started_at and not job.finished]
+        if not running:
+            bar["value"] = 0
+            text_var.set("")
+            return
+        percent = sum(job.percent or 0 for job in running) / len(running)
+        etas = [job.eta for job in running if job.eta is not None]
+        bar["value"] = percent
+        text = f"{len(running)} running, {percent:.0f}%"
+        if etas:
+            text += f", ETA {format_eta(max(etas))}"
+        text_var.set(text)
+
+    def _poll_jobs(self):
+        """Add new jobs and refresh rows changed by worker threads (main thread only)."""
+        try:
+            while not self._new_jobs.empty():
+                job = self._new_jobs.get_nowait()
+                self.jobs.append(job)
+                job.changed = False
+                self._tree_for(job).insert("", tk.END, iid=str(job.id),
+                                           values=self._job_row_values(job))
             
-            if bitrate:
-                cmd.extend(["--postprocessor-args", f"audio:-b:a {bitrate} -ar 48000"])
-            else:
-                cmd.extend(["--postprocessor-args", "audio:-ar 48000"])
+            for job in self.jobs:
+                if job.changed:
+                    job.changed = False
+                    tree = self._tree_for(job)
+                    if tree.exists(str(job.id)):
+                        tree.item(str(job.id), values=self._job_row_values(job))
             
-            output_template = os.path.join(self.output_dir, "%(title)s.%(ext)s")
-            cmd.extend([
-                "--windows-filenames",
-                "-o", output_template,
-                url
-            ])
+            self._update_queue_progress("download", self.dl_progress, self.dl_progress_var)
+            self._update_queue_progress("convert", self.conv_progress, self.conv_progress_var)
             
-        return cmd
+            summary = []
+            for label, scheduler in (("Downloading", self.scheduler), ("Converting", self.convert_scheduler)):
+                running, pending = scheduler.active_count(), scheduler.pending_count()
+                if running or pending:
+                    summary.append(f"{label}: {running} active, {pending} queued")
+            if summary:
+                self.status_var.set("  |  ".join(summary))
+        except Exception:
+            pass
+        self.root.after(250, self._poll_jobs)
 
-if __name__ == "__main__":
-    # Get base path
-    if getattr(sys, 'frozen', False):
-        base_path = os.path.dirname(sys.executable)
+
+def batch_size(text):
+    """argparse type for sizes and rates (--limit-rate, --http-chunk-size, ...)."""
+    try:
+        return parse_size(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def batch_time(text):
+    """argparse type for clip times (--start, --end)."""
+    try:
+        return parse_timestamp(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments (only the headless batch mode takes any)."""
+    parser = argparse.ArgumentParser(
+        description="L's YouTube Downloader. Without --batch the GUI is started."
+    )
+    parser.add_argument("--startup-report", action="store_true",
+                        help="open the window, print startup timings as JSON once it is interactive "
+                             "and exit (status 1 if over the startup budget)")
+    batch = parser.add_argument_group("headless batch mode")
+    batch.add_argument("--batch", metavar="FILE",
+                       help="run without a window: process the URLs (or, with --convert, "
+                            "the local files and folders) listed one per line in FILE ('-' for stdin)")
+    batch.add_argument("--convert", action="store_true",
+                       help="treat batch entries as local media files and convert them with ffmpeg")
+    batch.add_argument("--format", default="mp4", choices=VIDEO_FORMATS + AUDIO_FORMATS,
+                       help="output format; audio formats extract audio only (default: mp4)")
+    batch.add_argument("--output", metavar="DIR", default=os.getcwd(),
+                       help="output directory (default: current directory)")
+    batch.add_argument("--jobs", type=int,
+                       help="number of entries processed in parallel "
+                            "(default: 2 downloads, or one conversion per CPU core)")
+    batch.add_argument("--encode-jobs", type=int, metavar="N",
+                       help="maximum CPU-heavy re-encodes at once, including the encodes of "
+                            "compressed downloads (default: half the --jobs or CPU cores)")
+    batch.add_argument("--limit-rate", type=batch_size, metavar="RATE",
+                       help="total download rate cap shared by the parallel downloads, "
+                            "e.g. 500K or 4M (bytes per second)")
+    batch.add_argument("--concurrent-fragments", type=int, metavar="N",
+                       help="DASH/HLS fragments fetched at once per download "
+                            f"(default: {FRAGMENT_CONNECTION_BUDGET} split across --jobs, "
+                            f"at most {MAX_AUTO_FRAGMENTS})")
+    batch.add_argument("--http-chunk-size", type=batch_size, metavar="SIZE",
+                       help=f"download HTTP media in chunks of SIZE, e.g. 10M (default: {DEFAULT_HTTP_CHUNK_SIZE})")
+    batch.add_argument("--buffer-size", type=batch_size, metavar="SIZE",
+                       help="download buffer size, e.g. 16K (default: yt-dlp's)")
+    batch.add_argument("--downloader", choices=EXTERNAL_DOWNLOADERS,
+                       help="use an external downloader instead of yt-dlp's own")
+    batch.add_argument("--in-process", action="store_true",
+                       help="run yt-dlp through the yt_dlp Python package in reusable worker processes "
+                            "instead of starting the executable per command (falls back to the "
+                            "executable if the package is missing)")
+    batch.add_argument("--solver-cache", metavar="DIR",
+                       help="yt-dlp cache dir for the YouTube challenge-solver scripts (default: "
+                            f".ytdlp-gui-cache/{SOLVER_CACHE_DIRNAME}); copy a populated one to "
+                            "machines without internet access")
+    batch.add_argument("--metrics-dir", metavar="DIR",
+                       help="where per-job metrics are written: metrics-batch.prom (Prometheus text "
+                            "format) and metrics.jsonl (default: logs/)")
+    batch.add_argument("--preset", choices=tuple(COMPRESSION_PRESETS),
+                       help="compress to a preset target size")
+    batch.add_argument("--target-size", type=float, metavar="MB",
+                       help="compress to a custom target size in MB")
+    batch.add_argument("--video-bitrate", type=int, metavar="KBPS",
+                       help="video bitrate for --target-size (default: auto)")
+    batch.add_argument("--audio-bitrate", type=int, default=128, metavar="KBPS",
+                       help="audio bitrate for --target-size (default: 128)")
+    batch.add_argument("--profile", choices=tuple(PERFORMANCE_PROFILES), default=DEFAULT_PERFORMANCE_PROFILE,
+                       help="encoder speed/size trade-off for re-encodes (default: balanced)")
+    batch.add_argument("--resume", action="store_true",
+                       help="also continue the jobs an interrupted batch run left unfinished "
+                            "(may be used without --batch)")
+    batch.add_argument("--start", type=batch_time, metavar="TIME",
+                       help="keep only the part from TIME on, e.g. 1:23 (downloads fetch just that "
+                            "section; stream-copy conversions start at the keyframe before it)")
+    batch.add_argument("--end", type=batch_time, metavar="TIME",
+                       help="keep only the part up to TIME")
+    batch.add_argument("--force", action="store_true",
+                       help="download entries even if the archive already holds them")
+    batch.add_argument("--list-archive", nargs="?", const="", metavar="SEARCH",
+                       help="print the download archive (optionally filtered) as JSON and exit")
+    batch.add_argument("--age-limit", type=int, metavar="YEARS")
+    batch.add_argument("--cookies-from-browser", metavar="BROWSER")
+    batch.add_argument("--cookies", metavar="FILE", help="Netscape-format cookies.txt")
+    return parser.parse_args(argv)
+
+def read_batch_entries(path):
+    """Read non-empty, non-comment lines from a batch file ('-' reads stdin)."""
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
     else:
-        base_path = os.path.dirname(os.path.abspath(__file__))
-    
-    deps_path = os.path.join(base_path, "dependencies")
-    ytdlp_binary = "yt-dlp.exe" if IS_WINDOWS else "yt-dlp"
-    ffmpeg_binary = "ffmpeg.exe" if IS_WINDOWS else "ffmpeg"
-    local_ytdlp = os.path.join(deps_path, ytdlp_binary)
-    local_ffmpeg = os.path.join(deps_path, "ffmpeg", "bin", ffmpeg_binary)
-    
-    # Check if yt-dlp is available (either local or system-wide)
-    ytdlp_found = False
-    if os.path.exists(local_ytdlp):
-        ytdlp_found = True
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+def run_batch(args):
+    """Headless entry point: process every batch entry in parallel without Tk.
+    Logs go to stderr; a JSON summary is printed to stdout. Returns the exit code."""
+    try:
+        entries = read_batch_entries(args.batch) if args.batch else []
+    except OSError as e:
+        print(f"Error: cannot read batch file: {e}", file=sys.stderr)
+        return 2
+
+    output_dir = os.path.abspath(args.output)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if args.preset:
+        compression = compression_spec_for_preset(args.preset)
+    elif args.target_size:
+        compression = {'target_size': args.target_size,
+                       'video_bitrate': args.video_bitrate,
+                       'audio_bitrate': args.audio_bitrate}
     else:
-        try:
-            subprocess.run(
-                ["yt-dlp", "--version"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True,
-                creationflags=subprocess_flags()
-            )
-            ytdlp_found = True
-        except (subprocess.SubprocessError, FileNotFoundError):
-            pass
+        compression = None
     
-    if not ytdlp_found:
-        if IS_WINDOWS:
-            response = messagebox.askyesno(
-                "Dependencies Missing",
-                "yt-dlp is not installed.\n\nWould you like to run the setup wizard now?"
-            )
-            if response:
-                setup_bat = os.path.join(base_path, "setup.bat")
-                if os.path.exists(setup_bat):
-                    subprocess.Popen([setup_bat], shell=True)
-                else:
-                    messagebox.showerror("Error", "Setup file not found. Please run setup.bat manually.")
-        else:
-            messagebox.showerror(
-                "Dependencies Missing",
-                "yt-dlp is not installed.\n\n"
-                "Install it with your package manager:\n"
-                "  Ubuntu/Debian: sudo apt install yt-dlp\n"
-                "  Arch: sudo pacman -S yt-dlp\n"
-                "  macOS: brew install yt-dlp\n"
-                "  pip: pip install yt-dlp"
-            )
-        exit(1)
+    try:
+        clip = make_clip(args.start, args.end)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    suffix = f" (clip {clip_label(clip)})" if clip else ""
     
-    # Check if ffmpeg is available (local, system path, or platform-specific fallback)
-    ffmpeg_found = False
-    if os.path.exists(local_ffmpeg):
-        ffmpeg_found = True
-    elif IS_WINDOWS and os.path.exists("C:\\ffmpeg\\bin\\ffmpeg.exe"):
-        ffmpeg_found = True
-    elif shutil.which("ffmpeg"):
-        ffmpeg_found = True
+    is_audio = args.format in AUDIO_FORMATS
+    options = DownloadOptions(
+        output_dir=output_dir,
+        media="audio" if is_audio else "video",
+        video_format=args.format if not is_audio else "mp4",
+        audio_format=args.format if is_audio else "mp3",
+        compression=compression,
+        age_limit=args.age_limit,
+        cookies_browser=args.cookies_from_browser,
+        cookies_file=args.cookies,
+        force=args.force,
+        clip=clip,
+    )
     
-    if not ffmpeg_found:
-        if IS_WINDOWS:
-            response = messagebox.askyesno(
-                "Dependencies Missing",
-                "FFmpeg is not installed.\n\nWould you like to run the setup wizard now?"
-            )
-            if response:
-                setup_bat = os.path.join(base_path, "setup.bat")
-                if os.path.exists(setup_bat):
-                    subprocess.Popen([setup_bat], shell=True)
-                else:
-                    messagebox.showerror("Error", "Setup file not found. Please run setup.bat manually.")
+    engine = DownloadEngine(get_base_path(), origin="batch", solver_cache=args.solver_cache,
+                            metrics_dir=args.metrics_dir)
+    engine.set_in_process(args.in_process)
+    engine.performance_profile = args.profile
+    engine.rate_limit = args.limit_rate
+    engine.network.update(concurrent_fragments=args.concurrent_fragments,
+                          http_chunk_size=args.http_chunk_size, buffer_size=args.buffer_size,
+                          external_downloader=args.downloader)
+
+    def make_log(job):
+        return lambda text: engine.log(f"[#{job.id}] {text}")
+
+    def submit_entry(job):
+        # Playlist entries join the summary; skipped ones are not scheduled
+        jobs.append(job)
+        if not job.finished:
+            engine.journal_job(job)
+            scheduler.submit(job)
+
+    def run_job(job):
+        if job.kind == "convert":
+            engine.run_conversion_job(job, log=make_log(job))
         else:
-            messagebox.showerror(
-                "Dependencies Missing",
-                "FFmpeg is not installed.\n\n"
-                "Install it with your package manager:\n"
-                "  Ubuntu/Debian: sudo apt install ffmpeg\n"
-                "  Arch: sudo pacman -S ffmpeg\n"
-                "  macOS: brew install ffmpeg"
-            )
-        exit(1)
+            engine.run_download(job, log=make_log(job), submit=submit_entry, encode=encoder.submit)
 
-    # Check if all required Python packages are installed
-    required_packages = ["tkinter"]
-    for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
-            messagebox.showerror("Error", f"Required Python package '{package}' is not installed.")
-            exit(1)
+    def run_encode(job):
+        engine.run_staged_encode(job, log=make_log(job))
+
+    started = time.time()
+    if args.convert:
+        # Remuxes are I/O-bound, so only re-encodes are capped at half the pool
+        workers = args.jobs or max(2, os.cpu_count() or 2)
+        encodes = args.encode_jobs or max(1, workers // 2)
+        scheduler = JobScheduler(run_job, max_workers=workers, lane_limits={"encode": encodes})
+    else:
+        workers = args.jobs or 2
+        encodes = args.encode_jobs or min(workers, max(1, (os.cpu_count() or 2) // 2))
+        scheduler = JobScheduler(run_job, max_workers=workers)
+    engine.set_encode_slots(encodes)
+    engine.download_concurrency = scheduler.expected_concurrency
+    # Compressed downloads hand their encode to this pool once fetched, so
+    # downloads and encodes overlap; `encodes` caps it
+    encoder = JobScheduler(run_encode, max_workers=encodes)
+    jobs = []
+    if args.convert:
+        # Entries may be files or folders (walked recursively)
+        for entry in entries:
+            if os.path.isdir(entry):
+                inputs = find_media_files(entry)
+                targets = conversion_targets(inputs, output_dir, args.format, input_root=entry, suffix=suffix)
+            else:
+                targets = conversion_targets([entry], output_dir, args.format, suffix=suffix)
+            for source, target in targets:
+                if not os.path.isfile(source):
+                    job = Job(source, kind="convert")
+                    job.update(status="failed", error="input file does not exist")
+                    jobs.append(job)
+                    continue
+                job = engine.make_conversion_job(source, target, args.format, compression, clip=clip)
+                jobs.append(job)
+                engine.journal_job(job)
+                scheduler.submit(job)
+    else:
+        for entry in entries:
+            job = Job(entry, options=options)
+            jobs.append(job)
+            if not re.match(r'^(https?://).+', entry):
+                job.update(status="failed", error="not an http(s) URL")
+                continue
+            archived = None if args.force else engine.archived_url(entry, options)
+            if archived:
+                job.update(status="skipped", title=archived["title"] or "", output_path=archived["output_path"])
+                continue
+            engine.journal_job(job)
+            scheduler.submit(job)
+    if args.resume:
+        # Jobs an interrupted batch run left behind (yt-dlp continues .part files)
+        resumed = engine.interrupted_jobs()
+        engine.log(f"Resuming {len(resumed)} interrupted job(s)")
+        for job in resumed:
+            jobs.append(job)
+            scheduler.submit(job)
+    try:
+        # Every hand-off to the encoder happens inside a download job, so once
+        # the downloads are done the encoder has all its work
+        scheduler.wait()
+        encoder.wait()
+    except KeyboardInterrupt:
+        # Leave the journal rows as they are so --resume picks them up. Children
+        # run in their own session, so they did not see the Ctrl+C themselves
+        engine.journal.close()
+        for job in jobs:
+            if job.process:
+                stop_process(job.process)
+        print("Interrupted; run again with --resume to continue.", file=sys.stderr)
+        return 130
+    finally:
+        engine.close()
+
+    summary = {
+        "mode": "convert" if args.convert else "download",
+        "total": len(jobs),
+        "succeeded": sum(1 for job in jobs if job.status in ("done", "skipped")),
+        "failed": sum(1 for job in jobs if job.status not in ("done", "skipped")),
+        "elapsed": round(time.time() - started, 3),
+        "solver_cache": engine.solver_cache.stats(),
+        "jobs": [
+            {
+                "id": job.id,
+                "input": job.url,
+                "playlist": job.parent_id,
+                "title": job.title or None,
+                "output": job.output_path,
+                "action": job.action,
+                "status": job.status,
+                "returncode": job.returncode,
+                "error": job.error,
+                "elapsed": round(job.finished_at - job.started_at, 3)
+                           if job.started_at and job.finished_at else None,
+            }
+            for job in jobs
+        ],
+    }
+    print(json.dumps(summary, indent=2))
+    return 0 if summary["failed"] == 0 else 1
+
+def list_archive(search=None):
+    """Print archived downloads (newest first) as JSON. Returns the exit code."""
+    archive = DownloadArchive(StateStore(os.path.join(get_base_path(), STATE_DB_NAME)))
+    rows = archive.entries(search or None, limit=-1)
+    for row in rows:
+        row["exists"] = bool(row["output_path"]) and os.path.exists(row["output_path"])
+    print(json.dumps(rows, indent=2))
+    return 0
+
+# Install hints shown when a required binary is missing (not on Windows,
+# which offers the setup wizard instead)
+MISSING_DEPENDENCY_HINTS = {
+    "yt-dlp": ("yt-dlp",
+               "  Ubuntu/Debian: sudo apt install yt-dlp\n"
+               "  Arch: sudo pacman -S yt-dlp\n"
+               "  macOS: brew install yt-dlp\n"
+               "  pip: pip install yt-dlp"),
+    "ffmpeg": ("FFmpeg",
+               "  Ubuntu/Debian: sudo apt install ffmpeg\n"
+               "  Arch: sudo pacman -S ffmpeg\n"
+               "  macOS: brew install ffmpeg"),
+}
+
+def show_missing_dependency(name, base_path):
+    """Tell the user a required binary is missing (offering setup.bat on Windows)."""
+    label, hints = MISSING_DEPENDENCY_HINTS[name]
+    if IS_WINDOWS:
+        response = messagebox.askyesno(
+            "Dependencies Missing",
+            f"{label} is not installed.\n\nWould you like to run the setup wizard now?"
+        )
+        if response:
+            setup_bat = os.path.join(base_path, "setup.bat")
+            if os.path.exists(setup_bat):
+                subprocess.Popen([setup_bat], shell=True)
+            else:
+                messagebox.showerror("Error", "Setup file not found. Please run setup.bat manually.")
+    else:
+        messagebox.showerror(
+            "Dependencies Missing",
+            f"{label} is not installed.\n\n"
+            "Install it with your package manager:\n" + hints
+        )
+
+if __name__ == "__main__":
+    # Frozen builds start the in-process yt-dlp workers through this entry point
+    multiprocessing.freeze_support()
+    args = parse_args()
+    if args.list_archive is not None:
+        sys.exit(list_archive(args.list_archive))
+    if args.batch or args.resume:
+        sys.exit(run_batch(args))
+
+    try:
+        load_tk()
+    except ImportError:
+        print("Error: Required Python package 'tkinter' is not installed. "
+              "Use --batch for headless mode.", file=sys.stderr)
+        exit(1)
     
-    # Create and run the app
+    # Create and run the app; dependencies are checked once the window is up
+    startup = StartupTimer()
     root = tk.Tk()
-    app = YtDlpGUI(root)
-    root.mainloop()
\ No newline at end of file
+    startup.mark("tk")
+    app = YtDlpGUI(root, startup=startup, report_startup=args.startup_report)
+    root.mainloop()
+    if args.startup_report:
+        sys.exit(1 if startup.over_budget else 0)